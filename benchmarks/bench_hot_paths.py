@@ -0,0 +1,232 @@
+"""
+Throughput and peak memory benchmark of the request/response hot paths
+
+    python benchmarks/bench_hot_paths.py [--sizes 1KB,100KB,1MB] [--only xml2dict] [--repeat 3]
+                                         [--baseline benchmarks/baseline_hot_paths.json] [--save]
+                                         [--threshold 0.25]
+
+Runs construct_xml (compiled skeleton and _flatjson2xml), unflatten_json, _load_variables,
+xml2dict, CustomDict/ResponseView lookups and the json/xml validators on synthetic payloads
+(see payloads.py) of each size and shape. Throughput is the payload size over the best time,
+peak memory is the peak of the Python allocations during one call (tracemalloc does not see
+the buffers libxml2 allocates).
+
+--save stores the results as the baseline; otherwise, if the baseline exists, the results are
+compared with it and the run exits with 1 if any case got slower or bigger by more than
+--threshold. Baselines are only comparable on the machine they were saved on.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payloads  # noqa: E402
+from taf.utils import api_utils, CustomDict, response_view, xml2dict, json_dumps, JsonValidator, XmlValidator  # noqa: E402
+from taf.objects.api import RestBaseObject, SoapBaseObject  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_hot_paths.json')
+
+LOOKUPS = 1000  # item lookups per call of the CustomDict/ResponseView cases
+
+MIN_PEAK_DELTA = 64 << 10  # peak memory changes below this many bytes are noise
+
+
+class BenchRest(RestBaseObject):
+    pass
+
+
+class BenchSoap(SoapBaseObject):
+    pass
+
+
+def _bench_obj(cls, flat_dict):
+    """ Api obj holding flat_dict, built without the env files of a project """
+
+    obj = cls.__new__(cls)
+    obj._var_index = {'Prefix': 'bench'}
+    obj._rq_name = 'Request'
+    obj.reset()
+    obj._flat_dict = flat_dict
+    return obj
+
+
+def _construct_xml(compiled):
+    def setup(size, shape):
+        d = payloads.flat_json(size, shape)
+        obj = _bench_obj(BenchSoap, d)
+        obj.compiled_xml = compiled
+        return len(json_dumps(d)), obj.construct_xml
+    return setup
+
+
+def _unflatten_json(size, shape):
+    d = payloads.flat_json(size, shape)
+    obj = _bench_obj(BenchRest, d)
+
+    def run():
+        obj.rq_dict = {}
+        obj.unflatten_json()
+    return len(json_dumps(d)), run
+
+
+def _load_variables(size, shape):
+    d = payloads.flat_json(size, shape, placeholders=True)
+    obj = _bench_obj(BenchRest, d)
+    return len(json_dumps(d)), lambda: obj._load_variables(d)
+
+
+def _xml2dict(size, shape):
+    xml = payloads.xml_doc(size, shape)
+    return len(xml), lambda: xml2dict(xml)
+
+
+def _lookups(wrap):
+    def setup(size, shape):
+        doc = payloads.nested_json(size, shape)
+        items = doc['Body']['Items']
+        indexes = range(0, len(items), max(1, len(items) // LOOKUPS))
+
+        def run():
+            view = wrap(doc)
+            for i in indexes:
+                view['Body']['Items'][i]['name']
+        return len(json_dumps(doc)), run
+    return setup
+
+
+def _validator(cls, schema_name, make_body):
+    def setup(size, shape):
+        body = make_body(size)
+        return len(body), lambda: cls(body, 'bench/' + schema_name).validate_schema()
+    return setup
+
+
+# name -> (setup(size, shape) returning (payload bytes, callable), shapes)
+CASES = {
+    'construct_xml': (_construct_xml(True), ('wide', 'deep')),
+    '_flatjson2xml': (_construct_xml(False), ('wide', 'deep')),
+    'unflatten_json': (_unflatten_json, ('wide', 'deep')),
+    '_load_variables': (_load_variables, ('wide',)),
+    'xml2dict': (_xml2dict, ('wide', 'deep', 'ns')),
+    'CustomDict': (_lookups(CustomDict), ('wide',)),
+    'ResponseView': (_lookups(response_view), ('wide',)),
+    'JsonValidator': (_validator(JsonValidator, 'items.json',
+                                 lambda size: json_dumps(payloads.nested_json(size))), ('wide',)),
+    'XmlValidator': (_validator(XmlValidator, 'items.xsd', payloads.xml_doc), ('wide',)),
+}
+
+
+def _write_schemas(root):
+    """ Schemas of the validator cases, in a throwaway proj_root """
+
+    os.makedirs(os.path.join(root, 'schema', 'bench'))
+    with open(os.path.join(root, 'schema', 'bench', 'items.json'), 'w') as f:
+        json.dump(payloads.ITEMS_JSON_SCHEMA, f)
+    with open(os.path.join(root, 'schema', 'bench', 'items.xsd'), 'w') as f:
+        f.write(payloads.ITEMS_XSD)
+
+
+def measure(func, size, repeat):
+    """
+    :return: dict of the best seconds per call, throughput in MB/s and peak memory in bytes
+    """
+
+    number, _ = timeit.Timer(func).autorange()
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': best, 'mb_s': size / best / (1 << 20), 'peak': peak}
+
+
+def compare(results, baseline, threshold):
+    """
+    :return: list of the regression messages
+    """
+
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result['seconds'] > base['seconds'] * (1 + threshold):
+            regressions.append('%s: %.3f ms -> %.3f ms' % (key, base['seconds'] * 1e3, result['seconds'] * 1e3))
+        if (result['peak'] > base['peak'] * (1 + threshold)
+                and result['peak'] - base['peak'] > MIN_PEAK_DELTA):
+            regressions.append('%s: peak %.1f KB -> %.1f KB' % (key, base['peak'] / 1024, result['peak'] / 1024))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1KB,100KB,1MB', help='comma separated, up to 100MB')
+    parser.add_argument('--only', default='', help='comma separated case names, all if empty')
+    parser.add_argument('--repeat', type=int, default=3, help='timed rounds per case, the best is kept')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='path of the baseline json')
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='tolerated slowdown/growth ratio')
+    opts = parser.parse_args()
+
+    sizes = [(text.upper(), payloads.parse_size(text)) for text in opts.sizes.split(',')]
+    names = opts.only.split(',') if opts.only else list(CASES)
+    unknown = set(names) - set(CASES)
+    if unknown:
+        parser.error('unknown cases %s, should be any of %s' % (sorted(unknown), list(CASES)))
+
+    logging.disable(logging.INFO)  # the validators log every call
+    tmp = tempfile.TemporaryDirectory()
+    _write_schemas(tmp.name)
+    api_utils.proj_root = tmp.name
+
+    results = {}
+    print('%-34s %12s %10s %12s' % ('case', 'ms/call', 'MB/s', 'peak KB'))
+    for name in names:
+        setup, shapes = CASES[name]
+        for shape in shapes:
+            for label, size in sizes:
+                payload_size, func = setup(size, shape)
+                key = '%s[%s,%s]' % (name, shape, label)
+                result = results[key] = measure(func, payload_size, opts.repeat)
+                print('%-34s %12.3f %10.1f %12.1f' % (key, result['seconds'] * 1e3, result['mb_s'],
+                                                       result['peak'] / 1024))
+    tmp.cleanup()
+
+    if opts.save:
+        baseline = {}
+        if os.path.exists(opts.baseline):
+            with open(opts.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)  # a partial run only refreshes its own cases
+        with open(opts.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print('baseline saved to %s' % opts.baseline)
+        return
+
+    if not os.path.exists(opts.baseline):
+        print('no baseline at %s, run with --save to store one' % opts.baseline)
+        return
+
+    with open(opts.baseline) as f:
+        regressions = compare(results, json.load(f), opts.threshold)
+    if regressions:
+        print('FAIL: regressions beyond %d%%:' % (opts.threshold * 100))
+        for msg in regressions:
+            print('  ' + msg)
+        sys.exit(1)
+    print('OK: no regression beyond %d%% of the baseline' % (opts.threshold * 100))
+
+
+if __name__ == '__main__':
+    main()
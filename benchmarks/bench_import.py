@@ -0,0 +1,69 @@
+"""
+Cold-start import benchmark of the API entrance
+
+    python benchmarks/bench_import.py [--module taf.entrance.api_entrance] [--budget-ms 300] [--runs 5]
+
+Imports the module in fresh interpreters under `python -X importtime` and reports the
+cumulative import time (best of the runs). Exits with 1 if it exceeds the budget or if any
+of the web/app-only dependencies got imported on the way.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# packages the API-only users should never pay for
+FORBIDDEN = ('selenium', 'appium', 'jsonschema')
+
+_line_patt = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| *(\S+)')
+
+
+def measure(module):
+    """
+    Import module in a fresh interpreter
+    :return: tuple of cumulative import time in ms and list of top-level packages imported
+    """
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get('PYTHONPATH')))))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                          env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    cumulative, packages = None, set()
+    for line in proc.stderr.splitlines():
+        m = _line_patt.match(line)
+        if not m:
+            continue
+        packages.add(m.group(3).split('.')[0])
+        if m.group(3) == module:
+            # the top-level line (last one) includes the parent packages
+            cumulative = max(cumulative or 0, int(m.group(2)) / 1000)
+    return cumulative, sorted(packages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='taf.entrance.api_entrance', help='module to import')
+    parser.add_argument('--budget-ms', type=float, default=300, help='max cumulative import time')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start')
+    opts = parser.parse_args()
+
+    results = [measure(opts.module) for _ in range(opts.runs)]
+    best = min(ms for ms, _ in results)
+    leaked = [pkg for pkg in results[0][1] if pkg in FORBIDDEN]
+
+    print('import %s: best %.1f ms of %d runs (budget %.0f ms)' % (opts.module, best, opts.runs, opts.budget_ms))
+    if leaked:
+        print('FAIL: web/app-only packages imported: %s' % ', '.join(leaked))
+    if best > opts.budget_ms:
+        print('FAIL: import time over budget')
+    if leaked or best > opts.budget_ms:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Micro-benchmark of the per-call overhead of typeassert
+
+    python benchmarks/bench_typeassert.py [--number N]
+
+Compares the undecorated function, the former Signature.bind based checker,
+the compiled checker and the compiled checker switched off by set_typecheck(False).
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from functools import wraps
+from inspect import signature
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from taf.utils.api_utils import typeassert, set_typecheck  # noqa: E402
+
+
+def legacy_typeassert(*tyargs, **ty_kwargs):
+    """ typeassert before the checks were compiled, kept here as the baseline """
+
+    def decorator(func):
+        sig = signature(func)
+        bound_types = sig.bind_partial(*tyargs, **ty_kwargs).arguments
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound_values = sig.bind(*args, **kwargs).arguments
+            for key, val in bound_values.items():
+                if key in bound_types:
+                    if not isinstance(val, bound_types[key]):
+                        raise TypeError(
+                            'Parameter <%s> must be the type of %s' % (key, bound_types[key]))
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# same shape as RestBaseClient.send_req
+def send_req(method, url, headers, rq_body=None, params=None):
+    return method
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=200000, help='calls per case')
+    opts = parser.parse_args()
+
+    cases = [
+        ('undecorated', send_req),
+        ('legacy bind', legacy_typeassert(rq_body=str, params=dict)(send_req)),
+        ('compiled', typeassert(rq_body=str, params=dict)(send_req)),
+        ('compiled, switched off', typeassert(rq_body=str, params=dict)(send_req)),
+    ]
+
+    baseline = None
+    print('%-24s %12s %12s' % ('case', 'ns/call', 'overhead'))
+    for name, func in cases:
+        set_typecheck(name != 'compiled, switched off')
+        call = lambda: func('POST', 'http://host/api', {}, rq_body='{}')  # noqa: E731
+        per_call = min(timeit.repeat(call, number=opts.number, repeat=5)) / opts.number * 1e9
+        if baseline is None:
+            baseline = per_call
+        print('%-24s %12.1f %+12.1f' % (name, per_call, per_call - baseline))
+    set_typecheck(True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Synthetic payload generators for the hot-path benchmarks
+
+Every generator takes the approximate size in bytes of the payload to build and a shape:
+'wide' (long arrays of small records), 'deep' (deeply nested records) or, for xml, 'ns'
+(records spread over many namespaces).
+"""
+
+import json
+
+SIZES = {'1KB': 1 << 10, '100KB': 100 << 10, '1MB': 1 << 20, '10MB': 10 << 20, '100MB': 100 << 20}
+
+DEPTH = 32  # nesting levels of the 'deep' shape
+
+NAMESPACES = 16  # namespaces of the 'ns' shape
+
+
+def parse_size(text):
+    """ '1MB' -> 1048576 """
+
+    try:
+        return SIZES[text.upper()]
+    except KeyError:
+        raise ValueError('Unknown size <%s>, should be one of %s' % (text, list(SIZES)))
+
+
+def _count(size, sample):
+    """ Number of records needed to reach size """
+
+    return max(1, size // max(1, len(sample)))
+
+
+def flat_json(size, shape='wide', placeholders=False):
+    """
+    Flat json dict like the ones in the 'json/' fixtures, as consumed by unflatten_json/construct_xml
+    :param placeholders: flag of if the values hold {{var}} placeholders (for _load_variables)
+    """
+
+    value = '{{Prefix}}-%d' if placeholders else 'value-%d'
+    if shape == 'wide':
+        sample = '"Order.Items[0].Sku": "%s", "Order.Items[0].Qty": "%s", ' % (value, value)
+        d = {}
+        for i in range(_count(size, sample)):
+            d['Order.Items[%d].Sku' % i] = value % i
+            d['Order.Items[%d].Qty' % i] = value % i
+        return d
+
+    if shape == 'deep':
+        path = '.'.join('L%d' % level for level in range(DEPTH))
+        sample = '"Order.Blocks[0].%s.Leaf": "%s", ' % (path, value)
+        return dict(('Order.Blocks[%d].%s.Leaf' % (i, path), value % i) for i in range(_count(size, sample)))
+
+    raise ValueError('Unknown flat json shape <%s>' % shape)
+
+
+def nested_json(size, shape='wide'):
+    """ Parsed json response (nested dicts and lists) """
+
+    if shape == 'wide':
+        record = {'id': 0, 'name': 'item-0', 'price': 1.5, 'tags': ['a', 'b']}
+        n = _count(size, json.dumps(record))
+        return {'Body': {'Items': [dict(record, id=i, name='item-%d' % i) for i in range(n)]}}
+
+    if shape == 'deep':
+        def _block(i):
+            node = {'Leaf': 'value-%d' % i}
+            for level in reversed(range(DEPTH)):
+                node = {'L%d' % level: node}
+            return node
+        n = _count(size, json.dumps(_block(0)))
+        return {'Body': {'Blocks': [_block(i) for i in range(n)]}}
+
+    raise ValueError('Unknown nested json shape <%s>' % shape)
+
+
+def xml_doc(size, shape='wide'):
+    """ Xml response str """
+
+    if shape == 'wide':
+        record = '<Item id="%d"><Name>item-%d</Name><Price>1.5</Price></Item>'
+        items = ''.join(record % (i, i) for i in range(_count(size, record)))
+        return '<Response><Items>%s</Items></Response>' % items
+
+    if shape == 'deep':
+        opening = ''.join('<L%d>' % level for level in range(DEPTH))
+        closing = ''.join('</L%d>' % level for level in reversed(range(DEPTH)))
+        block = '<Block>' + opening + 'value-%d' + closing + '</Block>'
+        return '<Response>%s</Response>' % ''.join(block % i for i in range(_count(size, block)))
+
+    if shape == 'ns':
+        declarations = ' '.join('xmlns:n%d="urn:bench:%d"' % (k, k) for k in range(NAMESPACES))
+        record = '<n%d:Item n%d:id="%d"><n%d:Name>item-%d</n%d:Name></n%d:Item>'
+        sample = record % ((0,) * 7)
+        items = ''.join(record % ((i % NAMESPACES,) * 2 + (i,) + (i % NAMESPACES,) + (i,) + (i % NAMESPACES,) * 2)
+                        for i in range(_count(size, sample)))
+        return '<Response %s>%s</Response>' % (declarations, items)
+
+    raise ValueError('Unknown xml shape <%s>' % shape)
+
+
+# schemas matching the 'wide' payloads
+ITEMS_JSON_SCHEMA = {
+    'type': 'object',
+    'properties': {'Body': {'type': 'object', 'properties': {'Items': {'type': 'array', 'items': {
+        'type': 'object',
+        'required': ['id', 'name'],
+        'properties': {'id': {'type': 'integer'}, 'name': {'type': 'string'}, 'price': {'type': 'number'},
+                       'tags': {'type': 'array', 'items': {'type': 'string'}}}}}}}},
+}
+
+ITEMS_XSD = '''<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:element name="Response"><xs:complexType><xs:sequence>
+    <xs:element name="Items"><xs:complexType><xs:sequence>
+      <xs:element name="Item" minOccurs="0" maxOccurs="unbounded"><xs:complexType>
+        <xs:sequence><xs:element name="Name" type="xs:string"/><xs:element name="Price" type="xs:decimal"/></xs:sequence>
+        <xs:attribute name="id" type="xs:int"/>
+      </xs:complexType></xs:element>
+    </xs:sequence></xs:complexType></xs:element>
+  </xs:sequence></xs:complexType></xs:element>
+</xs:schema>
+'''
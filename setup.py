@@ -11,6 +11,12 @@ setup(
     include_package_data=True,
     platforms="any",
     install_requires=[
-        'lxml', 'requests', 'xmltodict',
-        'selenium', 'Appium-Python-Client', 'jsonschema', 'gevent']  # Rmb to add new dependencies into here
+        'lxml', 'requests',
+        'selenium', 'Appium-Python-Client', 'jsonschema', 'gevent'],  # Rmb to add new dependencies into here
+    extras_require={
+        'speedups': ['orjson'],  # faster json codec, picked automatically when installed
+        'compression': ['brotli', 'zstandard'],  # br/zstd transport compression, see Compression
+        'test': ['pytest', 'xmltodict']},  # xmltodict is the reference the xml2dict tests compare with
+    entry_points={
+        'pytest11': ['taf = taf.pytest_plugin']}  # stub_server fixture
 )
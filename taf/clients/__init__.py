@@ -1 +1,16 @@
-from .common_driver_ops import CommonDriverOps
+import importlib
+
+# driver ops pull in selenium, so they are imported on first access only
+_LAZY_ATTRS = {'CommonDriverOps': '.common_driver_ops'}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
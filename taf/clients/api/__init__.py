@@ -1,3 +1,7 @@
+from .session_pool import SessionPool
+from .cassette import Cassette
+from .http_cache import HttpCache
+from .compression import Compression, available_codings
 from .api_base_client import APIBaseClient
 from .soap_base_client import SoapBaseClient
 from .rest_base_client import RestBaseClient
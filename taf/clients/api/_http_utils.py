@@ -0,0 +1,61 @@
+import base64
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from taf.utils import encoding
+
+# describe the body on the wire rather than the decoded one that is stored
+_BODY_HEADERS = ('content-length', 'content-encoding', 'transfer-encoding')
+
+
+def _body_fits(response, max_body_size):
+    """
+    Flag of if the body can be read in full to be stored: a streamed response is judged from its
+    Content-Length (wire size) before anything is read, one without it is never buffered
+    """
+
+    if response._content_consumed:  # read already, e.g. not streamed
+        return len(response.content) <= max_body_size
+    length = response.headers.get('Content-Length', '')
+    return length.isdigit() and int(length) <= max_body_size
+
+
+def _normalize_url(url):
+    """ Sort the query params so their order does not change the fingerprint """
+
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ''))
+
+
+def _encode_body(body):
+    if body is None:
+        return {'body': ''}
+    if isinstance(body, str):
+        return {'body': body}
+    try:
+        return {'body': body.decode(encoding)}
+    except UnicodeDecodeError:
+        return {'body_b64': base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(entry):
+    if 'body_b64' in entry:
+        return base64.b64decode(entry['body_b64'])
+    return entry['body'].encode(encoding)
+
+
+def _build_response(status_code, url, headers, response_encoding, content):
+    """ requests.Response served without touching the network, its <timings> are zeros """
+
+    response = Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response.url = url
+    response.encoding = response_encoding
+    response._content = content
+    response._content_consumed = True
+    response.timings = {'connect': 0.0, 'ttfb': 0.0, 'download': 0.0}
+    return response
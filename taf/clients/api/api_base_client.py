@@ -1,45 +1,146 @@
 import logging
+import time
+from contextlib import nullcontext
 from functools import partial
-from xml import parsers
-from xml.dom import minidom
 import requests
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
-from taf.utils import cannot_be_instantiated
+from taf.utils import cannot_be_instantiated, log_body
+from taf.utils.stream_utils import StreamedBody, CHUNK_SIZE
+from .session_pool import SessionPool
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def _timed_chunks(chunks, spent):
+    """ Yield the chunks, adding the seconds spent pulling them off the wire into spent['read'] """
+
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            spent['read'] += time.perf_counter() - start
+        yield chunk
+
+
 class APIBaseClient:
     rs_body = ''  # response str
 
     status_code = int()  # response status code
 
+    content_type = ''  # Content-Type header of the response
+
+    rs_stream = None  # StreamedBody of the response in streaming mode
+
     __new__ = partial(cannot_be_instantiated, name='APIBaseClient')
 
-    def __init__(self, *, verify_ssl=False):
+    def __init__(self, *, verify_ssl=False, pool=None, timer=None, stream=False, cassette=None, http_cache=None,
+                 compression=None):
         """
         Constructor of APIBaseClient
         :param verify_ssl: control whether we verify the server's TLS certificate
+        :param pool: SessionPool to send the requests through, default is the process-wide one
+        :param timer: PhaseTimer to aggregate the network and output timings, None to disable
+        :param stream: flag of if reading the response in chunks into <rs_stream> (spilled to a
+                       temp file when large) instead of holding it in <rs_body>
+        :param cassette: Cassette to record the responses into or replay them from, None to always use the network
+        :param http_cache: HttpCache serving the fresh GET/HEAD responses and revalidating the stale ones,
+                           in front of the cassette, None to disable
+        :param compression: Compression of the request bodies and the responses, None to leave it to requests
         """
 
         self.verify_ssl = verify_ssl
+        self.stream = stream
+        self.pool = pool or SessionPool.shared()
+        self.timer = timer
+        self.cassette = cassette
+        self.http_cache = http_cache
+        self.compression = compression
+
+        self.timings = {}  # time breakdown of the last request, filled when timer is set
+
+        self.transfer = {}  # raw and wire byte counts of the last request, filled when compression is set
 
         if not verify_ssl:
             requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
+    def _request(self, method, url, **kwargs):
+        """ Send the request through the pool and record its network timings """
+
+        self.transfer = {}
+        # http cache -> cassette -> compression -> pool, the outer ones may answer without sending
+        send = self.pool.request
+        if self.compression is not None:
+            send = partial(self.compression.request, send, self.transfer)
+        if self.cassette is not None:
+            send = partial(self.cassette.request, send)
+        if self.http_cache is not None:
+            send = partial(self.http_cache.request, send)
+
+        response = send(method, url, stream=self.stream, **kwargs)
+
+        if self.timer:
+            for name, seconds in response.timings.items():
+                if name == 'download' and self._on_wire(response):
+                    continue  # only the headers are read yet, recorded with the body by output_response
+                self.timer.record('net_' + name, seconds, self.timings)
+        return response
+
+    def _phase(self, name):
+        """ Time the enclosed block as the given phase if timing is enabled """
+
+        return self.timer.phase(name, self.timings) if self.timer else nullcontext()
+
+    @staticmethod
+    def _on_wire(response):
+        """ Flag of if the body of the (streamed) response is still to be read from the connection """
+
+        return getattr(response, 'raw', None) is not None and not response._content_consumed
+
     def output_response(self, response):
+        if not (self.timer and self._on_wire(response)):
+            with self._phase('output_response'):
+                self._output_response(response)
+            return
+
+        # the body is read from the wire here: that part is network time, not output time
+        spent = {'read': 0.0}
+        start = time.perf_counter()
+        self._output_response(response, spent)
+        self.timer.record('net_download', response.timings['download'] + spent['read'], self.timings)
+        self.timer.record('output_response', time.perf_counter() - start - spent['read'], self.timings)
+
+    def _output_response(self, response, spent=None):
         self.status_code = response.status_code
-        logger.info('Response Status Code: [' + str(response.status_code) + ']')
-        text = response.text
+        self.content_type = response.headers.get('Content-Type', '')
+        logger.info('Response Status Code: [%s]', response.status_code)
 
-        try:
-            # response is in xml format
-            reparsed = minidom.parseString(text)
-            logger.info('Response Body: \n' + reparsed.toprettyxml(indent="\t"))
+        if self.rs_stream is not None:
+            self.rs_stream.close()  # replaced by this response
+            self.rs_stream = None
+
+        if self.compression is not None:
+            chunks = self.compression.iter_body(response, CHUNK_SIZE, self.transfer)
+        else:
+            chunks = response.iter_content(CHUNK_SIZE) if self.stream else None
+        if spent is not None:
+            chunks = _timed_chunks(chunks, spent)
 
-        except parsers.expat.ExpatError:
-            logger.info('Response Body: \n' + text)
+        if self.stream:
+            self.rs_stream = StreamedBody(self.content_type)
+            for chunk in chunks:
+                self.rs_stream.write(chunk)
+            logger.info('Response Body: <streamed, %d bytes>', self.rs_stream.size)
+            return
+
+        if chunks is not None:
+            response._content = b''.join(chunks)  # text below is decoded the same way requests does
+        text = response.text
+        log_body(logger, 'Response Body', text)
 
         self.rs_body = text
@@ -0,0 +1,178 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import weakref
+
+from requests.structures import CaseInsensitiveDict
+
+from taf.utils import json_dumps, json_loads, encoding
+from ._http_utils import _body_fits, _normalize_url, _encode_body, _decode_body, _build_response, _BODY_HEADERS
+
+logger = logging.getLogger(__name__)
+
+MODES = ('record', 'replay', 'auto')  # auto: replay what is recorded, record the rest
+
+DEFAULT_MATCH_ON = ('method', 'url', 'body')
+
+_open_cassettes = weakref.WeakSet()  # their index is written at exit, without keeping them alive
+
+
+@atexit.register
+def _close_all():
+    for cassette in list(_open_cassettes):
+        cassette.close()
+
+
+class Cassette:
+    def __init__(self, path, *, mode='auto', match_on=DEFAULT_MATCH_ON, match_headers=(), max_body_size=10 << 20):
+        """
+        Recorded responses served instead of the network, stored in <path> folder as an
+        append-only responses.jsonl plus index.json (fingerprint -> offsets of the entries)
+        :param path: folder of the cassette
+        :param mode: 'record' always sends and records, 'replay' never touches the network,
+                     'auto' replays the recorded requests and records the others
+        :param match_on: parts of the request in the fingerprint, any of 'method', 'url', 'body', 'headers'
+        :param match_headers: with 'headers' in match_on, names of the request headers to match
+        :param max_body_size: responses with larger bodies are not recorded, streamed ones without Content-Length neither
+        """
+
+        if mode not in MODES:
+            raise ValueError('Cassette mode <%s> should be one of %s' % (mode, MODES))
+        unknown = set(match_on) - {'method', 'url', 'body', 'headers'}
+        if unknown:
+            raise ValueError('Cannot match cassette requests on %s' % sorted(unknown))
+
+        self.path = path
+        self.mode = mode
+        self.match_on = tuple(match_on)
+        self.match_headers = tuple(h.lower() for h in match_headers)
+        self.max_body_size = max_body_size
+
+        self.hits = self.misses = self.recorded = 0
+
+        self._data_path = os.path.join(path, 'responses.jsonl')
+        self._index_path = os.path.join(path, 'index.json')
+        self._lock = threading.Lock()
+        self._served = {}  # fingerprint -> times replayed, repeated requests get the recordings in order
+        self._dirty = False
+
+        os.makedirs(path, exist_ok=True)
+        self._index = self._load_index()
+        _open_cassettes.add(self)
+
+    def _load_index(self):
+        size = os.path.getsize(self._data_path) if os.path.exists(self._data_path) else 0
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                index = json_loads(f.read())
+            if index['size'] == size:
+                return index['entries']
+
+        # missing or stale (e.g. run interrupted before close), rebuilt from the responses
+        entries, offset = {}, 0
+        if size:
+            with open(self._data_path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        entries.setdefault(json_loads(line)['fingerprint'], []).append(offset)
+                    offset += len(line)
+            self._dirty = True
+        return entries
+
+    def fingerprint(self, method, url, headers=None, body=None):
+        """ Hash of the parts of the request in <match_on> """
+
+        parts = {}
+        if 'method' in self.match_on:
+            parts['method'] = method.upper()
+        if 'url' in self.match_on:
+            parts['url'] = _normalize_url(url)
+        if 'body' in self.match_on:
+            parts.update(_encode_body(body))
+        if 'headers' in self.match_on:
+            headers = CaseInsensitiveDict(headers or {})
+            parts['headers'] = [[name, headers.get(name)] for name in self.match_headers]
+        return hashlib.sha1(json_dumps(parts).encode(encoding)).hexdigest()
+
+    def _read(self, offset):
+        with open(self._data_path, 'rb') as f:
+            f.seek(offset)
+            return json_loads(f.readline())
+
+    def _replay(self, fingerprint):
+        with self._lock:
+            offsets = self._index.get(fingerprint)
+            if not offsets:
+                self.misses += 1
+                return None
+            served = self._served.get(fingerprint, 0)
+            self._served[fingerprint] = served + 1
+            self.hits += 1
+        entry = self._read(offsets[min(served, len(offsets) - 1)])['response']
+        return _build_response(entry['status_code'], entry['url'], entry['headers'], entry.get('encoding'),
+                               _decode_body(entry))
+
+    def _record(self, fingerprint, method, url, headers, body, response):
+        # the body is stored decoded, so it is replayed without the headers of its encoding on the wire
+        response_headers = {name: value for name, value in response.headers.items()
+                            if name.lower() not in _BODY_HEADERS}
+        entry = {'fingerprint': fingerprint,
+                 'request': dict(_encode_body(body), method=method.upper(), url=url, headers=dict(headers or {})),
+                 'response': dict(_encode_body(response.content), status_code=response.status_code,
+                                  url=response.url, headers=response_headers, encoding=response.encoding)}
+        line = (json_dumps(entry) + '\n').encode(encoding)
+
+        with self._lock:
+            with open(self._data_path, 'ab') as f:
+                offset = f.tell()
+                f.write(line)
+            self._index.setdefault(fingerprint, []).append(offset)
+            self.recorded += 1
+            self._dirty = True
+
+    def request(self, send, method, url, **kwargs):
+        """
+        Serve the request from the cassette or send it (and record it) depending on <mode>
+        :param send: callable with the signature of SessionPool.request the requests are sent through
+        :return: requests.Response with <timings> attr (zeros when replayed)
+        """
+
+        headers, body = kwargs.get('headers'), kwargs.get('data')
+        fingerprint = self.fingerprint(method, url, headers, body)
+
+        if self.mode != 'record':
+            response = self._replay(fingerprint)
+            if response is not None:
+                return response
+
+            if self.mode == 'replay':
+                raise KeyError('No recorded response in cassette <%s> matches %s <%s>' % (self.path, method, url))
+
+        response = send(method, url, **kwargs)
+        if _body_fits(response, self.max_body_size):
+            self._record(fingerprint, method, url, headers, body, response)
+        else:
+            logger.warning('Response of %s <%s> is not recorded, its body is over %d bytes or of unknown size',
+                           method, url, self.max_body_size)
+        return response
+
+    def close(self):
+        """ Write the index of the recorded entries """
+
+        with self._lock:
+            if not self._dirty:
+                return
+            size = os.path.getsize(self._data_path) if os.path.exists(self._data_path) else 0
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(json_dumps({'size': size, 'entries': self._index}))
+            os.replace(tmp_path, self._index_path)
+            self._dirty = False
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'recorded': self.recorded,
+                    'requests': len(self._index)}
@@ -0,0 +1,263 @@
+import logging
+import threading
+import zlib
+
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# content codings in order of preference, those whose library is installed are advertised
+CODINGS = ('zstd', 'br', 'gzip', 'deflate')
+
+
+class _ZlibDecoder:
+    def __init__(self, wbits):
+        self._wbits = wbits
+        self._obj = zlib.decompressobj(wbits)
+        self._started = False
+
+    def decompress(self, data):
+        if self._started or self._wbits != zlib.MAX_WBITS:
+            return self._obj.decompress(data)
+
+        # some servers send raw deflate streams (no zlib header) as 'deflate'
+        self._started = True
+        try:
+            return self._obj.decompress(data)
+        except zlib.error:
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._obj.decompress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _Gzip:
+    name = 'gzip'
+
+    def __init__(self):
+        import gzip
+        self._gzip = gzip
+
+    def compress(self, data, level):
+        return self._gzip.compress(data, compresslevel=level, mtime=0)  # same bytes for the same body
+
+    def decoder(self):
+        return _ZlibDecoder(16 + zlib.MAX_WBITS)
+
+
+class _Deflate:
+    name = 'deflate'
+
+    def compress(self, data, level):
+        return zlib.compress(data, level)
+
+    def decoder(self):
+        return _ZlibDecoder(zlib.MAX_WBITS)
+
+
+class _BrotliDecoder:
+    def __init__(self, brotli):
+        self._obj = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return b''
+
+
+class _Brotli:
+    name = 'br'
+
+    def __init__(self):
+        import brotli
+        self._brotli = brotli
+
+    def compress(self, data, level):
+        return self._brotli.compress(data, quality=min(level, 11))
+
+    def decoder(self):
+        return _BrotliDecoder(self._brotli)
+
+
+class _Zstd:
+    name = 'zstd'
+
+    def __init__(self):
+        import zstandard
+        self._zstd = zstandard
+
+    def compress(self, data, level):
+        return self._zstd.ZstdCompressor(level=level).compress(data)
+
+    def decoder(self):
+        return self._zstd.ZstdDecompressor().decompressobj()
+
+
+_CODING_FACTORIES = {'gzip': _Gzip, 'deflate': _Deflate, 'br': _Brotli, 'zstd': _Zstd}
+
+
+def _load_codings():
+    codings = {}
+    for name in CODINGS:
+        try:
+            codings[name] = _CODING_FACTORIES[name]()
+        except ImportError:
+            continue
+    return codings
+
+
+_codings = _load_codings()
+
+
+def available_codings():
+    """ Content codings usable here, brotli and zstd need their optional libraries """
+
+    return tuple(_codings)
+
+
+class Compression:
+    def __init__(self, coding='gzip', *, threshold=1024, level=6, accept=None):
+        """
+        Transport compression of the api clients: request bodies are compressed, responses are negotiated
+        with Accept-Encoding and decompressed chunk by chunk, the wire and raw byte counts are recorded
+        :param coding: content coding of the request bodies, one of available_codings(), None to send them as they are
+        :param threshold: request bodies smaller than this many bytes are sent as they are
+        :param level: compression level of the request bodies
+        :param accept: content codings advertised in Accept-Encoding, default is all the available ones
+        """
+
+        for name in (coding,) + tuple(accept or ()):
+            if name is not None and name not in _codings:
+                raise ValueError('Content coding <%s> should be one of %s' % (name, available_codings()))
+
+        self.coding = coding
+        self.threshold = threshold
+        self.level = level
+        self.accept_encoding = ', '.join(accept or _codings)
+
+        self._counts = dict.fromkeys(
+            ('request_raw', 'request_wire', 'response_raw', 'response_wire', 'compressed_requests',
+             'compressed_responses'), 0)
+        self._lock = threading.Lock()
+
+    def _count(self, transfer):
+        with self._lock:
+            for name, val in transfer.items():
+                self._counts[name] += val
+
+    def encode_request(self, headers, data, transfer):
+        """
+        Compress the request body if large enough and advertise the accepted codings
+        :param headers: request headers, not modified
+        :param data: request body bytes
+        :param transfer: dict the byte counts of the request are put into, counted in <stats> by request()
+        :return: tuple of the headers and body to send
+        """
+
+        headers = CaseInsensitiveDict(headers or {})
+        headers.setdefault('Accept-Encoding', self.accept_encoding)
+
+        raw = len(data or b'')
+        compressed = self.coding and raw >= self.threshold and 'Content-Encoding' not in headers
+        if compressed:
+            data = _codings[self.coding].compress(data, self.level)
+            headers['Content-Encoding'] = self.coding
+
+        transfer.update(request_raw=raw, request_wire=len(data or b''), compressed_requests=int(bool(compressed)))
+        return headers, data
+
+    def request(self, send, transfer, method, url, **kwargs):
+        """
+        Send the request with its body compressed, the response is left on the wire for iter_body
+        :param send: callable with the signature of SessionPool.request the requests are sent through
+        :param transfer: dict the byte counts of the request are put into
+        :return: requests.Response
+        """
+
+        counts = {}
+        kwargs['headers'], kwargs['data'] = self.encode_request(kwargs.get('headers'), kwargs.get('data'), counts)
+        kwargs['stream'] = True  # the body is read (and decompressed) from the wire by iter_body
+
+        response = send(method, url, **kwargs)
+
+        # counted once sent, nothing goes out when the cassette or the http cache answers
+        transfer.update(counts)
+        self._count(counts)
+        return response
+
+    def decoders(self, content_encoding):
+        """
+        Streaming decoders of the Content-Encoding header, in the order to apply them
+        :return: list of objects with decompress(chunk) and flush(), empty for identity
+        """
+
+        decoders = []
+        for name in reversed([name.strip().lower() for name in (content_encoding or '').split(',')]):
+            if name in ('', 'identity'):
+                continue
+            if name not in _codings:
+                # the codings applied before it cannot be undone either, the rest is passed through as it is
+                logger.warning('Response content coding <%s> is not supported here, body is left encoded', name)
+                break
+            decoders.append(_codings[name].decoder())
+        return decoders
+
+    def iter_body(self, response, chunk_size, transfer):
+        """
+        Read the response body chunk by chunk from the wire, decompressing as it goes
+        :param response: requests.Response sent with stream=True
+        :param transfer: dict the byte counts of the response are put into
+        :return: the generator object of the decoded chunks
+        """
+
+        counts = {'response_raw': 0, 'response_wire': 0, 'compressed_responses': 0}
+
+        if getattr(response, 'raw', None) is None or response._content_consumed:
+            # replayed/cached (nothing on the wire) or already read by the cassette/http cache
+            content = response.content
+            counts['response_raw'] = len(content)
+            if getattr(response, 'raw', None) is not None:
+                counts['response_wire'] = int(response.headers.get('Content-Length') or len(content))
+            if content:
+                yield content
+        else:
+            try:
+                decoders = self.decoders(response.headers.get('Content-Encoding'))
+                counts['compressed_responses'] = int(bool(decoders))
+                for chunk in response.raw.stream(chunk_size, decode_content=False):
+                    counts['response_wire'] += len(chunk)
+                    for decoder in decoders:
+                        chunk = decoder.decompress(chunk)
+                    counts['response_raw'] += len(chunk)
+                    if chunk:
+                        yield chunk
+
+                tail = b''
+                for decoder in decoders:
+                    tail = decoder.decompress(tail) + decoder.flush() if tail else decoder.flush()
+                counts['response_raw'] += len(tail)
+                if tail:
+                    yield tail
+            finally:
+                # fully read, urllib3 has put the connection back to the pool already, otherwise it is closed
+                response.close()
+
+        transfer.update(counts)
+        self._count(counts)
+
+    @property
+    def stats(self):
+        """ Cumulative byte counts, the ratios are wire bytes over raw bytes """
+
+        with self._lock:
+            stats = dict(self._counts)
+        stats['request_ratio'] = stats['request_wire'] / stats['request_raw'] if stats['request_raw'] else 1.0
+        stats['response_ratio'] = stats['response_wire'] / stats['response_raw'] if stats['response_raw'] else 1.0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._counts:
+                self._counts[name] = 0
@@ -0,0 +1,321 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+from requests.structures import CaseInsensitiveDict
+
+from taf.utils import json_dumps, json_loads, encoding
+from taf.utils.perf_utils import atomic_write
+from ._http_utils import _body_fits, _normalize_url, _encode_body, _decode_body, _build_response, _BODY_HEADERS
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_METHODS = ('GET', 'HEAD')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')  # the others invalidate the cached url when they succeed
+
+CACHEABLE_STATUS = (200, 203)
+
+MAX_VARIANTS = 16  # responses kept per (method, url) when they vary on request headers
+
+
+def _directives(value):
+    """ Parse a Cache-Control header: 'max-age=60, no-cache' -> {'max-age': '60', 'no-cache': None} """
+
+    d = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            d[name.lower()] = arg.strip('"') if arg else None
+    return d
+
+
+def _http_date(value):
+    """ Timestamp of an http date header, None if missing or malformed """
+
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class HttpCache:
+    def __init__(self, maxsize=256, *, path=None, disk_maxsize=4096, default_ttl=0, max_body_size=10 << 20):
+        """
+        Opt-in private http cache of the idempotent (GET/HEAD) requests, honoring Cache-Control/Expires
+        and revalidating the stale responses with If-None-Match/If-Modified-Since
+        :param maxsize: max urls kept in memory, least recently used are evicted first
+        :param path: folder of the disk level (one json file per url), None to keep the responses in memory only
+        :param disk_maxsize: max urls kept on disk, least recently written are removed first
+        :param default_ttl: seconds a response without Cache-Control max-age/Expires stays fresh,
+                            0 to revalidate it on every request (if it has a validator, not cached otherwise)
+        :param max_body_size: responses with larger bodies are not cached, streamed ones without Content-Length neither
+        """
+
+        self.maxsize = maxsize
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.default_ttl = default_ttl
+        self.max_body_size = max_body_size
+
+        self.hits = self.revalidated = self.misses = self.bypassed = self.stored = self.evicted = 0
+
+        # (method, url) -> {'vary': request header names, 'variants': OrderedDict of their values -> entry}
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._files = OrderedDict()  # file names of the disk level, oldest first
+        if path:
+            os.makedirs(path, exist_ok=True)
+            names = [name for name in os.listdir(path) if name.endswith('.json')]
+            names.sort(key=lambda name: os.path.getmtime(os.path.join(path, name)))
+            self._files.update((name, None) for name in names)
+
+    def request(self, send, method, url, **kwargs):
+        """
+        Serve the request from the cache if fresh, revalidate it if stale, otherwise send it and cache the response
+        :param send: callable with the signature of SessionPool.request the requests are sent through
+        :return: requests.Response with <timings> attr (zeros when served from the cache)
+        """
+
+        method = method.upper()
+        if method not in CACHEABLE_METHODS:
+            response = send(method, url, **kwargs)
+            if method not in SAFE_METHODS and response.status_code < 400:
+                self.invalidate(url)
+            return response
+
+        headers = CaseInsensitiveDict(kwargs.get('headers') or {})
+        directives = _directives(headers.get('Cache-Control'))
+        if 'no-store' in directives:
+            self._count('bypassed')
+            return send(method, url, **kwargs)
+
+        key = (method, _normalize_url(url))
+        entry = self._lookup(key, headers)
+
+        if entry is not None:
+            must_revalidate = (entry['no_cache'] or 'no-cache' in directives
+                               or _int(directives.get('max-age'), None) == 0)
+            if not must_revalidate and time.time() - entry['stored_at'] < entry['lifetime']:
+                self._count('hits')
+                return self._response(entry)
+
+            stored_headers = CaseInsensitiveDict(entry['headers'])
+            validators = {}
+            if stored_headers.get('ETag'):
+                validators['If-None-Match'] = stored_headers['ETag']
+            if stored_headers.get('Last-Modified'):
+                validators['If-Modified-Since'] = stored_headers['Last-Modified']
+            if validators:
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **validators)
+
+        response = send(method, url, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            self._count('revalidated')
+            self._refresh(key, entry, response)
+            cached = self._response(entry)
+            cached.timings = response.timings
+            return cached
+
+        self._count('misses')
+        self._store(key, headers, response)
+        return response
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _response(self, entry):
+        response = _build_response(entry['status_code'], entry['url'], entry['headers'], entry['encoding'],
+                                   entry['content'])
+        response.from_cache = True
+        return response
+
+    def _lifetime(self, headers):
+        """ Freshness lifetime in seconds and no-cache flag of the response headers """
+
+        directives = _directives(headers.get('Cache-Control'))
+        no_cache = 'no-cache' in directives
+
+        if 'max-age' in directives:
+            return _int(directives['max-age']), no_cache
+        expires = _http_date(headers.get('Expires'))
+        if expires is not None:
+            return max(expires - (_http_date(headers.get('Date')) or time.time()), 0), no_cache
+        return self.default_ttl, no_cache
+
+    def _lookup(self, key, headers):
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                record = self._load(key)
+                if record is None:
+                    return None
+                self._remember(key, record)
+            else:
+                self._records.move_to_end(key)
+            return record['variants'].get(tuple(headers.get(name) for name in record['vary']))
+
+    def _store(self, key, headers, response):
+        if response.status_code not in CACHEABLE_STATUS:
+            return
+
+        directives = _directives(response.headers.get('Cache-Control'))
+        vary = tuple(sorted(name.strip().lower() for name in response.headers.get('Vary', '').split(',')
+                            if name.strip()))
+        if 'no-store' in directives or '*' in vary:
+            return
+
+        lifetime, no_cache = self._lifetime(response.headers)
+        has_validator = 'ETag' in response.headers or 'Last-Modified' in response.headers
+        if not (lifetime > 0 or has_validator):
+            return
+
+        if not _body_fits(response, self.max_body_size):
+            return
+        content = response.content  # read in full, also when streaming
+
+        # the content is stored decoded, so not with the headers of its encoding on the wire
+        stored_headers = {name: value for name, value in response.headers.items()
+                          if name.lower() not in _BODY_HEADERS}
+        entry = {'status_code': response.status_code, 'url': response.url, 'headers': stored_headers,
+                 'encoding': response.encoding, 'content': content, 'lifetime': lifetime, 'no_cache': no_cache,
+                 'stored_at': time.time() - _int(response.headers.get('Age'))}
+
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or record['vary'] != vary:
+                record = {'vary': vary, 'variants': OrderedDict()}
+            variants = record['variants']
+            variants[tuple(headers.get(name) for name in vary)] = entry
+            while len(variants) > MAX_VARIANTS:
+                variants.popitem(last=False)
+
+            self._remember(key, record)
+            self._save(key, record)
+            self.stored += 1
+
+    def _refresh(self, key, entry, response):
+        """ Update the stored response with the headers of the 304 revalidating it """
+
+        merged = CaseInsensitiveDict(entry['headers'])
+        # not taken from a 304, they describe the stored body rather than the resource
+        merged.update((name, value) for name, value in response.headers.items() if name.lower() not in _BODY_HEADERS)
+        entry['headers'] = dict(merged)
+        entry['lifetime'], entry['no_cache'] = self._lifetime(merged)
+        entry['stored_at'] = time.time() - _int(response.headers.get('Age'))
+
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._save(key, record)
+
+    def _remember(self, key, record):
+        """ Put record in the memory level, evicting the least recently used ones (under the lock) """
+
+        self._records[key] = record
+        self._records.move_to_end(key)
+        while len(self._records) > self.maxsize:
+            self._records.popitem(last=False)
+            self.evicted += 1
+
+    def _file_name(self, key):
+        return hashlib.sha1(json_dumps(list(key)).encode(encoding)).hexdigest() + '.json'
+
+    def _load(self, key):
+        """ Record of key from the disk level, None if not there (under the lock) """
+
+        if not self.path:
+            return None
+        name = self._file_name(key)
+        if name not in self._files:
+            return None
+
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                stored = json_loads(f.read())
+        except (OSError, ValueError):
+            logger.warning('Dropping unreadable http cache file <%s>', name)
+            self._files.pop(name, None)
+            return None
+
+        variants = OrderedDict()
+        for values, entry in stored['variants']:
+            entry['content'] = _decode_body(entry)
+            entry.pop('body', None)
+            entry.pop('body_b64', None)
+            variants[tuple(values)] = entry
+        return {'vary': tuple(stored['vary']), 'variants': variants}
+
+    def _save(self, key, record):
+        """ Write record into the disk level, removing the oldest files beyond <disk_maxsize> (under the lock) """
+
+        if not self.path:
+            return
+
+        variants = []
+        for values, entry in record['variants'].items():
+            stored = dict(entry, **_encode_body(entry['content']))
+            del stored['content']
+            variants.append([list(values), stored])
+
+        name = self._file_name(key)
+        atomic_write(os.path.join(self.path, name), json_dumps({'key': list(key), 'vary': list(record['vary']),
+                                                                 'variants': variants}))
+        self._files[name] = None
+        self._files.move_to_end(name)
+        while len(self._files) > self.disk_maxsize:
+            oldest, _ = self._files.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.path, oldest))
+            except OSError:
+                pass
+
+    def invalidate(self, url):
+        """ Drop the cached responses of url """
+
+        with self._lock:
+            for method in CACHEABLE_METHODS:
+                key = (method, _normalize_url(url))
+                self._records.pop(key, None)
+                name = self._file_name(key)
+                if name in self._files:
+                    del self._files[name]
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                    except OSError:
+                        pass
+
+    def clear(self):
+        """ Drop all the cached responses, memory and disk """
+
+        with self._lock:
+            self._records.clear()
+            for name in self._files:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+            self._files.clear()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses,
+                    'bypassed': self.bypassed, 'stored': self.stored, 'evicted': self.evicted,
+                    'entries': len(self._records), 'files': len(self._files)}
@@ -1,10 +1,6 @@
 import logging
-from xml import parsers
-from xml.dom import minidom
 
-import requests
-
-from taf.utils import typeassert
+from taf.utils import typeassert, log_body, encoding
 from .api_base_client import APIBaseClient
 
 logging.basicConfig(level=logging.INFO,
@@ -22,23 +18,18 @@ class RestBaseClient(APIBaseClient):
 
         url = url + '?' + '&'.join(
             '%s=%s' % (k, v) for k, v in params.items()) if params else url
-        logger.info('%s to <%s>' % (method, url))
-        logger.info('Headers: ' + str(headers))
-
-        try:
-            reparsed = minidom.parseString(rq_body)
-            logger.info('Request Body: \n' + reparsed.toprettyxml(indent="\t"))
-
-        except parsers.expat.ExpatError:
-            # request str is in json format
-            logger.info('Request Body: \n' + rq_body)
+        logger.info('%s to <%s>', method, url)
+        logger.info('Headers: %s', headers)
+        log_body(logger, 'Request Body', rq_body)
 
+        self.timings = {}
         response = None
-        if rq_body:
-            response = requests.request(method, url, headers=headers, data=rq_body,
-                                        verify=self.verify_ssl)
-        if params:
-            response = requests.request(method, url, headers=headers, verify=self.verify_ssl)
+        with self._phase('send_req'):
+            if rq_body:
+                response = self._request(method, url, headers=headers, data=rq_body.encode(encoding),
+                                         verify=self.verify_ssl)
+            if params:
+                response = self._request(method, url, headers=headers, verify=self.verify_ssl)
 
         logger.info('***********************  REQUEST END  ***********************')
 
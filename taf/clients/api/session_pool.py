@@ -0,0 +1,190 @@
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class _PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0  # connections taken from the pools
+        self.new_connections = 0  # connections actually opened (TCP/TLS handshake)
+
+    def incr(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = self.new_connections = 0
+
+    def as_dict(self):
+        with self._lock:
+            return {'checkouts': self.checkouts,
+                    'new_connections': self.new_connections,
+                    'reused_connections': self.checkouts - self.new_connections}
+
+
+_net = threading.local()  # connect time spent by the request running on current thread
+
+
+def _timed_connection(base, stats):
+    """ Subclass the urllib3 connection to count and measure the TCP/TLS connects """
+
+    class _TimedConnection(base):
+        def connect(self):
+            # counted here rather than in _new_conn, a closed connection is reconnected by the same object
+            stats.incr('new_connections')
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                _net.connect = getattr(_net, 'connect', 0) + time.perf_counter() - start
+
+    _TimedConnection.__name__ = 'Timed' + base.__name__
+    return _TimedConnection
+
+
+def _counting_pool(base, stats):
+    """ Subclass the urllib3 connection pool to record reuse vs new connections """
+
+    class _CountingPool(base):
+        ConnectionCls = _timed_connection(base.ConnectionCls, stats)
+
+        def _get_conn(self, *args, **kwargs):
+            stats.incr('checkouts')
+            return super()._get_conn(*args, **kwargs)
+
+    _CountingPool.__name__ = 'Counting' + base.__name__
+    return _CountingPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    def __init__(self, stats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self._stats),
+            'https': _counting_pool(HTTPSConnectionPool, self._stats)}
+
+
+class SessionPool:
+    _shared = None  # process-wide instance returned by SessionPool.shared()
+
+    _shared_lock = threading.Lock()
+
+    def __init__(self, *, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 host_limits=None, max_retries=0, keep_alive=True):
+        """
+        Constructor of SessionPool, a thread-safe keep-alive session shared by the api clients
+        :param pool_connections: number of host pools to keep cached
+        :param pool_maxsize: max connections kept alive per host
+        :param pool_block: flag of if waiting for a free connection when a host pool is exhausted
+        :param host_limits: mapping of host (or scheme://host) and its own pool_maxsize
+        :param max_retries: retries for failed connections, passed to HTTPAdapter
+        :param keep_alive: flag of if keeping the connections alive between requests
+        """
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.host_limits = host_limits or {}
+        self.max_retries = max_retries
+        self.keep_alive = keep_alive
+
+        self._stats = _PoolStats()
+        self._lock = threading.Lock()
+        self._session = None
+
+    @classmethod
+    def shared(cls):
+        """ Get the process-wide pool, created with default limits on first use """
+
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def set_shared(cls, pool):
+        """
+        Replace the process-wide pool, e.g. to apply custom limits for the whole run
+        :param pool: SessionPool instance, or None to fall back to the default one
+        """
+
+        with cls._shared_lock:
+            if cls._shared is not None and cls._shared is not pool:
+                cls._shared.close()
+            cls._shared = pool
+
+    def _adapter(self, maxsize):
+        return _CountingAdapter(self._stats, pool_connections=self.pool_connections,
+                                pool_maxsize=maxsize, pool_block=self.pool_block,
+                                max_retries=self.max_retries)
+
+    def _build_session(self):
+        session = requests.Session()
+
+        # behave like the stateless requests.request(): never carry cookies between test cases
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        session.mount('http://', self._adapter(self.pool_maxsize))
+        session.mount('https://', self._adapter(self.pool_maxsize))
+        for host, maxsize in self.host_limits.items():
+            prefixes = (host,) if '://' in host else ('http://' + host, 'https://' + host)
+            for prefix in prefixes:
+                session.mount(prefix, self._adapter(maxsize))
+        return session
+
+    @property
+    def session(self):
+        """ Underlying requests.Session, built lazily """
+
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        """
+        Same signature as requests.request(), but over the pooled connections,
+        the network time is broken down into <timings> attr of the response:
+        connect (TCP/TLS handshake, 0 if reused), ttfb (until headers received) and download (body)
+        """
+
+        _net.connect = 0
+        start = time.perf_counter()
+        response = self.session.request(method, url, **kwargs)
+        total = time.perf_counter() - start
+
+        headers_received = response.elapsed.total_seconds()
+        response.timings = {'connect': _net.connect,
+                            'ttfb': max(headers_received - _net.connect, 0),
+                            'download': max(total - headers_received, 0)}
+        return response
+
+    @property
+    def stats(self):
+        """ Counters of connection reuse versus new connections """
+
+        return self._stats.as_dict()
+
+    def reset_stats(self):
+        self._stats.reset()
+
+    def close(self):
+        """ Close all the pooled connections """
+
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -1,9 +1,6 @@
 import logging
-from xml.dom import minidom
 
-import requests
-
-from taf.utils import typeassert
+from taf.utils import typeassert, log_body, encoding
 from .api_base_client import APIBaseClient
 
 logging.basicConfig(level=logging.INFO,
@@ -15,14 +12,14 @@ class SoapBaseClient(APIBaseClient):
     @typeassert(rq_body=str)
     def send_req(self, url, headers, rq_body):
         logger.info('*********************** REQUEST START ***********************')
-        logger.info('%s to <%s>' % ('POST', url))
-        logger.info('Headers: ' + str(headers))
-
-        reparsed = minidom.parseString(rq_body)
-        logger.info('Request Body: \n' + reparsed.toprettyxml(indent="\t"))
-
-        response = requests.request('POST', url, headers=headers, data=rq_body,
-                                    verify=self.verify_ssl)
+        logger.info('%s to <%s>', 'POST', url)
+        logger.info('Headers: %s', headers)
+        log_body(logger, 'Request Body', rq_body)
+
+        self.timings = {}
+        with self._phase('send_req'):
+            response = self._request('POST', url, headers=headers, data=rq_body.encode(encoding),
+                                     verify=self.verify_ssl)
         logger.info('***********************  REQUEST END  ***********************')
 
         self.output_response(response)
@@ -1 +1,3 @@
-from .api_entrance import ApiEntrance
+from .api_entrance import ApiEntrance, DispatchResult
+from .load_runner import LoadRunner, LoadReport
+from .data_runner import DataDrivenRunner, iter_rows
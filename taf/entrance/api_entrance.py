@@ -1,27 +1,80 @@
-import json
+import logging
+from contextlib import nullcontext
 
 from ..clients.api import SoapBaseClient, RestBaseClient
-from ..utils import typeassert, JsonValidator, XmlValidator
+from ..objects.api import api_registry
+from ..utils import typeassert, with_request_id, bounded_imap, SchemaValidator, ParsedResponse
 from ..utils.err_msg import REQUIRE_NOT_FALSY, REQUIRE_NOT_TRUTHY
 
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class DispatchResult:
+    def __init__(self, index, api_obj=None, error=None):
+        """
+        Outcome of one request dispatched by ApiEntrance.dispatch_many
+        :param index: position of the request spec in the batch
+        :param api_obj: APIBaseObject's subclass instance which handled the request
+        :param error: exception raised while dispatching or processing, None if passed
+        """
+
+        self.index = index
+        self.api_obj = api_obj
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return '<DispatchResult #%d %s>' % (self.index, 'ok' if self.ok else repr(self.error))
+
 
 class ApiEntrance:
-    def __init__(self, module_name, cls_name, *args, **kwargs):
+    session_pool = None  # SessionPool reused across dispatches, None for the process-wide one
+
+    timer = None  # PhaseTimer aggregating the time of each dispatch phase, None to disable timing
+
+    cassette = None  # Cassette to record/replay the responses, None to always use the network
+
+    http_cache = None  # HttpCache of the idempotent REST calls (e.g. reference data), None to disable
+
+    compression = None  # Compression of the request bodies and the responses, None to leave it to requests
+
+    # flag of if cloning the api obj prepared once per (class, ctor args) instead of constructing it, see
+    # api_registry; only for subclasses whose constructor state can be deep-copied
+    reuse_prototypes = False
+
+    def __init__(self, module_name, cls_name, *args, reuse_prototypes=None, **kwargs):
         """
         Constructor of class ApiEntrance
         :param module_name: name of the module in which APIBaseObject's subclass located
         :param cls_name: name of the APIBaseObject's subclass
         :param args: Signatures to match the APIBaseObject's subclass's own constructor
+        :param reuse_prototypes: overrides <reuse_prototypes> of the class if not None
         :param kwargs: Signatures to match the APIBaseObject's subclass's own constructor
         """
 
-        module = __import__('src.objects.api.' + module_name,
-                            fromlist=[''])  # 'fromlist' arg is not an empty list
-        self.api_obj = getattr(module, cls_name)(*args, **kwargs)
+        if reuse_prototypes is not None:
+            self.reuse_prototypes = reuse_prototypes  # known before the api obj is built
+        self._ctor_args = module_name, cls_name, args, kwargs
+
+        cls = api_registry.resolve(module_name, cls_name)
+        self.api_obj = api_registry.new(cls, *args, **kwargs) if self.reuse_prototypes else cls(*args, **kwargs)
+
+        self.timings = {}  # time breakdown of the last dispatch, filled when timer is set
+
+    def _timed(self, phase):
+        """ Time the enclosed block as a dispatch phase if timing is enabled """
 
-    @typeassert(dict, j=dict, extra_headers=dict)
+        return self.timer.phase(phase, self.timings) if self.timer else nullcontext()
+
+    @with_request_id
+    @typeassert(json_mapping=dict, j=dict, extra_headers=dict)
     def dispatch_soap_request(self, json_mapping=None, *, j=None, verify_ssl=False, schema_path=None,
-                              extra_headers=None, **xml_args):
+                              extra_headers=None, pool=None, stream=False, item_path=None, **xml_args):
         """
         Entrance to dispatch soap request
         :param json_mapping: mapping of json file name and obj name
@@ -29,35 +82,42 @@ class ApiEntrance:
         :param verify_ssl: flag of if verifying ssl, default is False
         :param schema_path: path of XmlSchema file inside the schema folder for reference
         :param extra_headers: extra headers for the request
+        :param pool: SessionPool to send the request through, default is <session_pool>
+        :param stream: flag of if streaming the response to a temp file and parsing it incrementally
+        :param item_path: with stream, name of the repeated element to iterate lazily via <_rs_items>
         :param xml_args: arguments used to construct SOAP body
         """
 
-        if json_mapping or j is None:
+        if not (json_mapping or j):
             raise TypeError(REQUIRE_NOT_FALSY % ['json_mapping', 'j'])
 
-        if json_mapping:
-            self.api_obj.unpack_json(json_mapping)
+        self.timings = {}
+        with self._timed('unpack_json'):
+            if json_mapping:
+                self.api_obj.unpack_json(json_mapping)
+
+            if j:
+                self.api_obj.unpack_json(j=j)
 
-        if j:
-            self.api_obj.unpack_json(j=j)
-        self.api_obj.construct_xml(soap=True, **xml_args)
+        with self._timed('construct_xml'):
+            self.api_obj.construct_xml(soap=True, **xml_args)
 
         extra_headers = extra_headers or {}
         if extra_headers:
-            self.api_obj.append_headers(extra_headers)
+            self.api_obj.append_headers(**extra_headers)
 
-        client = SoapBaseClient(verify_ssl=verify_ssl)
+        client = SoapBaseClient(verify_ssl=verify_ssl, pool=pool or self.session_pool, timer=self.timer,
+                                stream=stream, cassette=self.cassette, compression=self.compression)
         client.send_req(self.api_obj.url, self.api_obj.default_headers, self.api_obj.rq_body)
+        self.timings.update(client.timings)  # send_req, net_* and output_response
 
-        schema_path = schema_path or ''
-        if schema_path:
-            XmlValidator(client.rs_body, schema_path).validate_schema()
-
-        self.api_obj.load_client_response(client.rs_body).process_response()
+        self._process(client, schema_path, item_path, kind='xml')
 
+    @with_request_id
     @typeassert(json_mapping=dict, j=dict, extra_headers=dict)
     def dispatch_rest_request(self, method, json_mapping=None, *, j=None, xml_format=False, verify_ssl=False,
-                              extra_headers=None, with_query=None, with_body=None, schema_path=None):
+                              extra_headers=None, with_query=None, with_body=None, schema_path=None,
+                              pool=None, stream=False, item_path=None):
 
         """
         Entrance to dispatch rest request
@@ -69,7 +129,10 @@ class ApiEntrance:
         :param extra_headers: extra headers for the request
         :param with_query: flag of if the request is with query params in the url
         :param with_body: flag of if the request is with request body
-        :param schema_path: path of JsonSchema file inside the schema folder for reference
+        :param schema_path: path of JsonSchema (XmlSchema for xml response) file inside the schema folder for reference
+        :param pool: SessionPool to send the request through, default is <session_pool>
+        :param stream: flag of if streaming the response to a temp file and parsing it incrementally
+        :param item_path: with stream, dotted path of the array to iterate lazily via <_rs_items>
         """
 
         with_query = with_query or False
@@ -81,38 +144,126 @@ class ApiEntrance:
         if with_query and with_body:
             raise TypeError(REQUIRE_NOT_TRUTHY % ['with_query', 'with_body'])
 
-        if json_mapping or j is None:
+        if not (json_mapping or j):
             raise TypeError(REQUIRE_NOT_FALSY % ['json_mapping', 'j'])
 
-        if json_mapping:
-            self.api_obj.unpack_json(json_mapping)
+        self.timings = {}
+        with self._timed('unpack_json'):
+            if json_mapping:
+                self.api_obj.unpack_json(json_mapping)
 
-        if j:
-            self.api_obj.unpack_json(j=j)
+            if j:
+                self.api_obj.unpack_json(j=j)
 
         if xml_format:
-            self.api_obj.construct_xml()  # construct request with XML format
+            with self._timed('construct_xml'):
+                self.api_obj.construct_xml()  # construct request with XML format
         else:
-            self.api_obj.unflatten_json()  # construct request with JSON format
+            with self._timed('unflatten_json'):
+                self.api_obj.unflatten_json()  # construct request with JSON format
 
         extra_headers = extra_headers or {}
         if extra_headers:
-            self.api_obj.append_headers(extra_headers)
+            self.api_obj.append_headers(**extra_headers)
 
-        client = RestBaseClient(verify_ssl=verify_ssl)
+        client = RestBaseClient(verify_ssl=verify_ssl, pool=pool or self.session_pool, timer=self.timer,
+                                stream=stream, cassette=self.cassette, http_cache=self.http_cache,
+                                compression=self.compression)
 
         if with_query:
             client.send_req(method, self.api_obj.url, self.api_obj.default_headers,
                             params=self.api_obj.rq_dict)
         if with_body:
+            # compact on the wire, the body log is pretty printed on demand (see configure_body_log)
             client.send_req(method, self.api_obj.url, self.api_obj.default_headers,
-                            # 'indent' arg for pretty print
-                            rq_body=json.dumps(self.api_obj.rq_dict, indent=4))
-
-        schema_path = schema_path or ''
-        if schema_path:
-            if xml_format:
-                XmlValidator(client.rs_body, schema_path).validate_schema()
-            else:
-                JsonValidator(client.rs_body, schema_path).validate_schema()
-        self.api_obj.load_client_response(client.rs_body).process_response()
+                            rq_body=self.api_obj.dump_json())
+        self.timings.update(client.timings)  # send_req, net_* and output_response
+
+        self._process(client, schema_path, item_path)
+
+    def _process(self, client, schema_path=None, item_path=None, kind=None):
+        """
+        Parse the response once, validate it, load it into the api obj and run its own assertions
+        :param kind: 'json' or 'xml' to force the parser, picked from Content-Type if None
+        """
+
+        if client.stream:
+            if schema_path:
+                logger.warning('Schema validation is skipped for streamed response')
+            with self._timed('load_client_response'):
+                self.api_obj.load_client_stream(client.rs_stream, item_path)
+            if item_path is None:
+                client.rs_stream.close()  # parsed in full, otherwise the api obj closes it once replaced
+        else:
+            with self._timed('parse_response'):
+                parsed = ParsedResponse(client.rs_body, client.content_type, kind)
+                parsed.doc  # noqa, parse on demand
+
+            if schema_path:
+                with self._timed('validate_schema'):
+                    # picked by the schema, a response of the other format is reported as failed
+                    validator = SchemaValidator.for_schema(schema_path)
+                    doc = parsed.doc if parsed.kind == validator.kind else None
+                    validator(parsed.body, schema_path, doc=doc, body_kind=parsed.kind).validate_schema()
+
+            with self._timed('load_client_response'):
+                self.api_obj.load_parsed_response(parsed)
+
+        with self._timed('process_response'):
+            self.api_obj.process_response()
+
+    @typeassert(specs=list, workers=int)
+    def dispatch_many(self, specs, *, workers=10, soap=False, **common):
+        """
+        Entrance to dispatch a batch of requests concurrently on a bounded worker pool,
+        each request is handled by a fresh instance of the APIBaseObject's subclass
+        :param specs: list of dict, each holds the kwargs of dispatch_rest_request/dispatch_soap_request
+                      ('headers' is accepted as an alias of 'extra_headers')
+        :param workers: max number of requests in flight
+        :param soap: flag of if dispatching soap requests, default is rest
+        :param common: kwargs shared by all the specs, overwritten by the ones in spec
+        :return: list of DispatchResult in the same order as specs
+        """
+
+        def _dispatch(indexed):
+            index, spec = indexed
+
+            entrance = None
+            try:
+                entrance = self.spawn()
+                entrance.dispatch_spec(spec, soap=soap, **common)
+                return DispatchResult(index, entrance.api_obj)
+            except Exception as err:
+                return DispatchResult(index, entrance and entrance.api_obj, err)
+
+        return list(bounded_imap(_dispatch, enumerate(specs), workers))
+
+    def dispatch_spec(self, spec, *, soap=False, **common):
+        """
+        Dispatch one request described by a spec dict
+        :param spec: kwargs of dispatch_rest_request/dispatch_soap_request
+                     ('headers' is accepted as an alias of 'extra_headers')
+        :param soap: flag of if dispatching soap request, default is rest
+        :param common: default kwargs, overwritten by the ones in spec
+        """
+
+        kwargs = dict(common, **spec)
+        if 'headers' in kwargs:
+            kwargs['extra_headers'] = kwargs.pop('headers')
+
+        if soap:
+            self.dispatch_soap_request(**kwargs)
+        else:
+            self.dispatch_rest_request(**kwargs)
+
+    def spawn(self):
+        """ New ApiEntrance on a fresh instance of the same APIBaseObject's subclass """
+
+        module_name, cls_name, args, kwargs = self._ctor_args
+        entrance = type(self)(module_name, cls_name, *args, reuse_prototypes=self.reuse_prototypes, **kwargs)
+        entrance.session_pool = self.session_pool
+        entrance.timer = self.timer
+        entrance.cassette = self.cassette
+        entrance.http_cache = self.http_cache
+        entrance.compression = self.compression
+        return entrance
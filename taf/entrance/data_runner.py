@@ -0,0 +1,159 @@
+import csv
+import logging
+import os
+import time
+from collections import Counter
+from itertools import islice
+
+from ..utils import typeassert, bounded_imap, json_dumps, json_loads, encoding
+from ..utils.perf_utils import atomic_write
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def iter_rows(path):
+    """
+    Read the dataset lazily, one row at a time
+    :param path: path of the .csv (with header) or .jsonl file
+    :return: the generator object of dict
+    """
+
+    with open(path, newline='', encoding=encoding) as f:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(f)
+        elif path.endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json_loads(line)
+        else:
+            raise ValueError('Dataset <%s> should be either .csv or .jsonl' % path)
+
+
+class DataDrivenRunner:
+    def __init__(self, entrance, dataset, *, columns=None, soap=False, **common):
+        """
+        Constructor of DataDrivenRunner, dispatches one request per row of a dataset
+        :param entrance: ApiEntrance of the APIBaseObject's subclass under test
+        :param dataset: path of the .csv or .jsonl file
+        :param columns: mapping of column name and its target, either '{{var}}' to feed the placeholder
+                        or a flat json key to set in the request body; columns left out are ignored;
+                        if None, every column feeds the placeholder of the same name
+        :param soap: flag of if dispatching soap requests, default is rest
+        :param common: kwargs of dispatch_rest_request/dispatch_soap_request shared by all the rows,
+                       <json_mapping> is the template body the rows are applied on
+        """
+
+        self.entrance = entrance
+        self.dataset = dataset
+        self.soap = soap
+        self.common = dict(common)
+
+        self._vars, self._keys = {}, {}  # column -> variable key / flat json key
+        for column, target in (columns or {}).items():
+            if target.startswith('{{') and target.endswith('}}'):
+                self._vars[column] = target[2:-2].strip()
+            else:
+                self._keys[column] = target
+        self._all_vars = columns is None
+
+        # read once, the rows are applied on a copy of it
+        self._template = entrance.api_obj.load_json(self.common.pop('json_mapping', None))
+        if not (self._template or self._keys):
+            raise ValueError('Request body of <%s> is empty, give <json_mapping> or map columns to flat json keys'
+                             % dataset)
+
+    def _dispatch(self, numbered):
+        """ Dispatch the request of one row, returns the result record """
+
+        row_no, row = numbered
+        start = time.perf_counter()
+
+        error = None
+        try:
+            entrance = self.entrance.spawn()
+
+            if self._all_vars:
+                variables = row
+            else:
+                variables = dict((key, row[column]) for column, key in self._vars.items())
+            entrance.api_obj.set_variables(**variables)
+
+            j = dict(self._template)
+            for column, key in self._keys.items():
+                j[key] = row[column]
+
+            entrance.dispatch_spec({'j': j}, soap=self.soap, **self.common)
+        except Exception as err:
+            error = '%s: %s' % (type(err).__name__, err)
+
+        return {'row': row_no, 'ok': error is None, 'error': error, 'elapsed': time.perf_counter() - start}
+
+    def _read_checkpoint(self, path):
+        """
+        :return: tuple of the last row done and the size of the results file at that point
+        """
+
+        if not (path and os.path.exists(path)):
+            return 0, 0
+
+        with open(path) as f:
+            checkpoint = json_loads(f.read())
+        if checkpoint['dataset'] != os.path.abspath(self.dataset):
+            raise ValueError('Checkpoint <%s> belongs to another dataset <%s>' % (path, checkpoint['dataset']))
+        return checkpoint['row'], checkpoint['offset']
+
+    @staticmethod
+    def _open_results(path, offset):
+        """ Open the results file for writing, dropping what was written after the checkpoint """
+
+        if not (offset and os.path.exists(path)):
+            return open(path, 'wb')
+
+        results = open(path, 'r+b')
+        results.truncate(offset)  # the rows after the checkpoint are dispatched again
+        results.seek(offset)
+        return results
+
+    @typeassert(workers=int, checkpoint_every=int)
+    def run(self, results_path, *, workers=10, checkpoint_path=None, checkpoint_every=100):
+        """
+        Dispatch all the rows with at most <workers> requests in flight, memory does not grow with the dataset
+        :param results_path: path of the .jsonl file the result of each row is appended to as soon as known
+        :param workers: max number of requests in flight
+        :param checkpoint_path: path of the checkpoint file, if it exists the run resumes after the rows
+                                it recorded as done
+        :param checkpoint_every: number of rows between two checkpoints
+        :return: dict of the run statistics
+        """
+
+        done, offset = self._read_checkpoint(checkpoint_path)
+        if done:
+            logger.info('Resuming <%s> after row %d', self.dataset, done)
+
+        def _save(row_no):
+            results.flush()
+            atomic_write(checkpoint_path, json_dumps({'dataset': os.path.abspath(self.dataset), 'row': row_no,
+                                                      'offset': results.tell()}))
+
+        counts = Counter()
+        start = time.perf_counter()
+        rows = islice(enumerate(iter_rows(self.dataset), 1), done, None)
+
+        # rows finish in order, so every row up to the last written one is done
+        with self._open_results(results_path, offset) as results:
+            for n, result in enumerate(bounded_imap(self._dispatch, rows, workers), 1):
+                results.write((json_dumps(result) + '\n').encode(encoding))
+                counts['passed' if result['ok'] else 'failed'] += 1
+
+                if checkpoint_path and n % checkpoint_every == 0:
+                    _save(result['row'])
+
+            if checkpoint_path and counts:
+                _save(result['row'])
+
+        stats = {'dataset': self.dataset, 'skipped': done, 'passed': counts['passed'],
+                 'failed': counts['failed'], 'elapsed': time.perf_counter() - start}
+        logger.info('Data-driven run finished: %s', stats)
+        return stats
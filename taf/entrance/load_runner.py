@@ -0,0 +1,143 @@
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils import typeassert, LatencyHistogram
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class LoadReport:
+    def __init__(self, histograms, errors, elapsed, mode):
+        """
+        Result of a LoadRunner run
+        :param histograms: list of LatencyHistogram, one per request spec
+        :param errors: Counter of exception class name raised by the requests
+        :param elapsed: wall time of the run in seconds
+        :param mode: 'open-loop' or 'closed-loop'
+        """
+
+        self.histograms = histograms
+        self.errors = errors
+        self.elapsed = elapsed
+        self.mode = mode
+
+        self.histogram = LatencyHistogram()  # all the specs merged
+        for histogram in histograms:
+            self.histogram.merge(histogram)
+
+    @property
+    def count(self):
+        return self.histogram.count
+
+    @property
+    def throughput(self):
+        """ Completed requests per second """
+
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self):
+        return sum(self.errors.values()) / self.count if self.count else 0.0
+
+    def summary(self):
+        """ Dict of the run statistics, latencies in seconds """
+
+        d = self.histogram.summary()
+        d.update(mode=self.mode, elapsed=self.elapsed, throughput=self.throughput,
+                 error_rate=self.error_rate, errors=dict(self.errors))
+        return d
+
+    def __str__(self):
+        s = self.summary()
+        return ('[%s] %d requests in %.2fs, %.1f req/s, error rate %.2f%%\n'
+                'latency(ms): p50=%.2f p90=%.2f p99=%.2f p99.9=%.2f max=%.2f' % (
+                    s['mode'], s['count'], s['elapsed'], s['throughput'], s['error_rate'] * 100,
+                    s['p50'] * 1e3, s['p90'] * 1e3, s['p99'] * 1e3, s['p999'] * 1e3, s['max'] * 1e3))
+
+
+class LoadRunner:
+    def __init__(self, entrance, specs, *, soap=False, **common):
+        """
+        Constructor of LoadRunner, replays request specs through an ApiEntrance under load
+        :param entrance: ApiEntrance of the APIBaseObject's subclass under test
+        :param specs: list of dict, each holds the kwargs of dispatch_rest_request/dispatch_soap_request,
+                      the same specs used by ApiEntrance.dispatch_many
+        :param soap: flag of if dispatching soap requests, default is rest
+        :param common: kwargs shared by all the specs, overwritten by the ones in spec
+        """
+
+        if not specs:
+            raise ValueError('At least one request spec is required')
+
+        self.entrance = entrance
+        self.specs = specs
+        self.soap = soap
+        self.common = common
+
+    def _fire(self, index, intended, histograms, errors, lock):
+        """
+        Dispatch one request and record its latency counted from the intended start time
+        """
+
+        try:
+            self.entrance.spawn().dispatch_spec(self.specs[index], soap=self.soap, **self.common)
+        except Exception as err:
+            with lock:
+                errors[type(err).__name__] += 1
+        histograms[index].record(time.perf_counter() - intended)
+
+    @typeassert(duration=(int, float), rate=(int, float), concurrency=int)
+    def run(self, duration, *, rate=None, concurrency=10):
+        """
+        Run the load
+        :param duration: length of the run in seconds
+        :param rate: target requests per second; if given, requests are scheduled open-loop at fixed
+                     intervals and latency is measured from the scheduled time, so a stalled server
+                     cannot hide tail latency (no coordinated omission); otherwise <concurrency>
+                     workers send requests back-to-back (closed-loop)
+        :param concurrency: number of workers sending requests
+        :return: LoadReport
+        """
+
+        histograms = [LatencyHistogram() for _ in self.specs]
+        errors, lock = Counter(), threading.Lock()
+
+        def fire(index, intended):
+            self._fire(index, intended, histograms, errors, lock)
+
+        start = time.perf_counter()
+        deadline = start + duration
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            if rate:
+                interval = 1 / rate
+                for n, index in enumerate(itertools.cycle(range(len(self.specs)))):
+                    intended = start + n * interval
+                    if intended >= deadline:
+                        break
+
+                    delay = intended - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    executor.submit(fire, index, intended)
+            else:
+                def _worker(offset):
+                    for index in itertools.islice(itertools.cycle(range(len(self.specs))), offset, None):
+                        now = time.perf_counter()
+                        if now >= deadline:
+                            return
+                        fire(index, now)
+
+                for worker in range(concurrency):
+                    executor.submit(_worker, worker)
+
+        report = LoadReport(histograms, errors, time.perf_counter() - start,
+                            'open-loop' if rate else 'closed-loop')
+        logger.info('Load run finished: %s', report)
+        return report
@@ -1,3 +1,4 @@
 from .api_base_obj import APIBaseObject
 from .rest_base_obj import RestBaseObject
 from .soap_base_obj import SoapBaseObject
+from .registry import api_registry, ApiObjectRegistry
@@ -1,10 +1,109 @@
-import json
 import re
-from functools import partial
+import threading
+from collections import OrderedDict
+from copy import copy, deepcopy
+from functools import partial, lru_cache
+from itertools import chain
 
 import lxml.etree as et
 
-from taf.utils import typeassert, CustomDict, xml2dict, var_dict, proj_root, encoding, cannot_be_instantiated
+from taf.utils import typeassert, CustomDict, response_view, xml2dict, var_dict, var_overrides, proj_root, cannot_be_instantiated
+from taf.utils import fixture_cache, xml_dumps
+from .registry import api_registry
+
+_var_patt = re.compile(r'{{(.*?)}}')  # placeholder of variables in the json values
+
+_xml_templates_lock = threading.Lock()  # guards the skeleton caches of all the classes
+
+
+@lru_cache(maxsize=4096)
+def _compile_template(val):
+    """
+    Split the templated str once into its literal and variable parts
+    :param val: str containing {{var}} placeholders
+    :return: tuple of (is_var, text) pairs
+    """
+
+    parts, pos = [], 0
+    for match in _var_patt.finditer(val):
+        if match.start() > pos:
+            parts.append((False, val[pos:match.start()]))
+        parts.append((True, match.group(1)))
+        pos = match.end()
+
+    if pos < len(val):
+        parts.append((False, val[pos:]))
+    return tuple(parts)
+
+
+_attrs_patt = re.compile(r'(.*?)\((.*?)\)')  # node(attr1='val1', attr2='val2')
+_index_patt = re.compile(r'(.*?)\[(.*?)\]')  # node[index]
+_ns_patt = re.compile(r'(\w+):(\w+)')  # ns:tag
+
+
+@lru_cache(maxsize=4096)
+def _parse_node(node):
+    """
+    Parse one segment of the flat json key
+    :param node: segment like name(k='v')[i]
+    :return: tuple of node name, dict of attributes and index (None if not indexed)
+    """
+
+    attr_dict = {}
+    match = _attrs_patt.search(node)
+    if match:
+        for kv in match.group(2).split(','):
+            attr_key, attr_val = kv.strip().split('=')
+            attr_dict[attr_key.strip()] = attr_val.strip().replace('\'', '')
+        node = match.group(1)
+
+    index = None
+    match = _index_patt.match(node)
+    if match:
+        index = int(match.group(2))
+        node = match.group(1)
+
+    return node, attr_dict, index
+
+
+def _create_subelement(ele, name, attr_dict, nsmap):
+    """ Create sub-element with attributes for current node """
+
+    m = _ns_patt.match(name)
+    if m:
+        ns, tag = m.groups()
+        sub_ele = et.SubElement(ele, nsmap[ns] + tag)
+    else:
+        sub_ele = et.SubElement(ele, name)
+
+    for k, v in attr_dict.items():
+        sub_ele.set(k, v)
+    return sub_ele
+
+
+def _track_created(found_cache, ele):
+    """
+    Update the cached findall results of the ancestors after a new element is appended:
+    it is the last descendant in document order while its ancestors are last children,
+    otherwise the cached result of that ancestor is dropped and searched again on demand
+    """
+
+    is_last, child, ancestor = True, ele, ele.getparent()
+    while ancestor is not None:
+        is_last = is_last and child.getnext() is None
+
+        found = found_cache.get((ancestor, ele.tag))
+        if found is not None:
+            if is_last:
+                found.append(ele)
+            else:
+                del found_cache[(ancestor, ele.tag)]
+        child, ancestor = ancestor, ancestor.getparent()
+
+
+# attrs clone() rebuilds instead of copying
+_CLONE_REBUILT = ('globals', 'envs', '_var_index', 'url', '_flat_dict', 'rq_dict', '_rs_dict', '_rs_parsed',
+                  '_rs_items', '_rs_stream')
 
 
 class APIBaseObject:
@@ -18,28 +117,92 @@ class APIBaseObject:
 
     rq_body = ''  # assembled request body
 
+    strip_ns = False  # flag of if stripping the ns prefix when parsing xml response
+
+    # flag of if <_rs_dict> is a read-only ResponseView over the parsed response (no copies on lookup)
+    # instead of a CustomDict
+    use_response_view = False
+
+    compiled_xml = True  # flag of if construct_xml reuses the skeleton compiled for the same keys
+
+    xml_template_cache_size = 64  # max compiled skeletons cached per class
+
     __new__ = partial(cannot_be_instantiated, name='APIBaseObject')
 
     def __init__(self, env, rq_name=None):
-        with open(proj_root + '/env/globals.json') as f1:
-            self.globals = json.load(f1)  # container for global variables
+        self._env = env
+        self._load_env()
+
+        # name of root node when request data is in xml format
+        if rq_name:
+            self._rq_name = rq_name
 
-        with open(proj_root + '/env/' + env + '.json') as f2:
-            self.envs = json.load(f2)  # container for env variables
+        self._new_request_state()
+
+    def _load_env(self):
+        """ Read the variables of <_env> and build the request url from them """
+
+        # read-only views shared through the fixture cache (re-read when the files change)
+        self.globals = fixture_cache.load(proj_root + '/env/globals.json')  # container for global variables
+        self.envs = fixture_cache.load(proj_root + '/env/' + self._env + '.json')  # container for env variables
+
+        self.refresh_variables()
 
         # request url
         self.url = '/'.join(
             (self._get_property_from_variables('BaseUrl'),
              self._get_property_from_variables('Context'), self.endpoint))
 
-        # name of root node when request data is in xml format
-        if rq_name:
-            self._rq_name = rq_name
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        api_registry.register(cls)
 
+    def reset(self):
+        """
+        Drop the state of the last request, so the obj is ready for a new one,
+        subclasses holding their own per-request state should extend it
+        """
+
+        # instance level overrides set by append_headers and construct_xml
+        self.__dict__.pop('default_headers', None)
+        self.__dict__.pop('rq_body', None)
+
+        self._hold_stream(None)
+        self._new_request_state()
+
+    def _new_request_state(self):
         self._flat_dict = {}  # flat dict parsed from the json file
 
         self.rq_dict, self._rs_dict = {}, {}  # parsed from rq_body and rs_body
 
+        self._rs_parsed = None  # ParsedResponse of rs_body, its <doc> is the json obj or lxml root element
+
+        self._rs_items = iter(())  # lazy items of streamed response, see load_client_stream
+
+        self._rs_stream = None  # StreamedBody <_rs_items> are read from, closed once replaced
+
+    def _hold_stream(self, rs_stream):
+        """ Keep rs_stream for the lazy items, closing the one held before """
+
+        previous = self.__dict__.get('_rs_stream')
+        if previous is not None and previous is not rs_stream:
+            previous.close()
+        self._rs_stream = rs_stream
+
+    def clone(self):
+        """
+        Independent copy of the obj as its constructor left it (used on prototypes, see api_registry):
+        the state of subclasses is deep-copied, the env files are re-read if they changed
+        and the request state is clean
+        """
+
+        obj = copy(self)
+        obj.__dict__ = deepcopy(dict((key, val) for key, val in self.__dict__.items()
+                                     if key not in _CLONE_REBUILT))
+        obj._load_env()
+        obj._new_request_state()
+        return obj
+
     @typeassert(ns_attrs=dict, nsmap=dict)
     def construct_xml(self, soap=False, ns_attrs=None, nsmap=None, **attrs):
         """ Assemble the request xml body """
@@ -62,10 +225,13 @@ class APIBaseObject:
         if nsmap is None:
             nsmap = {}
 
-        root = et.Element(self._rq_name, attrib, nsmap, **attrs)
-        root = self._flatjson2xml(root, self._flat_dict, nsmap)
+        if self.compiled_xml:
+            root = self._compiled_xml(attrib, nsmap, attrs)
+        else:
+            root = et.Element(self._rq_name, attrib, nsmap, **attrs)
+            root = self._flatjson2xml(root, self._flat_dict, nsmap)
 
-        raw = et.tostring(root).decode(encoding)
+        raw = xml_dumps(root)
         self.rq_body = self.soap_skin % raw if soap else raw
 
     def _flatjson2xml(self, root, rq_dict, nsmap):
@@ -75,57 +241,84 @@ class APIBaseObject:
         :param rq_dict: dict parsed from the json file
         """
 
-        def _create_subelement(ele, name):
-            """ Create sub-element for current node """
+        found_cache = {}
+        for key, value in rq_dict.items():
+            self._locate(root, key, nsmap, found_cache).text = value
 
-            m = re.match(r'(\w+):(\w+)', name)
-            if m:
-                ns, tag = m.groups()
-                return et.SubElement(ele, nsmap[ns] + tag)
-            else:
-                return et.SubElement(ele, name)
+        return root
 
-        def _setattrs(ele, d):
-            """ Set attributes for specific node """
+    def _locate(self, root, key, nsmap, found_cache):
+        """
+        Walk down the path of a flat json key, creating the missing nodes
+        :param root: node of root element
+        :param key: flat json key
+        :param found_cache: results of findall('.//node') kept up to date while building the tree
+        :return: node addressed by the key
+        """
 
-            if d:
-                for k, v in d.items():
-                    ele.set(k, v)
+        cur_ele = root
+        for node in key.split(self.delimiter):
+            node, attr_dict, index = _parse_node(node)
 
-        for key, value in rq_dict.items():
-            cur_ele = root
-            for node in key.split(self.delimiter):
-                attr_dict = {}
-
-                patt = r'(.*?)\((.*?)\)'
-                match = re.search(patt, node)
-                if bool(match):
-                    kv_groups = match.group(2).split(',')
-                    for kv in kv_groups:
-                        kv = kv.strip()
-                        attr_key, attr_val = kv.split('=')
-                        attr_dict[attr_key.strip()] = attr_val.strip().replace('\'', '')
-                    node = match.group(1)
-
-                patt = r'(.*?)\[(.*?)\]'
-                match = re.match(patt, node)
-                if bool(match):
-                    index = int(match.group(2))
-                    node = match.group(1)
-                    if len(cur_ele.findall('.//' + node)) == index:
-                        sub_ele = _create_subelement(cur_ele, node)
-                        _setattrs(sub_ele, attr_dict)
-                        cur_ele = sub_ele
-                    else:
-                        cur_ele = cur_ele.findall('.//' + node)[index]
-                elif cur_ele.find(node) is not None:
-                    cur_ele = cur_ele.find(node)
+            if index is not None:
+                found = found_cache.get((cur_ele, node))
+                if found is None:
+                    found = found_cache[(cur_ele, node)] = cur_ele.findall('.//' + node)
+
+                if len(found) == index:
+                    cur_ele = _create_subelement(cur_ele, node, attr_dict, nsmap)
+                    _track_created(found_cache, cur_ele)
                 else:
-                    sub_ele = _create_subelement(cur_ele, node)
-                    _setattrs(sub_ele, attr_dict)
+                    cur_ele = found[index]
+            else:
+                sub_ele = cur_ele.find(node)
+                if sub_ele is not None:
                     cur_ele = sub_ele
-            cur_ele.text = value
+                else:
+                    cur_ele = _create_subelement(cur_ele, node, attr_dict, nsmap)
+                    _track_created(found_cache, cur_ele)
 
+        return cur_ele
+
+    def _compiled_xml(self, attrib, nsmap, attrs):
+        """
+        Assemble the request xml from the skeleton compiled once per set of flat json keys
+        (cached on the class), so each call only clones the skeleton and fills the texts
+        """
+
+        cache_key = (tuple(self._flat_dict), self._rq_name, self.delimiter, tuple(attrib.items()),
+                     tuple(sorted(nsmap.items())), tuple(sorted(attrs.items())))
+
+        with _xml_templates_lock:
+            cache = type(self).__dict__.get('_xml_templates')
+            if cache is None:
+                cache = OrderedDict()
+                setattr(type(self), '_xml_templates', cache)
+
+            template = cache.get(cache_key)
+            if template is not None:
+                cache.move_to_end(cache_key)
+
+        if template is None:
+            # compiled outside the lock, two threads may compile the same skeleton, the last one is kept
+            skeleton = et.Element(self._rq_name, attrib, nsmap, **attrs)
+            found_cache = {}
+            slots = [self._locate(skeleton, key, nsmap, found_cache) for key in self._flat_dict]
+
+            # position of each slot in document order, resolved again on the clones
+            order = dict((id(ele), i) for i, ele in enumerate(list(skeleton.iter())))
+            template = skeleton, [order[id(ele)] for ele in slots]
+
+            with _xml_templates_lock:
+                cache[cache_key] = template
+                while len(cache) > self.xml_template_cache_size:
+                    cache.popitem(last=False)
+
+        skeleton, positions = template
+        root = deepcopy(skeleton)
+        elements = list(root.iter())
+        for pos, value in zip(positions, self._flat_dict.values()):
+            elements[pos].text = value
         return root
 
     def append_headers(self, **extras):
@@ -133,7 +326,8 @@ class APIBaseObject:
         Append new headers based on various situations
         :param extras: extra headers
         """
-        self.default_headers.update(self._load_variables(extras))
+        # copy into the instance, so the class-level headers are not shared between requests
+        self.default_headers = dict(self.default_headers, **self._load_variables(extras))
 
     @typeassert(dict, j=dict)
     def unpack_json(self, kwargs=None, *, j=None):
@@ -143,43 +337,110 @@ class APIBaseObject:
         :param j: use specified json body instead of reading from file
         """
 
-        kwargs = kwargs or {}
-
         d = j or {}
-        for file_name, obj_name in kwargs.items():
-            with open(proj_root + '/json/%s.json' % file_name) as file_obj:
-                tmp_d = json.load(file_obj)
-                obj = tmp_d[obj_name] if obj_name is not None else tmp_d
-                d.update(obj)
+        d.update(self.load_json(kwargs))
 
         self._flat_dict = self._load_variables(d)
         return self
 
+    @staticmethod
+    def load_json(kwargs=None):
+        """
+        Merge the json bodies read from files, {{var}} placeholders are kept as they are
+        :param kwargs: mapping of json file name and jsonobj name
+        :rtype: dict
+        """
+
+        d = {}
+        for file_name, obj_name in (kwargs or {}).items():
+            tmp_d = fixture_cache.load(proj_root + '/json/%s.json' % file_name)
+            obj = tmp_d[obj_name] if obj_name is not None else tmp_d
+            d.update(obj)  # copied into d, the cached fixture is never modified
+        return d
+
+    def refresh_variables(self):
+        """
+        Index the enabled variables of globals and envs by key (var_overrides > globals > envs),
+        call it again after replacing <globals> or <envs>
+        """
+
+        self._var_index = {}
+        for ele in chain(self.globals, self.envs):
+            if ele['enabled']:
+                self._var_index.setdefault(ele['key'], ele['value'])
+        self._var_index.update(var_overrides)
+
+    def set_variables(self, **variables):
+        """
+        Add variables visible to this obj only, overriding globals and envs (e.g. one row of a dataset)
+        :param variables: mapping of variable key and value
+        """
+
+        self._var_index = dict(self._var_index, **variables)  # the index may be shared with the prototype
+        return self
+
     def _load_variables(self, d):
-        patt = r'{{(.*?)}}'
-        return dict((k, v) for k, v in zip(
-            d.keys(), (re.sub(
-                patt, lambda match: self._get_property_from_variables(
-                    match.group(1)), val) for val in d.values())))
+        return {k: self._render(v) for k, v in d.items()}
+
+    def _render(self, val):
+        """ Substitute the {{var}} placeholders in val """
+
+        if not isinstance(val, str) or '{{' not in val:
+            return val
+
+        return ''.join(str(self._get_property_from_variables(text)) if is_var else text
+                       for is_var, text in _compile_template(val))
 
     def _get_property_from_variables(self, var_key):
         """
-        Get property from variables(globals > envs > var_dict)
+        Get property from variables(var_overrides > globals > envs > var_dict)
         :param var_key: specify the reference key of the variable to be obtained
         :return: obtained mapping value
         """
 
-        match = list(filter(lambda ele: ele['key'] == var_key and ele['enabled'], self.globals))
-        if match:
-            return match[0]['value']
+        try:
+            return self._var_index[var_key]
+        except KeyError:
+            pass
+
+        # var_dict is looked up on demand, so its changes are always visible
+        if var_key in var_dict:
+            return var_dict[var_key]
+        raise KeyError('Environment key [' + var_key + '] is not found in variables')
+
+    def load_parsed_response(self, parsed):
+        """
+        Load response parsed once by the dispatch pipeline (shared with schema validation)
+        :param parsed: ParsedResponse of <rs_body> in APIBaseClient
+        """
+
+        self._hold_stream(None)
+        self._rs_parsed = parsed
+        self._rs_dict = self._wrap_response(parsed.to_dict(strip_ns=self.strip_ns))
+        return self
+
+    def _wrap_response(self, doc):
+        """ ResponseView of doc if <use_response_view> is set, otherwise CustomDict of a dict and doc itself of a list """
+
+        if self.use_response_view:
+            return response_view(doc)
+        return CustomDict(doc) if isinstance(doc, dict) else doc
+
+    def load_client_stream(self, rs_stream, item_path=None):
+        """
+        Load streamed response from APIBaseClient instance
+        :param rs_stream: <rs_stream> attr in APIBaseClient
+        :param item_path: if specified, the response is not parsed as a whole, but <_rs_items>
+                          yields the repeated items under this path one by one (see StreamedBody.iter_items)
+        """
+
+        if item_path is None:
+            self._hold_stream(None)
+            self._rs_dict = self._wrap_response(rs_stream.to_dict(strip_ns=self.strip_ns))
         else:
-            match = list(filter(lambda ele: ele['key'] == var_key and ele['enabled'], self.envs))
-            if match:
-                return match[0]['value']
-            elif var_key in var_dict.keys():
-                return var_dict[var_key]
-            else:
-                raise KeyError('Environment key [' + var_key + '] is not found in variables')
+            self._hold_stream(rs_stream)
+            self._rs_items = rs_stream.iter_items(item_path, strip_ns=self.strip_ns)
+        return self
 
     def rq_str2dict(self):
         """ Convert request str data to dict """
@@ -0,0 +1,101 @@
+import importlib
+import logging
+import pkgutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+# package of the project holding the APIBaseObject's subclasses
+API_PACKAGE = 'src.objects.api'
+
+
+class ApiObjectRegistry:
+    def __init__(self, package=API_PACKAGE):
+        """
+        Registry of the APIBaseObject's subclasses (registered when the class is defined)
+        and of the prepared prototype objects they are cloned from
+        :param package: package of the project in which the subclasses are located
+        """
+
+        self.package = package
+
+        self._classes = {}  # (module name inside package, cls name) -> cls
+        self._prototypes = {}  # (cls, ctor args) -> prepared obj
+        self._lock = threading.Lock()
+
+    def _module_name(self, cls):
+        prefix = self.package + '.'
+        return cls.__module__[len(prefix):] if cls.__module__.startswith(prefix) else cls.__module__
+
+    def register(self, cls):
+        """ Register the class, called by APIBaseObject.__init_subclass__ """
+
+        self._classes[(self._module_name(cls), cls.__name__)] = cls
+        return cls
+
+    def resolve(self, module_name, cls_name):
+        """
+        Get the class, its module is imported on the first lookup only
+        :param module_name: name of the module inside the package
+        :param cls_name: name of the APIBaseObject's subclass
+        """
+
+        try:
+            return self._classes[(module_name, cls_name)]
+        except KeyError:
+            pass
+
+        module = importlib.import_module(self.package + '.' + module_name)
+        cls = getattr(module, cls_name)  # also covers the aliases and the classes imported from elsewhere
+        self._classes[(module_name, cls_name)] = cls
+        return cls
+
+    def scan(self):
+        """
+        Import all the modules of the package up front, so every subclass gets registered
+        :return: list of the registered classes
+        """
+
+        package = importlib.import_module(self.package)
+        for info in pkgutil.walk_packages(package.__path__, self.package + '.'):
+            importlib.import_module(info.name)
+        return list(self._classes.values())
+
+    def new(self, cls, *args, **kwargs):
+        """
+        Get a ready-to-use obj, cloned from the prototype prepared once per (class, ctor args)
+        instead of running the constructor again (see APIBaseObject.clone)
+        :param cls: APIBaseObject's subclass
+        :param args: arguments of the constructor of cls, e.g. env
+        :param kwargs: arguments of the constructor of cls, e.g. env, rq_name
+        """
+
+        key = (cls, args, tuple(sorted(kwargs.items())))
+        try:
+            proto = self._prototypes.get(key)
+        except TypeError:  # unhashable ctor args
+            return cls(*args, **kwargs)
+
+        if proto is None:
+            with self._lock:
+                proto = self._prototypes.get(key)
+                if proto is None:
+                    proto = self._prototypes[key] = cls(*args, **kwargs)
+        return proto.clone()
+
+    def reset(self, cls=None):
+        """
+        Drop the prototypes, e.g. after the env files changed
+        :param cls: class whose prototypes are dropped, None to drop all
+        """
+
+        with self._lock:
+            for key in [key for key in self._prototypes if cls is None or key[0] is cls]:
+                del self._prototypes[key]
+
+    @property
+    def classes(self):
+        return dict(self._classes)
+
+
+api_registry = ApiObjectRegistry()  # shared by all the ApiEntrance
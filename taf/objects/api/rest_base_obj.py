@@ -1,56 +1,108 @@
-import json
 import logging
 import re
-from functools import reduce, partial
-from json.decoder import JSONDecodeError
+import threading
+from collections import OrderedDict
+from functools import partial
 
-from lxml.etree import XMLSyntaxError
-
-from taf.utils import typeassert, CustomDict, xml2dict, cannot_be_instantiated
+from taf.utils import typeassert, cannot_be_instantiated, ParsedResponse, json_dumps
 from . import APIBaseObject
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+_segment_patt = re.compile(r'(\w+)\[(\d+)]')  # name[index]
+
+_unflatten_plans_lock = threading.Lock()  # guards the plan caches of all the classes
+
+
+def _compile_key(key, delimiter):
+    """
+    Parse a flat json key: 'Order.Items[3].Sku' -> (('Order', None), ('Items', 3), ('Sku', None))
+    :return: tuple of (name, index) pairs, index is None if the segment is not indexed
+    """
+
+    steps = []
+    for segment in key.split(delimiter):
+        m = _segment_patt.match(segment)
+        steps.append((m.group(1), int(m.group(2))) if m else (segment, None))
+
+    if steps[-1][1] is not None:
+        raise ValueError('Last key of path should not contain index')
+    return tuple(steps)
+
+
+def _assign(root, steps, val):
+    """ Walk down the steps of a key from root, creating the missing dicts/lists, and set val """
+
+    obj = root
+    for name, index in steps[:-1]:
+        if index is None:
+            child = obj.get(name)
+            if child is None:
+                child = obj[name] = {}
+        else:
+            items = obj.get(name)
+            if items is None:
+                items = obj[name] = []
+            if index >= len(items):
+                items.extend([None] * (index + 1 - len(items)))
+            child = items[index]
+            if child is None:
+                child = items[index] = {}
+        obj = child
+    obj[steps[-1][0]] = val
+
 
 class RestBaseObject(APIBaseObject):
     __new__ = partial(cannot_be_instantiated, name='RestBaseObject')
 
+    unflatten_plan_cache_size = 64  # max compiled plans cached per class
+
     def unflatten_json(self):
         """
-        Convert the flat json to nested json
+        Convert the flat json to nested json in <rq_dict>, 'Items[i]' addresses the i-th element of
+        Items, so all the keys of the same index fill the same object (missing elements are null)
         """
 
-        tmp = 0
-        patt = re.compile(r'(\w+)\[(\d+)]')
+        plan = self._unflatten_plan()
+        for steps, (key, val) in zip(plan, self._flat_dict.items()):
+            try:
+                _assign(self.rq_dict, steps, val)
+            except (AttributeError, TypeError, KeyError):
+                raise ValueError('Flat json key <%s> conflicts with another key of the json body' % key)
 
-        def _traversal(o, k):
-            m = re.match(patt, k)
+    def _unflatten_plan(self):
+        """
+        Parsed flat json keys, compiled once per set of keys (cached on the class)
+        :return: tuple of the steps of each key, see _compile_key
+        """
 
-            nonlocal tmp
-            if m:
-                k, i = m.groups()
-                tmp = int(i)
-                return o.setdefault(k, [])
-            else:
-                if isinstance(o, list):
-                    o.insert(tmp, {k: {}})
-                    return o[tmp][k]  # must return the view
-                else:
-                    return o.setdefault(k, {})
+        cache_key = (tuple(self._flat_dict), self.delimiter)
 
-        for key, val in self._flat_dict.items():
-            path = key.split(self.delimiter)
+        with _unflatten_plans_lock:
+            cache = type(self).__dict__.get('_unflatten_plans')
+            if cache is None:
+                cache = OrderedDict()
+                setattr(type(self), '_unflatten_plans', cache)
 
-            if re.match(patt, path[-1]):
-                raise ValueError('Last key of path should not contain index')
+            plan = cache.get(cache_key)
+            if plan is not None:
+                cache.move_to_end(cache_key)
+                return plan
 
-            obj = reduce(_traversal, path[:-1], self.rq_dict)
-            if isinstance(obj, list):
-                obj.insert(tmp, {path[-1]: val})
-            else:
-                obj[path[-1]] = val
+        plan = tuple(_compile_key(key, self.delimiter) for key in self._flat_dict)
+        with _unflatten_plans_lock:
+            cache[cache_key] = plan
+            while len(cache) > self.unflatten_plan_cache_size:
+                cache.popitem(last=False)
+        return plan
+
+    def dump_json(self):
+        """ Serialize <rq_dict> into the compact request body """
+
+        self.rq_body = json_dumps(self.rq_dict)
+        return self.rq_body
 
     @typeassert(str)
     def load_client_response(self, rs_body):
@@ -59,14 +111,13 @@ class RestBaseObject(APIBaseObject):
         :param rs_body: <rs_body> attr in RestBaseClient
         """
 
-        try:
-            self._rs_dict = CustomDict(json.loads(rs_body))
-        except JSONDecodeError:
-            try:
-                self._rs_dict = CustomDict(xml2dict(rs_body))
-            except XMLSyntaxError:
-                logger.warning('Response str could be neither parsed to json nor xml obj')
-        return self
+        return self.load_parsed_response(ParsedResponse(rs_body))
+
+    def load_parsed_response(self, parsed):
+        if not parsed.ok:
+            logger.warning('Response str could not be parsed to %s obj: %s', parsed.kind, parsed.error)
+            return self
+        return super().load_parsed_response(parsed)
 
     def process_response(self):
         raise NotImplementedError('You must customize the logic when processing the response')
@@ -1,6 +1,6 @@
 from functools import partial
 
-from taf.utils import typeassert, CustomDict, xml2dict, cannot_be_instantiated
+from taf.utils import typeassert, cannot_be_instantiated, ParsedResponse
 from . import APIBaseObject
 
 
@@ -8,6 +8,8 @@ class SoapBaseObject(APIBaseObject):
     default_headers = {'Content-Type': 'text/xml; charset=UTF-8',
                        'SOAPAction': 'http://schemas.xmlsoap.org/soap/envelope'}
 
+    strip_ns = True
+
     __new__ = partial(cannot_be_instantiated, name='SoapBaseObject')
 
     @typeassert(str)
@@ -17,8 +19,12 @@ class SoapBaseObject(APIBaseObject):
         :param rs_body: <rs_body> attr in SoapBaseClient
         """
 
-        self._rs_dict = CustomDict(xml2dict(rs_body, strip_ns=True))
-        return self
+        return self.load_parsed_response(ParsedResponse(rs_body, kind='xml'))
+
+    def load_parsed_response(self, parsed):
+        if not parsed.ok:
+            raise parsed.error
+        return super().load_parsed_response(parsed)
 
     def process_response(self):
         raise NotImplementedError('You must customize the logic when processing the response')
@@ -0,0 +1,26 @@
+"""
+pytest plugin of the framework, registered through the 'pytest11' entry point (see setup.py),
+without installing the package add this line to the conftest.py instead:
+
+    pytest_plugins = ['taf.pytest_plugin']
+"""
+
+import pytest
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Stub server on a free port serving the endpoints of all the api objects, with BaseUrl pointed at it
+    (see taf.utils.stub_server.StubServer)
+    """
+
+    from .utils.stub_server import StubServer, point_base_url, restore_base_url
+
+    server = StubServer().add_objects().start()
+    previous = point_base_url(server.url)
+    try:
+        yield server
+    finally:
+        restore_base_url(previous)
+        server.stop()
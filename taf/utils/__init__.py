@@ -1,11 +1,35 @@
+import importlib
 import inspect
 from collections.abc import Iterable
 
-from .api_utils import CustomDict, SchemaValidator, XmlValidator, JsonValidator
-from .api_utils import encoding, var_dict, proj_root
-from .api_utils import typeassert, xml2dict
+from .api_utils import CustomDict, ResponseView, ResponseListView, response_view, SchemaValidator, XmlValidator, JsonValidator
+from .api_utils import encoding, var_dict, var_overrides, proj_root
+from .api_utils import typeassert, set_typecheck, xml2dict, xmlfile2dict, element2dict, bounded_imap
 from .err_msg import *
-from .web_utils import check_os, fluent_wait, web_fluent_wait, non_private_vars, ALLOWED_LOC_TYPES
+from .file_cache import FileCache
+from .fixture_cache import fixture_cache, FixtureCache, FrozenDict
+from .log_utils import configure_body_log, log_body
+from .log_utils import setup_async_logging, stop_async_logging, request_context, with_request_id
+from .perf_utils import LatencyHistogram, PhaseTimer
+from .codec_utils import configure_codecs, json_dumps, json_loads, xml_dumps, xml_loads
+from .response_utils import ParsedResponse, body_kind
+from .schema_registry import schema_registry, SchemaRegistry
+
+# web helpers pull in selenium, so they are imported on first access only (API-only users never pay for it)
+_LAZY_ATTRS = {name: '.web_utils' for name in
+               ('check_os', 'fluent_wait', 'web_fluent_wait', 'non_private_vars', 'ALLOWED_LOC_TYPES')}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value  # later lookups skip __getattr__
+        return value
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
 
 
 def flat_map(seq, func=None):
@@ -1,15 +1,20 @@
 import base64
-import json
 import logging
+import os
 import re
 import sys
 from abc import ABCMeta, abstractmethod
-from functools import wraps
+from collections import deque
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, lru_cache
 from inspect import signature
+from io import BytesIO
 
-import jsonschema
 import lxml.etree as et
-import xmltodict
+
+from .codec_utils import json_loads, xml_loads
+from .schema_registry import schema_registry
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -21,6 +26,9 @@ encoding = 'utf-8'
 # container for temporary variables
 var_dict = {}
 
+# variables overriding globals and envs for every api obj built afterwards (e.g. BaseUrl of a stub server)
+var_overrides = {}
+
 
 def is_debug():
     # Judge if running under the debug mode
@@ -49,22 +57,69 @@ def generate_auth(username, pwd):
     return 'Basic ' + base64.b64encode(data_bytes).decode(encoding)
 
 
+# set TAF_TYPECHECK=0 to drop the checks of typeassert entirely (e.g. in performance runs)
+_typecheck = os.environ.get('TAF_TYPECHECK', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def set_typecheck(enabled):
+    """
+    Switch the checks of the functions already decorated by typeassert on or off
+    :param enabled: flag of if checking the argument types
+    """
+
+    global _typecheck
+    _typecheck = bool(enabled)
+
+
+def _compile_checks(sig, bound_types):
+    """
+    Resolve where each checked argument is passed, once at decoration time
+    :return: tuple of (position or None if keyword-only, name, types)
+    """
+
+    checks = []
+    for pos, (name, param) in enumerate(sig.parameters.items()):
+        if name not in bound_types:
+            continue
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            raise TypeError('Parameter <%s> of variable length cannot be type asserted' % name)
+        positional = param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD)
+        checks.append((pos if positional else None, name, bound_types[name]))
+    return tuple(checks)
+
+
 def typeassert(*tyargs, **ty_kwargs):
     """ Decorator to implement the type check upon arguments
     (no need to consider about the 'self' parameter) """
 
     def decorator(func):
+        if not _typecheck:
+            return func  # no wrapper at all when disabled from the env
+
         sig = signature(func)
-        bound_types = sig.bind_partial(*tyargs, **ty_kwargs).arguments
+        if next(iter(sig.parameters), None) in ('self', 'cls'):
+            # positional types start from the parameter after 'self'
+            bound_types = sig.bind_partial(None, *tyargs, **ty_kwargs).arguments
+            bound_types.pop(next(iter(sig.parameters)))
+        else:
+            bound_types = sig.bind_partial(*tyargs, **ty_kwargs).arguments
+
+        checks = _compile_checks(sig, bound_types)
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            bound_values = sig.bind(*args, **kwargs).arguments
-            for key, val in bound_values.items():
-                if key in bound_types:
-                    if not isinstance(val, bound_types[key]):
-                        raise TypeError(
-                            'Parameter <%s> must be the type of %s' % (key, bound_types[key]))
+            if _typecheck:
+                n_args = len(args)
+                for pos, key, types in checks:
+                    # arguments left to their defaults are not checked
+                    if pos is not None and pos < n_args:
+                        val = args[pos]
+                    elif key in kwargs:
+                        val = kwargs[key]
+                    else:
+                        continue
+                    if not isinstance(val, types):
+                        raise TypeError('Parameter <%s> must be the type of %s' % (key, types))
             return func(*args, **kwargs)
 
         return wrapper
@@ -72,6 +127,46 @@ def typeassert(*tyargs, **ty_kwargs):
     return decorator
 
 
+def _gevent_patched():
+    """ Judge if the socket module has been monkey patched by gevent """
+
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def bounded_imap(func, iterable, workers):
+    """
+    Concurrent map which keeps at most <workers> calls running and yields the results in order
+    (runs on a gevent pool if sockets are monkey patched, on a thread pool otherwise)
+    :param func: function applied on each item
+    :param iterable: items to process, consumed lazily
+    :param workers: size of the worker pool
+    :return: the generator object
+    """
+
+    if workers < 1:
+        raise ValueError('Argument <workers> should be a positive int')
+
+    if _gevent_patched():
+        from gevent.pool import Pool
+        # results waiting behind a slow call are bounded like <pending> below
+        yield from Pool(workers).imap(func, iterable, maxsize=workers * 2)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in iterable:
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, item))
+
+        while pending:
+            yield pending.popleft().result()
+
+
 class CustomDict(dict):
     def __getitem__(self, key):
         """
@@ -90,73 +185,338 @@ class CustomDict(dict):
             return None
 
 
-@typeassert(str)
-def xml2dict(xml, strip_ns=False):
+_path_patt = re.compile(r'([^.\[\]]+)|\[(-?\d+)\]')  # Body.Items[3].Price
+
+
+@lru_cache(maxsize=1024)
+def _split_path(path):
+    """ Split the dotted/indexed path: 'Body.Items[3].Price' -> ('Body', 'Items', 3, 'Price') """
+
+    return tuple(int(index) if index else key for key, index in _path_patt.findall(path))
+
+
+def response_view(val):
     """
-    Convert xml str to dict
-    :param xml: xml str about to be processed
-    :param strip_ns: flag to decide if stripping the ns
-    :rtype: dict
+    Wrap the parsed response without copying it
+    :param val: parsed json/xml object
+    :return: ResponseView for dict, ResponseListView for list, val itself otherwise
     """
 
-    def _strip_ns(s):
+    if isinstance(val, dict):
+        return ResponseView(val)
+    if isinstance(val, list):
+        return ResponseListView(val)
+    return val
+
+
+class _View:
+    __slots__ = ('_obj', '_children')
+
+    def __init__(self, obj):
+        """
+        Read-only view over the parsed response, nothing is copied
+        :param obj: parsed dict or list to wrap
+        """
+
+        self._obj = obj
+        self._children = {}  # views of the nested dicts/lists, created once on first access
+
+    def _child(self, key):
+        try:
+            return self._children[key]
+        except KeyError:
+            pass
+
+        val = self._obj[key]
+        if isinstance(val, (dict, list)):
+            val = self._children[key] = response_view(val)
+        return val
+
+    @property
+    def raw(self):
+        """ The wrapped dict or list """
+
+        return self._obj
+
+    def find(self, path, default=None):
         """
-        Remove the namespace of xml str
-        :return: xml str without namespaces
+        Get the value under the dotted/indexed path
+        :param path: path like 'Body.Items[3].Price'
+        :param default: returned if any part of the path is missing
         """
 
-        root = et.fromstring(s)
-        for ele in root.xpath('descendant-or-self::*'):
-            if ele.prefix:
-                ele.tag = et.QName(ele).localname
-        return et.tostring(root).decode(encoding)
+        cur = self
+        for part in _split_path(path):
+            if not isinstance(cur, _View):
+                return default
+            try:
+                cur = cur._child(part)
+            except (KeyError, IndexError, TypeError):
+                return default
+        return cur
+
+    def __eq__(self, other):
+        return self._obj == (other._obj if isinstance(other, _View) else other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self._obj)
+
+
+class ResponseView(_View, Mapping):
+    """ Zero-copy replacement of CustomDict: returns None instead of 'KeyError' when key has no mapping """
 
-    result = _strip_ns(xml) if strip_ns else xml
-    return xmltodict.parse(result)
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return self._child(key)
+        except (KeyError, TypeError):
+            return None
+
+    def __iter__(self):
+        return iter(self._obj)
+
+    def __len__(self):
+        return len(self._obj)
+
+    def __contains__(self, key):
+        return key in self._obj
+
+    def get(self, key, default=None):
+        """
+        Get the value of key, or of the dotted/indexed path if key is not found as it is
+        :param key: key or path like 'Body.Items[3].Price'
+        :param default: returned if missing
+        """
+
+        if key in self._obj:
+            return self._child(key)
+        if isinstance(key, str) and ('.' in key or '[' in key):
+            return self.find(key, default)
+        return default
+
+
+class ResponseListView(_View, Sequence):
+    """ Zero-copy view of the lists inside ResponseView """
+
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._child(i) for i in range(*index.indices(len(self._obj)))]
+        return self._child(index)
+
+    def __iter__(self):
+        return (self._child(i) for i in range(len(self._obj)))
+
+    def __len__(self):
+        return len(self._obj)
+
+
+_XML_NS = 'http://www.w3.org/XML/1998/namespace'
+
+
+def _attr_prefix(ele, index, uri):
+    """
+    Prefix the namespaced attribute was written with (lxml only keeps its uri)
+    :param ele: element holding the attribute
+    :param index: position of the attribute in ele.items()
+    :param uri: namespace uri of the attribute
+    """
+
+    if uri == _XML_NS:
+        return 'xml'
+
+    prefixes = [p for p, u in ele.nsmap.items() if u == uri and p]
+    if len(prefixes) == 1:
+        return prefixes[0]
+    # several prefixes bound to the uri, ask libxml2 for the qualified name in the document
+    qname = ele.xpath('name(@*[%d])' % (index + 1))
+    return qname.split(':', 1)[0] if ':' in qname else None
+
+
+def _events2dict(events, strip_ns, clear):
+    """
+    Build the xmltodict-compatible dict from the lxml parse/walk events in a single pass
+    :param events: iterator of (event, obj) with 'start-ns', 'start' and 'end' events
+    :param strip_ns: flag to decide if stripping the ns prefix of element names
+    :param clear: flag of if clearing the elements once converted (keeps the memory low when parsing)
+    """
+
+    result = {}
+    stack = []  # items of the open elements
+    ns_decls = []  # namespaces declared by the next element
+
+    for event, obj in events:
+        if event == 'start-ns':
+            ns_decls.append(obj)
+
+        elif event == 'start':
+            item = {}
+            for prefix, uri in ns_decls:
+                item['@xmlns:' + prefix if prefix else '@xmlns'] = uri
+            ns_decls = []
+
+            for i, (name, val) in enumerate(obj.items()):
+                if name[0] == '{':
+                    uri, local = name[1:].split('}', 1)
+                    prefix = _attr_prefix(obj, i, uri)
+                    name = prefix + ':' + local if prefix else local
+                item['@' + name] = val
+            stack.append(item)
+
+        else:  # end
+            item = stack.pop()
+
+            data = obj.text
+            if len(obj):
+                data = ''.join([data or ''] + [child.tail for child in obj if child.tail])
+            data = data.strip() or None if data else None
+
+            if item:
+                if data:
+                    item['#text'] = data
+                value = item
+            else:
+                value = data
+
+            tag = obj.tag
+            if tag[0] == '{':
+                tag = tag.split('}', 1)[1]
+                prefix = None if strip_ns else obj.prefix
+                if prefix:
+                    tag = prefix + ':' + tag
+
+            parent = stack[-1] if stack else result
+            if tag in parent:
+                existing = parent[tag]
+                if isinstance(existing, list):
+                    existing.append(value)
+                else:
+                    parent[tag] = [existing, value]
+            else:
+                parent[tag] = value
+
+            if clear:
+                obj.clear(keep_tail=True)
+
+    return result
+
+
+def element2dict(ele, strip_ns=False):
+    """
+    Convert a parsed lxml element into dict, same shape as xml2dict
+    :param ele: lxml element (not modified)
+    :param strip_ns: flag to decide if stripping the ns
+    :rtype: dict
+    """
+
+    return _events2dict(et.iterwalk(ele, events=('start-ns', 'start', 'end')), strip_ns, False)
+
+
+def xmlfile2dict(fp, strip_ns=False, encoding_override=None):
+    """
+    Convert xml file to dict while parsing it incrementally (same shape as xmltodict.parse)
+    :param fp: binary file object of the xml
+    :param strip_ns: flag to decide if stripping the ns
+    :param encoding_override: encoding used instead of the one declared in the xml
+    :rtype: dict
+    """
+
+    events = et.iterparse(fp, events=('start-ns', 'start', 'end'), encoding=encoding_override,
+                          huge_tree=True)
+    return _events2dict(events, strip_ns, True)
+
+
+@typeassert((str, bytes))
+def xml2dict(xml, strip_ns=False):
+    """
+    Convert xml str to dict in a single parse (same shape as xmltodict.parse)
+    :param xml: xml str about to be processed
+    :param strip_ns: flag to decide if stripping the ns
+    :rtype: dict
+    """
+
+    if isinstance(xml, str):
+        return xmlfile2dict(BytesIO(xml.encode(encoding)), strip_ns, encoding)
+    return xmlfile2dict(BytesIO(xml), strip_ns)
 
 
 class SchemaValidator(metaclass=ABCMeta):
+    kind = None  # 'json' or 'xml', format of the bodies validated by the subclass
+
     @typeassert(str)
-    def __init__(self, body, schema_path):
+    def __init__(self, body, schema_path, doc=None, body_kind=None):
         """
         Validate the response xml body against schema file
         :param body: str body to be verified
         :param schema_path: path of the schema file inside 'proj_root/schema/' folder to check against
+        :param doc: body already parsed (json obj or lxml element, see ParsedResponse), parsed from body if None
+        :param body_kind: 'json' or 'xml' the response claims to be (see ParsedResponse), None if unknown
         """
 
         self._body = body
+        self._doc = doc
+        self._body_kind = body_kind
 
         m = re.match(r'.+/(.+?)\.(json|xsd)', schema_path)
         if not m:
             raise ValueError('Schema path does not match the pattern.')
         self._schema_name = m.group(1)
 
-        # open and read schema file
-        with open(proj_root + '/schema/' + schema_path) as schema_file:
-            self._schema_to_check = schema_file.read()
+        # compiled once per process, see schema_registry
+        self._schema = schema_registry.get(proj_root + '/schema/' + schema_path)
 
     @typeassert(log=str)
     def _write_log(self, prefix, log):
-        with open(proj_root + 'log/' + prefix + self._schema_name + '.log', 'w') as error_log_file:
+        with open(proj_root + '/log/' + prefix + self._schema_name + '.log', 'w') as error_log_file:
             error_log_file.write(log)
 
+    @staticmethod
+    def for_schema(schema_path):
+        """ JsonValidator or XmlValidator, picked by the suffix of the schema file """
+
+        return XmlValidator if schema_path.endswith('.xsd') else JsonValidator
+
+    def _kind_mismatch(self):
+        """ Report a response of the other format as a failed validation, True if reported """
+
+        if self._body_kind in (None, self.kind):
+            return False
+        logger.error('Response is %s, schema <%s> is %s, see error_kind.log', self._body_kind, self._schema_name,
+                     self.kind)
+        self._write_log('error_kind_', 'Response body is %s but the schema is %s:\n%s'
+                        % (self._body_kind, self.kind, self._body))
+        return True
+
     @abstractmethod
     def validate_schema(self):
         pass
 
 
 class JsonValidator(SchemaValidator):
+    kind = 'json'
+
     def validate_schema(self):
-        checker = jsonschema.FormatChecker()
-        validator = jsonschema.validators.Draft6Validator(json.loads(self._schema_to_check), format_checker=checker)
+        if self._kind_mismatch():
+            return
+        validator = self._schema.validator
 
-        msg = []
-        iter_errors = validator.iter_errors(json.loads(self._body))
+        doc = self._doc
+        if doc is None:
+            try:
+                doc = json_loads(self._body)
+            except ValueError as err:
+                logger.error('JSON Syntax Error, see error_syntax.log')
+                self._write_log('error_syntax_', str(err))
+                return
 
-        if not iter_errors:
-            for err in iter_errors:
-                field_name = '-'.join(err.absolute_path)
-                msg.append('Validate Error, flied[%s], error msg: %s' % (field_name, err.message))
+        msg = []
+        for err in validator.iter_errors(doc):
+            field_name = '-'.join(map(str, err.absolute_path))
+            msg.append('Validate Error, flied[%s], error msg: %s' % (field_name, err.message))
 
         if not msg:
             logger.info('JSON valid, schema validation ok.')
@@ -166,27 +526,32 @@ class JsonValidator(SchemaValidator):
 
 
 class XmlValidator(SchemaValidator):
+    kind = 'xml'
+
     def validate_schema(self):
-        xmlschema_doc = et.fromstring(self._schema_to_check)
-        xmlschema = et.XMLSchema(xmlschema_doc)
+        if self._kind_mismatch():
+            return
+        xmlschema = self._schema.validator
 
         # parse xml
-        doc = None
-        try:
-            doc = et.fromstring(self._body)
-            logger.info('XML well formed, syntax ok.')
+        doc = self._doc
+        if doc is None:
+            try:
+                doc = xml_loads(self._body)
+                logger.info('XML well formed, syntax ok.')
 
-        # check for XML syntax errors
-        except et.XMLSyntaxError as err:
-            logger.error('XML Syntax Error, see error_syntax.log')
-            self._write_log('error_syntax_', str(err))
+            # check for XML syntax errors
+            except et.XMLSyntaxError as err:
+                logger.error('XML Syntax Error, see error_syntax.log')
+                self._write_log('error_syntax_', str(err))
 
         # validate against schema
         if doc is not None:
-            try:
-                xmlschema.assertValid(doc)
-                logger.info('XML valid, schema validation ok.')
-
-            except et.DocumentInvalid:
-                logger.error('XML schema validation error, see error_xmlschema.log')
-                self._write_log('error_xmlschema_', str(xmlschema.error_log))
+            with self._schema.lock:
+                try:
+                    xmlschema.assertValid(doc)
+                    logger.info('XML valid, schema validation ok.')
+
+                except et.DocumentInvalid:
+                    logger.error('XML schema validation error, see error_xmlschema.log')
+                    self._write_log('error_xmlschema_', str(xmlschema.error_log))
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+
+import lxml.etree as et
+
+logger = logging.getLogger(__name__)
+
+# json backends in order of preference, the first installed one is used
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+
+# indent of the pretty printed json, the same whatever the backend (orjson only knows 2)
+PRETTY_INDENT = 4
+
+
+class _StdlibJson:
+    name = 'json'
+
+    @staticmethod
+    def dumps(obj, pretty=False):
+        if pretty:
+            return json.dumps(obj, indent=PRETTY_INDENT, ensure_ascii=False)
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+    @staticmethod
+    def loads(s):
+        return json.loads(s)
+
+
+class _OrJson:
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj, pretty=False):
+        if pretty:
+            return _StdlibJson.dumps(obj, pretty)  # orjson indents by 2 only
+        try:
+            return self._orjson.dumps(obj).decode()  # orjson always emits utf-8
+        except TypeError:
+            # orjson rejects non-str keys and ints beyond 64 bits
+            return _StdlibJson.dumps(obj)
+
+    def loads(self, s):
+        try:
+            return self._orjson.loads(s)
+        except ValueError:
+            return json.loads(s)  # ints beyond 64 bits, raises the usual error if really invalid
+
+
+class _UJson:
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj, pretty=False):
+        return self._ujson.dumps(obj, indent=PRETTY_INDENT if pretty else 0, ensure_ascii=False,
+                                 escape_forward_slashes=False)
+
+    def loads(self, s):
+        try:
+            return self._ujson.loads(s)
+        except ValueError:
+            return json.loads(s)
+
+
+_JSON_FACTORIES = {'orjson': _OrJson, 'ujson': _UJson, 'json': _StdlibJson}
+
+
+def _select_json(names):
+    for name in names:
+        if name not in _JSON_FACTORIES:
+            raise ValueError('Unknown json backend <%s>, should be one of %s' % (name, JSON_BACKENDS))
+        try:
+            return _JSON_FACTORIES[name]()
+        except ImportError:
+            continue
+    return _StdlibJson()
+
+
+class _Codecs:
+    def __init__(self):
+        # TAF_JSON_BACKEND pins the backend, e.g. to compare against the stdlib one
+        pinned = os.environ.get('TAF_JSON_BACKEND')
+        self.json = _select_json((pinned,) if pinned else JSON_BACKENDS)
+
+
+codecs = _Codecs()  # current codec backends
+
+
+def configure_codecs(json_backend=None):
+    """
+    Pick the codec backends
+    :param json_backend: name in JSON_BACKENDS, falls back to the stdlib json if it is not installed
+    """
+
+    if json_backend:
+        codecs.json = _select_json((json_backend,))
+        if codecs.json.name != json_backend:
+            logger.warning('Json backend <%s> is not installed, using <%s>', json_backend, codecs.json.name)
+
+
+def json_dumps(obj, pretty=False):
+    """
+    Serialize obj into json str
+    :param pretty: flag of if indenting the output, only meant for logs, compact on the wire
+    """
+
+    return codecs.json.dumps(obj, pretty)
+
+
+def json_loads(s):
+    """ Parse json str or bytes """
+
+    return codecs.json.loads(s)
+
+
+def xml_dumps(root, pretty=False):
+    """
+    Serialize lxml element into xml str
+    :param pretty: flag of if indenting the output, only meant for logs
+    """
+
+    return et.tostring(root, encoding='unicode', pretty_print=pretty)
+
+
+def xml_loads(s, remove_blank_text=False):
+    """
+    Parse xml str or bytes into lxml root element (str with an encoding declaration is accepted)
+    :param remove_blank_text: flag of if dropping the whitespace between elements, needed to re-indent
+    """
+
+    from .api_utils import encoding  # not at the top, api_utils imports this module
+
+    parser = et.XMLParser(encoding=encoding if isinstance(s, str) else None, huge_tree=True,
+                          remove_blank_text=remove_blank_text)
+    if isinstance(s, str):
+        s = s.encode(encoding)
+    return et.fromstring(s, parser)
@@ -0,0 +1,90 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class FileCache:
+    def __init__(self, maxsize, check_mtime=True):
+        """
+        Process-wide LRU cache of the objects built from files, keyed by the file path,
+        subclasses build the object in _build(path)
+        :param maxsize: max number of files kept in the cache
+        :param check_mtime: flag of if rebuilding the object when the mtime of its file changed
+        """
+
+        self.maxsize = maxsize
+        self.check_mtime = check_mtime
+
+        self.hits = self.misses = 0
+
+        self._entries = OrderedDict()  # path -> (mtime, object)
+        self._lock = threading.Lock()
+        self._build_locks = {}  # path -> lock, so concurrent misses build the object only once
+
+    def _build(self, path):
+        raise NotImplementedError
+
+    def _cached(self, path, mtime):
+        """ Cached object of path if still valid, None otherwise (under the lock) """
+
+        entry = self._entries.get(path)
+        if entry is not None and (not self.check_mtime or entry[0] == mtime):
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+        return None
+
+    def get(self, path):
+        """
+        Get the object built from the file, building it on a miss
+        :param path: path of the file
+        """
+
+        mtime = os.stat(path).st_mtime_ns if self.check_mtime else None
+        with self._lock:
+            obj = self._cached(path, mtime)
+            if obj is not None:
+                return obj
+            build_lock = self._build_locks.setdefault(path, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                obj = self._cached(path, mtime)  # built by another thread meanwhile
+                if obj is not None:
+                    return obj
+                self.misses += 1
+
+            try:
+                obj = self._build(path)
+            except BaseException:
+                with self._lock:
+                    if path not in self._entries:
+                        self._build_locks.pop(path, None)
+                raise
+
+            with self._lock:
+                self._entries[path] = (mtime, obj)
+                self._entries.move_to_end(path)
+                while len(self._entries) > self.maxsize:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._build_locks.pop(evicted, None)
+        return obj
+
+    def invalidate(self, path=None):
+        """
+        Drop the cached objects
+        :param path: path of the file to drop, None to drop all
+        """
+
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._build_locks.clear()
+            else:
+                self._entries.pop(path, None)
+                self._build_locks.pop(path, None)
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
@@ -0,0 +1,55 @@
+from .codec_utils import json_loads
+from .file_cache import FileCache
+
+
+class FrozenDict(dict):
+    """ Read-only dict shared through the fixture cache, use copy() to get a mutable one """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('Cached fixture is read-only, use copy() before modifying it')
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+def _freeze(obj):
+    """ Convert the parsed json into read-only containers (dict -> FrozenDict, list -> tuple) """
+
+    if isinstance(obj, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return tuple(_freeze(e) for e in obj)
+    return obj
+
+
+class FixtureCache(FileCache):
+    def __init__(self, maxsize=256, check_mtime=True):
+        """
+        Process-wide LRU cache of parsed json files (env, globals and json fixtures)
+        :param maxsize: max number of files kept in the cache
+        :param check_mtime: flag of if re-reading the file when its mtime changed
+        """
+
+        super().__init__(maxsize, check_mtime)
+
+    def _build(self, path):
+        with open(path) as f:
+            return _freeze(json_loads(f.read()))
+
+    def load(self, path):
+        """
+        Get the parsed content of a json file
+        :param path: path of the json file
+        :return: read-only view of the content (FrozenDict / tuple), shared by all the callers
+        """
+
+        return self.get(path)
+
+
+fixture_cache = FixtureCache()  # shared by all the api objects
@@ -0,0 +1,306 @@
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import random
+import uuid
+from contextlib import contextmanager
+from copy import copy
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener
+
+import lxml.etree as et
+
+from .codec_utils import json_dumps, json_loads, xml_dumps, xml_loads
+
+# presets of the request/response body logging
+BODY_LOG_PRESETS = {
+    'default': {'enabled': True, 'max_size': 64 * 1024, 'pretty': False, 'sample_rate': 1.0},
+    'verbose': {'enabled': True, 'max_size': None, 'pretty': True, 'sample_rate': 1.0},
+    'quiet': {'enabled': False, 'max_size': 0, 'pretty': False, 'sample_rate': 0.0},  # for load runs
+}
+
+# loggers silenced to WARNING by the 'quiet' preset, so even the request banners are skipped
+QUIET_LOGGERS = ('taf.clients.api',)
+
+
+class _BodyLogSettings:
+    def __init__(self):
+        self.enabled = True
+        self.max_size = None  # max chars of body to log, None for unlimited
+        self.pretty = False  # pretty print xml/json bodies, only when the body is within max_size
+        self.sample_rate = 1.0  # fraction of bodies to log
+
+        self.update(**BODY_LOG_PRESETS['default'])
+
+    def update(self, **kwargs):
+        for key, val in kwargs.items():
+            if not hasattr(self, key):
+                raise KeyError('Unknown body log setting <%s>' % key)
+            setattr(self, key, val)
+
+
+body_log = _BodyLogSettings()  # current body log settings
+
+
+def configure_body_log(preset=None, **kwargs):
+    """
+    Configure how request/response bodies are logged
+    :param preset: name of the preset in BODY_LOG_PRESETS to start from
+    :param kwargs: settings overwriting the preset (enabled, max_size, pretty, sample_rate)
+    """
+
+    if preset:
+        if preset not in BODY_LOG_PRESETS:
+            raise ValueError('Unknown body log preset <%s>' % preset)
+        body_log.update(**BODY_LOG_PRESETS[preset])
+
+        level = logging.WARNING if preset == 'quiet' else logging.NOTSET
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(level)
+
+    body_log.update(**kwargs)
+
+
+def _pretty(body):
+    stripped = body.lstrip()
+    try:
+        if stripped.startswith('<'):
+            return xml_dumps(xml_loads(stripped, remove_blank_text=True), pretty=True)
+        if stripped.startswith(('{', '[')):
+            return json_dumps(json_loads(stripped), pretty=True)
+    except (et.XMLSyntaxError, ValueError):
+        pass
+    return body
+
+
+def render_body(body):
+    """
+    Render body for logging according to the current settings
+    :param body: request or response body, str or bytes
+    :return: body str, pretty printed or truncated
+    """
+
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', 'replace')
+
+    size, max_size = len(body), body_log.max_size
+    if max_size is not None and size > max_size:
+        return body[:max_size] + '\n... [truncated, %d of %d chars shown]' % (max_size, size)
+
+    return _pretty(body) if body_log.pretty else body
+
+
+class LazyBody:
+    __slots__ = ('body',)
+
+    def __init__(self, body):
+        """ Defer the rendering of body until the log record is actually emitted """
+
+        self.body = body
+
+    def __str__(self):
+        return render_body(self.body)
+
+
+def log_body(logger, title, body):
+    """
+    Log the body lazily, nothing is rendered if INFO is disabled, bodies are off or not sampled
+    :param logger: logger of the caller module
+    :param title: prefix of the log message
+    :param body: request or response body
+    """
+
+    if not (body_log.enabled and logger.isEnabledFor(logging.INFO)):
+        return
+
+    if body_log.sample_rate < 1 and random.random() >= body_log.sample_rate:
+        return
+
+    logger.info('%s: \n%s', title, LazyBody(body))
+
+
+# id of the request being dispatched, attached to every record logged meanwhile
+_request_id = contextvars.ContextVar('taf_request_id', default='-')
+
+
+@contextmanager
+def request_context(request_id=None):
+    """
+    Tag the records logged inside the block with a request id
+    :param request_id: id to use, a new one is generated if None
+    """
+
+    token = _request_id.set(request_id or uuid.uuid4().hex[:12])
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+
+def with_request_id(func):
+    """ Decorator running func inside a request_context, unless one is already active """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _request_id.get() != '-':
+            return func(*args, **kwargs)
+        with request_context():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class RequestIdFilter(logging.Filter):
+    """ Attach <request_id> and <worker> to the records, in the thread which logs them """
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        record.worker = '%d-%s' % (record.process, record.threadName)
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """ One json object per record, with the request id and the worker """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'worker': getattr(record, 'worker', record.threadName),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json_dumps(entry)
+
+
+# args which are safe to format later in the background thread
+_DEFERRABLE_ARGS = (str, int, float, bool, type(None), LazyBody)
+
+
+class _AsyncQueueHandler(QueueHandler):
+    def prepare(self, record):
+        """
+        Keep the record unformatted when its args are immutable, so the bodies (LazyBody) are
+        rendered by the background writer instead of the logging thread
+        """
+
+        args = record.args
+        if record.exc_info or record.stack_info or not isinstance(args, tuple) or \
+                not all(isinstance(arg, _DEFERRABLE_ARGS) for arg in args):
+            return super().prepare(record)
+        return copy(record)
+
+
+class _PerWorkerFileHandler(logging.Handler):
+    def __init__(self, log_dir, suffix):
+        """
+        Write the records of each worker into its own file under log_dir
+        :param suffix: extension of the log files
+        """
+
+        super().__init__()
+        self.log_dir = log_dir
+        self.suffix = suffix
+        self._files = {}
+
+    def emit(self, record):
+        worker = getattr(record, 'worker', '%d-%s' % (record.process, record.threadName))
+        handler = self._files.get(worker)
+        if handler is None:
+            handler = logging.FileHandler(os.path.join(self.log_dir, 'taf-%s%s' % (worker, self.suffix)))
+            handler.setFormatter(self.formatter)
+            self._files[worker] = handler
+        handler.emit(record)
+
+    def close(self):
+        for handler in self._files.values():
+            handler.close()
+        super().close()
+
+
+_listener = None  # QueueListener of the running async logging
+_saved_root = None  # (handlers, their formatters, level) of the root logger before setup_async_logging
+
+
+def setup_async_logging(*, level=logging.INFO, json_lines=False, log_dir=None, per_worker=False,
+                        queue_size=-1):
+    """
+    Route all the records through a queue to a background writer, so logging never blocks the workers
+    :param level: level of the root logger
+    :param json_lines: flag of if writing json lines (with request id and worker) instead of plain text
+    :param log_dir: folder to write the logs into, None to keep the current root handlers (console)
+    :param per_worker: with log_dir, flag of if writing one file per worker instead of a single one
+    :param queue_size: max records waiting to be written, -1 for unbounded
+    :return: the running QueueListener
+    """
+
+    global _listener, _saved_root
+    stop_async_logging()
+
+    root = logging.getLogger()
+    _saved_root = (list(root.handlers), [h.formatter for h in root.handlers], root.level)
+
+    if json_lines:
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    if log_dir is None:
+        handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)] or [logging.StreamHandler()]
+    else:
+        os.makedirs(log_dir, exist_ok=True)
+        suffix = '.jsonl' if json_lines else '.log'
+        if per_worker:
+            handlers = [_PerWorkerFileHandler(log_dir, suffix)]
+        else:
+            handlers = [logging.FileHandler(os.path.join(log_dir, 'taf' + suffix))]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = _AsyncQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(RequestIdFilter())
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_async_logging():
+    """ Flush the queued records, stop the background writer and restore the root logger as it was before """
+
+    global _listener, _saved_root
+    if _listener is None:
+        return
+
+    listener, _listener = _listener, None
+    listener.stop()  # writes the records left in the queue
+
+    handlers, formatters, level = _saved_root
+    _saved_root = None
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, _AsyncQueueHandler):
+            root.removeHandler(handler)
+    for handler in listener.handlers:
+        if handler not in handlers:
+            handler.close()  # the files opened under log_dir
+    for handler, formatter in zip(handlers, formatters):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+atexit.register(stop_async_logging)  # flush the queued records at exit
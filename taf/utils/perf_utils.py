@@ -0,0 +1,200 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LatencyHistogram:
+    def __init__(self, significant_digits=2):
+        """
+        HDR-style histogram: exact below <sub_bucket_count> microseconds, then log-linear buckets
+        whose width keeps the relative error within the given significant digits
+        :param significant_digits: decimal digits of precision kept for each recorded value
+        """
+
+        if not 1 <= significant_digits <= 5:
+            raise ValueError('Argument <significant_digits> should be in range 1 to 5')
+
+        self._sub_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self._sub_count = 1 << self._sub_bits
+
+        self._counts = {}  # bucket index -> count
+        self._lock = threading.Lock()
+
+        self.count = 0
+        self.total = 0  # sum of recorded values in microseconds
+        self.min = None
+        self.max = None
+
+    def _index(self, us):
+        if us < self._sub_count:
+            return us
+        shift = us.bit_length() - self._sub_bits
+        return (shift << self._sub_bits) + (us >> shift)
+
+    def _value_of(self, index):
+        """ Highest value equivalent to the bucket, in microseconds """
+
+        shift, sub = divmod(index, self._sub_count)
+        if not shift:
+            return sub
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds, count=1):
+        """
+        Record a latency
+        :param seconds: latency in seconds
+        :param count: number of occurrences of this latency
+        """
+
+        us = max(int(seconds * 1e6), 0)
+        index = self._index(us)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + count
+            self.count += count
+            self.total += us * count
+            self.min = us if self.min is None else min(self.min, us)
+            self.max = us if self.max is None else max(self.max, us)
+
+    def merge(self, other):
+        """ Add all the values recorded by another histogram with the same precision """
+
+        if other._sub_bits != self._sub_bits:
+            raise ValueError('Cannot merge histograms with different precisions')
+
+        with self._lock:
+            for index, count in other._counts.items():
+                self._counts[index] = self._counts.get(index, 0) + count
+            self.count += other.count
+            self.total += other.total
+            for attr, func in (('min', min), ('max', max)):
+                mine, theirs = getattr(self, attr), getattr(other, attr)
+                setattr(self, attr, theirs if mine is None else mine if theirs is None else func(mine, theirs))
+        return self
+
+    def percentile(self, p):
+        """
+        Get the value at the given percentile
+        :param p: percentile in range 0 to 100
+        :return: latency in seconds, 0.0 if nothing recorded
+        """
+
+        if not self.count:
+            return 0.0
+
+        target = max(math.ceil(self.count * p / 100), 1)
+        seen = 0
+        with self._lock:
+            for index in sorted(self._counts):
+                seen += self._counts[index]
+                if seen >= target:
+                    return min(self._value_of(index), self.max) / 1e6
+        return self.max / 1e6
+
+    @property
+    def mean(self):
+        return self.total / self.count / 1e6 if self.count else 0.0
+
+    def summary(self):
+        """ Dict of the common statistics, latencies in seconds """
+
+        return {'count': self.count,
+                'min': (self.min or 0) / 1e6,
+                'mean': self.mean,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'p999': self.percentile(99.9),
+                'max': (self.max or 0) / 1e6}
+
+
+class PhaseTimer:
+    def __init__(self, prefix='taf'):
+        """
+        Aggregator of the time spent in each named phase, thread-safe to share between dispatches
+        :param prefix: prefix of the metric names when exported to prometheus
+        """
+
+        self.prefix = prefix
+        self._stats = {}  # phase -> [count, total, max]
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, into=None):
+        """
+        Record the time spent in a phase
+        :param name: name of the phase
+        :param seconds: elapsed time in seconds
+        :param into: optional dict to store the single measurement as well
+        """
+
+        if into is not None:
+            into[name] = into.get(name, 0) + seconds
+
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                self._stats[name] = [1, seconds, seconds]
+            else:
+                stat[0] += 1
+                stat[1] += seconds
+                stat[2] = max(stat[2], seconds)
+
+    @contextmanager
+    def phase(self, name, into=None):
+        """ Context manager timing the enclosed block as the given phase """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, into)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self):
+        """ Dict of phase -> {count, total, mean, max}, time in seconds """
+
+        with self._lock:
+            return {name: {'count': count, 'total': total, 'mean': total / count, 'max': max_}
+                    for name, (count, total, max_) in self._stats.items()}
+
+    def export_json(self, path):
+        """
+        Dump the aggregates into a json file
+        :param path: path of the json file
+        """
+
+        atomic_write(path, json.dumps(self.summary(), indent=4))
+
+    def export_prometheus(self, path):
+        """
+        Dump the aggregates into a textfile readable by the node_exporter textfile collector
+        :param path: path of the .prom file
+        """
+
+        metric = self.prefix + '_phase_seconds'
+        lines = ['# HELP %s Time spent in each phase of the dispatch pipeline.' % metric,
+                 '# TYPE %s summary' % metric]
+        max_lines = ['# HELP %s_max Longest time spent in each phase.' % metric,
+                     '# TYPE %s_max gauge' % metric]
+
+        for name, stat in sorted(self.summary().items()):
+            label = '{phase="%s"}' % name
+            lines.append('%s_sum%s %.9f' % (metric, label, stat['total']))
+            lines.append('%s_count%s %d' % (metric, label, stat['count']))
+            max_lines.append('%s_max%s %.9f' % (metric, label, stat['max']))
+
+        atomic_write(path, '\n'.join(lines + max_lines) + '\n')
+
+
+def atomic_write(path, content):
+    """ Write to a temp file then rename, so readers never see a partial file """
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
@@ -0,0 +1,74 @@
+import lxml.etree as et
+
+from .api_utils import element2dict
+from .codec_utils import json_loads, xml_loads
+
+
+def body_kind(content_type, head=''):
+    """
+    Judge the format of the response body
+    :param content_type: Content-Type header of the response
+    :param head: first chars (or bytes) of the body, sniffed when Content-Type tells nothing
+    :return: 'json' or 'xml'
+    """
+
+    content_type = content_type.lower()
+    if 'json' in content_type:
+        return 'json'
+    if 'xml' in content_type:
+        return 'xml'
+
+    head = head.lstrip()
+    return 'xml' if head[:1] in ('<', b'<') else 'json'
+
+
+class ParsedResponse:
+    def __init__(self, body, content_type='', kind=None):
+        """
+        Response body parsed exactly once, the parsed doc is shared by schema validation,
+        dict conversion and process_response
+        :param body: response str
+        :param content_type: Content-Type header of the response, used to pick the parser
+        :param kind: 'json' or 'xml' to force the parser regardless of Content-Type
+        """
+
+        self.body = body
+        self.content_type = content_type
+        self.kind = kind or body_kind(content_type, body[:64])
+
+        self.error = None  # exception raised while parsing, None if parsed
+
+        self._doc = None
+        self._parsed = False
+        self._dicts = {}  # strip_ns -> dict converted from the xml doc
+
+    @property
+    def doc(self):
+        """ Parsed json obj or lxml root element, None if the body could not be parsed """
+
+        if not self._parsed:
+            self._parsed = True
+            try:
+                self._doc = json_loads(self.body) if self.kind == 'json' else xml_loads(self.body)
+            except (ValueError, et.XMLSyntaxError) as err:
+                self.error = err
+        return self._doc
+
+    @property
+    def ok(self):
+        self.doc  # noqa, parse on demand
+        return self.error is None
+
+    def to_dict(self, strip_ns=False):
+        """
+        Dict of the parsed doc (same shape as xml2dict for xml)
+        :param strip_ns: flag to decide if stripping the ns prefix of xml elements
+        """
+
+        doc = self.doc
+        if self.kind == 'json' or doc is None:
+            return doc
+
+        if strip_ns not in self._dicts:
+            self._dicts[strip_ns] = element2dict(doc, strip_ns)
+        return self._dicts[strip_ns]
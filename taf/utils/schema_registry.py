@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import threading
+
+import lxml.etree as et
+
+from .file_cache import FileCache
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_SUFFIXES = ('.xsd', '.json')
+
+
+class CompiledSchema:
+    def __init__(self, path, validator):
+        """
+        Schema compiled once and shared by all the validations
+        :param path: path of the schema file
+        :param validator: et.XMLSchema for .xsd, jsonschema validator for .json
+        """
+
+        self.path = path
+        self.validator = validator
+
+        # XMLSchema keeps the errors of the last validation on itself, so xml validations are serialized
+        self.lock = threading.Lock()
+
+
+def _compile(path):
+    if path.endswith('.xsd'):
+        # parsed from the file so xs:import/xs:include are resolved relative to it
+        return et.XMLSchema(et.parse(path))
+
+    import jsonschema  # imported on demand, only needed once a json schema is used
+
+    with open(path) as f:
+        schema = json.load(f)
+    jsonschema.validators.Draft6Validator.check_schema(schema)  # SchemaError now rather than at validation
+    return jsonschema.validators.Draft6Validator(schema, format_checker=jsonschema.FormatChecker())
+
+
+class SchemaRegistry(FileCache):
+    def __init__(self, maxsize=128, check_mtime=True):
+        """
+        Process-wide cache of compiled schemas keyed by the schema file path
+        :param maxsize: max number of schemas kept in the registry
+        :param check_mtime: flag of if recompiling the schema when the mtime of its file changed
+        """
+
+        super().__init__(maxsize, check_mtime)
+
+    def _build(self, path):
+        return CompiledSchema(path, _compile(path))
+
+    def get(self, path):
+        """
+        Get the compiled schema
+        :param path: path of the .xsd or .json schema file
+        :rtype: CompiledSchema
+        """
+
+        if not path.endswith(SCHEMA_SUFFIXES):
+            raise ValueError('Schema file <%s> should be one of %s' % (path, SCHEMA_SUFFIXES))
+        return super().get(path)
+
+    def preload(self, directory):
+        """
+        Compile all the schema files under the directory ahead of the first validation
+        :param directory: root folder of the schemas, e.g. proj_root + '/schema'
+        :return: number of schemas compiled or already cached
+        """
+
+        from jsonschema.exceptions import SchemaError
+
+        count = 0
+        for dir_path, _, file_names in os.walk(directory):
+            for file_name in sorted(file_names):
+                if not file_name.endswith(SCHEMA_SUFFIXES):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                try:
+                    self.get(path)
+                    count += 1
+                except (et.XMLSchemaParseError, et.XMLSyntaxError, ValueError, SchemaError) as err:
+                    logger.warning('Schema <%s> could not be compiled: %s', path, err)
+        return count
+
+
+schema_registry = SchemaRegistry()  # shared by all the validators
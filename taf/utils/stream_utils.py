@@ -0,0 +1,229 @@
+import io
+import json
+import tempfile
+
+import lxml.etree as et
+
+from .api_utils import encoding, element2dict, xmlfile2dict
+from .codec_utils import json_loads
+from .response_utils import body_kind
+
+# chunk size used when reading the response and the spooled file
+CHUNK_SIZE = 64 * 1024
+
+# responses bigger than this are spilled from memory into a temp file
+SPOOL_SIZE = 1024 * 1024
+
+_NUMBER_CHARS = '0123456789+-.eE'
+
+
+class _JsonStreamReader:
+    def __init__(self, fp):
+        """
+        Minimal incremental reader walking a json document without loading all of it
+        :param fp: text file object
+        """
+
+        self._fp = fp
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._fp.read(CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """ Next non-whitespace char, '' at the end of the document """
+
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError('Expecting one of %r in json stream, got %r' % (chars, c))
+        self._pos += 1
+        return c
+
+    def value(self):
+        """ Decode the next complete json value """
+
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # a number at the end of the buffer may continue in the next chunk (e.g. '0.' + '25')
+            if (isinstance(obj, (int, float)) and not self._eof
+                    and not self._buf[end:].strip(_NUMBER_CHARS) and self._fill()):
+                continue
+            self._pos = end
+            return obj
+
+    def seek_path(self, keys):
+        """ Move to the value under the dotted keys of nested objects """
+
+        for key in keys:
+            self.expect('{')
+            while True:
+                if self.peek() == '}':
+                    raise KeyError('Path key [%s] is not found in json stream' % key)
+                name = self.value()
+                self.expect(':')
+                if name == key:
+                    break
+                self.value()  # skip the sibling value
+                if self.expect(',}') == '}':
+                    raise KeyError('Path key [%s] is not found in json stream' % key)
+
+    def build(self):
+        """ Decode the next value, containers member by member so the buffer never holds more than a scalar """
+
+        c = self.peek()
+        if c not in ('{', '['):
+            return self.value()
+
+        self._pos += 1
+        close = '}' if c == '{' else ']'
+        container = {} if c == '{' else []
+        if self.peek() == close:
+            self._pos += 1
+            return container
+
+        while True:
+            if c == '{':
+                key = self.value()
+                self.expect(':')
+                container[key] = self.build()
+            else:
+                container.append(self.build())
+            if self.expect(',' + close) == close:
+                return container
+
+    def iter_array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
+class StreamedBody:
+    def __init__(self, content_type='', spool_size=SPOOL_SIZE):
+        """
+        Response body read in chunks and spilled to a temp file once it exceeds <spool_size>
+        :param content_type: Content-Type header of the response, used to pick the parser
+        :param spool_size: max bytes kept in memory before spilling to disk
+        """
+
+        self.content_type = content_type.lower()
+        self.size = 0
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        self._spool_size = spool_size
+        self._head = b''  # first bytes, used to sniff the format
+
+    def write(self, chunk):
+        if len(self._head) < 64:
+            self._head += chunk[:64]
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    @property
+    def kind(self):
+        """ 'json' or 'xml', judged from Content-Type, then from the first bytes """
+
+        return body_kind(self.content_type, self._head)
+
+    def open(self):
+        """ Binary file object positioned at the start of the body """
+
+        self._file.seek(0)
+        return self._file
+
+    def read_text(self):
+        """ Whole body as str (loads all of it into memory) """
+
+        return self.open().read().decode(encoding)
+
+    def to_dict(self, strip_ns=False):
+        """
+        Parse the whole body into dict without holding the raw str in memory
+        :param strip_ns: flag to decide if stripping the ns prefix of xml elements
+        """
+
+        if self.kind != 'json':
+            return xmlfile2dict(self.open(), strip_ns)
+
+        if self.size <= self._spool_size:
+            return json_loads(self.open().read())  # still in memory anyway
+
+        fp = io.TextIOWrapper(self.open(), encoding=encoding)
+        try:
+            return _JsonStreamReader(fp).build()
+        finally:
+            fp.detach()
+
+    def iter_items(self, path, strip_ns=False):
+        """
+        Yield the repeated items one by one, memory stays bounded by the size of one item
+        :param path: json: dotted keys of the array ('' for a top-level array);
+                     xml: local name of the repeated element (last segment if dotted)
+        :param strip_ns: flag to decide if stripping the ns prefix of xml elements
+        :return: the generator object
+        """
+
+        if self.kind == 'json':
+            fp = io.TextIOWrapper(self.open(), encoding=encoding)
+            try:
+                reader = _JsonStreamReader(fp)
+                reader.seek_path(path.split('.') if path else [])
+                yield from reader.iter_array()
+            finally:
+                if not fp.closed:  # closed under a half-read generator when the body is replaced
+                    fp.detach()
+            return
+
+        tag = '{*}' + path.split('.')[-1]
+        for _, ele in et.iterparse(self.open(), events=('end',), tag=tag, huge_tree=True):
+            yield next(iter(element2dict(ele, strip_ns=strip_ns).values()))
+
+            # drop the parsed elements so the tree does not grow
+            ele.clear(keep_tail=True)
+            while ele.getprevious() is not None:
+                del ele.getparent()[0]
+
+    def close(self):
+        """ Release the spooled memory or temp file, the body cannot be read afterwards """
+
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,286 @@
+import logging
+import os
+import random
+import socket
+import threading
+from collections import Counter
+from urllib.parse import parse_qsl
+
+from .api_utils import proj_root, encoding, var_overrides
+from .codec_utils import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+_STATUS_TEXT = {200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+def sample_from_schema(schema):
+    """
+    Build the smallest instance of a json schema (default/examples/enum are preferred when given)
+    :param schema: parsed json schema
+    """
+
+    if not isinstance(schema, dict):
+        return None
+    for key in ('default', 'const'):
+        if key in schema:
+            return schema[key]
+    if schema.get('examples'):
+        return schema['examples'][0]
+    if schema.get('enum'):
+        return schema['enum'][0]
+    for key in ('oneOf', 'anyOf', 'allOf'):
+        if schema.get(key):
+            return sample_from_schema(schema[key][0])
+
+    typ = schema.get('type', 'object' if 'properties' in schema else 'null')
+    if isinstance(typ, list):
+        typ = typ[0]
+
+    if typ == 'object':
+        return dict((name, sample_from_schema(sub)) for name, sub in schema.get('properties', {}).items())
+    if typ == 'array':
+        return [sample_from_schema(schema.get('items', {}))] * schema.get('minItems', 1)
+    if typ == 'string':
+        return 'x' * schema.get('minLength', 6) if 'minLength' in schema else 'string'
+    if typ == 'integer':
+        return schema.get('minimum', 0)
+    if typ == 'number':
+        return float(schema.get('minimum', 0))
+    if typ == 'boolean':
+        return True
+    return None
+
+
+class _Route:
+    def __init__(self, body, status, content_type, headers, latency, jitter):
+        self.body = body  # bytes, or str if templated
+        self.status = '%d %s' % (status, _STATUS_TEXT.get(status, ''))
+        self.headers = [('Content-Type', content_type)] + list((headers or {}).items())
+        self.latency = latency
+        self.jitter = jitter
+
+    def render(self, params):
+        """ Substitute {{name}} with the query params and top-level fields of the json request body """
+
+        if isinstance(self.body, bytes):
+            return self.body
+
+        body = self.body
+        for key, val in params.items():
+            body = body.replace('{{%s}}' % key, str(val))
+        return body.encode(encoding)
+
+
+class StubServer:
+    def __init__(self, host='127.0.0.1', port=0, *, latency=0.0, jitter=0.0):
+        """
+        In-process gevent stub of the services behind the api objects, serves canned responses by path
+        :param host: host to listen on
+        :param port: port to listen on, 0 for a free one
+        :param latency: default seconds added to every response
+        :param jitter: default max random seconds added on top of latency
+        """
+
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+
+        self.hits = Counter()  # path -> requests served
+
+        self._routes = {}  # (method or None, path or endpoint) -> _Route
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._stopping = threading.Event()
+        self._error = None  # raised by the serving thread before it started listening
+
+    def route(self, path, *, method=None, body=None, file=None, schema=None, status=200, content_type=None,
+              headers=None, latency=None, jitter=None):
+        """
+        Register a canned response
+        :param path: full path of the request, or its last segments (e.g. the endpoint of an api obj)
+        :param method: http method to match, None for all
+        :param body: response body, anything but str/bytes is dumped into json; str may hold {{name}} placeholders
+                     filled from the query params and the top-level fields of the json request body
+        :param file: path of the response file inside 'proj_root/json/' folder, used if body is None
+        :param schema: path of the json schema file inside 'proj_root/schema/' folder, a minimal valid
+                       instance is served if neither body nor file is given
+        :param status: response status code
+        :param content_type: Content-Type of the response, judged from the body if None
+        :param headers: extra response headers
+        :param latency: seconds added to the response, default is the server one
+        :param jitter: max random seconds added on top of latency, default is the server one
+        """
+
+        if body is None and file:
+            with open(os.path.join(proj_root, 'json', file), encoding=encoding) as f:
+                body = f.read()
+        elif body is None and schema:
+            with open(os.path.join(proj_root, 'schema', schema), encoding=encoding) as f:
+                body = json_dumps(sample_from_schema(json_loads(f.read())))  # a string sample is json too
+        if body is None:
+            body = ''
+
+        if not isinstance(body, (str, bytes)):
+            body = json_dumps(body)  # dict/list and the scalars
+        if content_type is None:
+            xml = body.lstrip()[:1] in ('<', b'<')
+            content_type = 'text/xml; charset=UTF-8' if xml else 'application/json'
+        if isinstance(body, str) and '{{' not in body:
+            body = body.encode(encoding)
+
+        self._routes[(method and method.upper(), '/' + path.strip('/'))] = _Route(
+            body, status, content_type, headers, self.latency if latency is None else latency,
+            self.jitter if jitter is None else jitter)
+        return self
+
+    def add_objects(self, classes=None, **kwargs):
+        """
+        Route the endpoint of each api obj to its canned response, 'proj_root/json/stubs/<endpoint>.json'
+        (or .xml) if it exists, otherwise an empty body
+        :param classes: APIBaseObject's subclasses, all the registered ones if None
+        :param kwargs: arguments of route(), e.g. latency
+        """
+
+        if classes is None:
+            from ..objects.api import api_registry
+            classes = api_registry.scan()
+
+        for cls in classes:
+            if not cls.endpoint:
+                continue
+            name = cls.endpoint.strip('/').replace('/', '_')
+            for ext in ('.json', '.xml'):
+                if os.path.exists(os.path.join(proj_root, 'json', 'stubs', name + ext)):
+                    self.route(cls.endpoint, file='stubs/' + name + ext, **kwargs)
+                    break
+            else:
+                route_kwargs = dict({'body': '<Response/>' if cls.soap_skin else '{}'}, **kwargs)
+                self.route(cls.endpoint, **route_kwargs)
+        return self
+
+    def _match(self, method, path):
+        routes = self._routes
+        segments = path.rstrip('/').split('/')
+        # the longest registered suffix of the path wins, e.g. /api/orders matches 'orders'
+        for i in range(len(segments)):
+            suffix = '/'.join(segments[i:]) or '/'
+            if not suffix.startswith('/'):
+                suffix = '/' + suffix
+            route = routes.get((method, suffix)) or routes.get((None, suffix))
+            if route is not None:
+                return route
+        return None
+
+    def _app(self, environ, start_response):
+        import gevent
+
+        method, path = environ['REQUEST_METHOD'], environ.get('PATH_INFO', '/')
+        route = self._match(method, path)
+        self.hits[path] += 1
+
+        if route is None:
+            start_response('404 Not Found', [('Content-Type', 'application/json')])
+            return [json_dumps({'error': 'no stub route for %s %s' % (method, path)}).encode(encoding)]
+
+        params = {}
+        if not isinstance(route.body, bytes):
+            params.update(parse_qsl(environ.get('QUERY_STRING', '')))
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            if length:
+                try:
+                    rq = json_loads(environ['wsgi.input'].read(length))
+                    if isinstance(rq, dict):
+                        params.update(rq)
+                except ValueError:
+                    pass
+
+        delay = route.latency + (random.uniform(0, route.jitter) if route.jitter else 0)
+        if delay:
+            gevent.sleep(delay)  # cooperative, other requests are still served meanwhile
+
+        body = route.render(params)
+        start_response(route.status, route.headers + [('Content-Length', str(len(body)))])
+        return [body]
+
+    def _serve(self):
+        try:
+            import gevent
+            from gevent.pywsgi import WSGIServer, WSGIHandler
+
+            class _Handler(WSGIHandler):
+                def handle(self):
+                    # no Nagle delay on keep-alive connections (headers and body may go in separate writes)
+                    self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    return super().handle()
+
+            self._server = WSGIServer((self.host, self.port), self._app, log=None, error_log=logger,
+                                      handler_class=_Handler)
+            self._server.start()
+            self.port = self._server.server_port
+        except BaseException as err:
+            self._error = err  # re-raised by start()
+            return
+        finally:
+            self._started.set()
+
+        while not self._stopping.is_set():
+            gevent.sleep(0.05)
+        self._server.stop(timeout=1)
+        gevent.get_hub().destroy(destroy_loop=True)  # the hub of this thread dies with it
+
+    def start(self):
+        """ Serve in a background thread (with its own gevent hub) """
+
+        self._stopping.clear()
+        self._started.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._serve, name='taf-stub-server', daemon=True)
+        self._thread.start()
+
+        if not self._started.wait(10):
+            self.stop()
+            raise TimeoutError('Stub server did not start listening on %s:%d within 10s' % (self.host, self.port))
+        if self._error is not None:
+            self._thread = None
+            raise self._error
+        logger.info('Stub server listening on <%s>', self.url)
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % (self.host, self.port)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def point_base_url(url):
+    """
+    Point the BaseUrl variable of the api objects built (or cloned from a prototype) afterwards at url
+    :return: previous override, pass it to restore_base_url
+    """
+
+    previous = var_overrides.get('BaseUrl')
+    var_overrides['BaseUrl'] = url
+    return previous
+
+
+def restore_base_url(previous):
+    if previous is None:
+        var_overrides.pop('BaseUrl', None)
+    else:
+        var_overrides['BaseUrl'] = previous
+
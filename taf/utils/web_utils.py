@@ -1,5 +1,5 @@
 import configparser
-from functools import wraps
+from functools import wraps, lru_cache
 from platform import system
 
 from selenium.common.exceptions import StaleElementReferenceException
@@ -9,9 +9,21 @@ from selenium.webdriver.support.wait import WebDriverWait
 from .err_msg import WAIT_TIME_OUT
 from ..utils import proj_root, typeassert
 
-# Reader of project config file (.ini)
-config = configparser.ConfigParser()
-config.read(proj_root + '/test_config.ini')
+
+@lru_cache(maxsize=None)
+def get_config():
+    """ Reader of project config file (.ini), read on first use """
+
+    config = configparser.ConfigParser()
+    config.read(proj_root + '/test_config.ini')
+    return config
+
+
+def __getattr__(name):
+    # <config> used to be read at import time, still reachable as a module attribute
+    if name == 'config':
+        return get_config()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 def non_private_vars(cls):
@@ -37,6 +49,7 @@ def fluent_wait(driver, selector, *, sel_type=By.CSS_SELECTOR, unique_loc=True,
     if isinstance(selector, tuple):  # Return value of <get_loc> in page object
         selector, sel_type = selector
 
+    config = get_config()
     if not timeout:
         try:
             timeout = int(config['TEST_CONTROL']['WAIT_TIME_OUT'])
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+from taf.utils import api_utils, stub_server
+from taf.objects.api import api_base_obj
+
+pytest_plugins = ['pytester']
+
+
+def write_env(root, name, variables):
+    """ Env file of variables, in the format of the 'env/' folder """
+
+    with open(os.path.join(root, 'env', name + '.json'), 'w') as f:
+        json.dump([{'key': key, 'value': val, 'enabled': True} for key, val in variables.items()], f)
+
+
+@pytest.fixture
+def proj(tmp_path, monkeypatch):
+    """ Throwaway proj_root with env/globals.json and env/qa.json """
+
+    root = str(tmp_path)
+    for folder in ('env', 'json', 'schema', 'log'):
+        os.makedirs(os.path.join(root, folder))
+    write_env(root, 'globals', {'Context': 'api'})
+    write_env(root, 'qa', {'BaseUrl': 'http://qa.local'})
+
+    for module in (api_utils, api_base_obj, stub_server):
+        monkeypatch.setattr(module, 'proj_root', root)
+    return root
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests.append((self.command, self.path, dict(self.headers), body))
+
+        route = self.server.routes.get(urlsplit(self.path).path)
+        status, headers, content = route(self.headers, body) if route else (404, {}, b'')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if isinstance(content, bytes):
+            self.send_header('Content-Length', str(len(content)))
+            content = [content]
+        self.end_headers()
+        for chunk in content:  # a generator route sets Content-Length itself and may pause between chunks
+            self.wfile.write(chunk)
+            self.wfile.flush()
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+@pytest.fixture
+def http_server():
+    """
+    Local http server, <routes> maps a path to callable(request headers, body) -> (status, headers, content),
+    content is bytes or an iterable of chunks, <requests> lists the (method, path, headers, body) it received
+    """
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.routes, server.requests = {}, []
+    server.url = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,85 @@
+import os
+
+from taf.entrance import ApiEntrance
+from taf.objects.api import RestBaseObject, ApiObjectRegistry
+
+from conftest import write_env
+
+
+class Catalog(RestBaseObject):
+    endpoint = 'catalog'
+
+    def __init__(self, env, rq_name=None):
+        self.default_headers = {'X-Client': 'tests'}  # set before the base constructor
+        super().__init__(env, rq_name)
+        self.seen = []  # mutable state of the subclass
+
+
+def test_clones_do_not_share_state(proj):
+    registry = ApiObjectRegistry()
+    a, b = registry.new(Catalog, env='qa'), registry.new(Catalog, env='qa')
+
+    a.seen.append(1)
+    a.append_headers(Extra='1')
+    a.rq_dict['k'] = 'v'
+
+    assert b.seen == [] and b.rq_dict == {}
+    assert b.default_headers == {'X-Client': 'tests'}
+    assert a.url == b.url == 'http://qa.local/api/catalog'
+
+
+def test_constructor_state_survives(proj):
+    obj = Catalog(env='qa')
+    assert obj.default_headers == {'X-Client': 'tests'}
+    assert ApiObjectRegistry().new(Catalog, env='qa').default_headers == {'X-Client': 'tests'}
+
+
+def test_clone_sees_changed_env_files(proj):
+    registry = ApiObjectRegistry()
+    assert registry.new(Catalog, env='qa').url == 'http://qa.local/api/catalog'
+
+    write_env(proj, 'qa', {'BaseUrl': 'http://staging.local'})
+    path = os.path.join(proj, 'env', 'qa.json')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert registry.new(Catalog, env='qa').url == 'http://staging.local/api/catalog'
+
+
+def test_prototype_reuse_is_opt_in():
+    assert ApiEntrance.reuse_prototypes is False
+
+
+class Counted(RestBaseObject):
+    endpoint = 'counted'
+    built = 0
+
+    def __init__(self, env, rq_name=None):
+        type(self).built += 1
+        super().__init__(env, rq_name)
+
+
+def test_spawn_clones_the_prototype_when_reuse_is_set_on_the_instance(proj, monkeypatch):
+    from taf.objects.api import api_registry
+
+    monkeypatch.setattr(Counted, 'built', 0)
+    api_registry.reset(Counted)
+    entrance = ApiEntrance(__name__, 'Counted', env='qa')
+    entrance.reuse_prototypes = True
+
+    spawned = [entrance.spawn() for _ in range(3)]
+
+    assert Counted.built == 2  # the entrance's own obj, then the prototype the spawned ones are cloned from
+    assert all(s.reuse_prototypes for s in spawned)
+    assert len({id(s.api_obj) for s in spawned}) == 3
+    api_registry.reset(Counted)
+
+
+def test_spawn_constructs_when_reuse_is_off(proj, monkeypatch):
+    monkeypatch.setattr(Counted, 'built', 0)
+    entrance = ApiEntrance(__name__, 'Counted', env='qa')
+
+    entrance.spawn()
+    entrance.spawn()
+
+    assert Counted.built == 3
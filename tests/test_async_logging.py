@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import threading
+
+import pytest
+
+from taf.utils import log_utils
+from taf.utils.log_utils import LazyBody, request_context, setup_async_logging, stop_async_logging
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(autouse=True)
+def stopped():
+    yield
+    stop_async_logging()
+
+
+def _records(log_dir, name='taf.jsonl'):
+    with open(os.path.join(log_dir, name)) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_request_ids_survive_the_queue(tmp_path):
+    setup_async_logging(json_lines=True, log_dir=str(tmp_path))
+
+    def dispatch(n):
+        with request_context('rq-%d' % n):
+            for i in range(20):
+                logger.info('request %d line %d', n, i)
+
+    threads = [threading.Thread(target=dispatch, args=(n,), name='w%d' % n) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logger.info('outside')
+    stop_async_logging()
+
+    records = [r for r in _records(str(tmp_path)) if r['logger'] == __name__]
+    assert len(records) == 81
+    for record in records:
+        if record['message'] == 'outside':
+            continue
+        n = int(record['message'].split()[1])
+        assert record['request_id'] == 'rq-%d' % n
+        assert record['worker'].endswith('-w%d' % n)
+    assert [r['request_id'] for r in records if r['message'] == 'outside'] == ['-']
+
+
+def test_per_worker_files(tmp_path):
+    setup_async_logging(log_dir=str(tmp_path), per_worker=True)
+
+    def work():
+        with request_context('abc'):
+            logger.info('from %s', threading.current_thread().name)
+
+    thread = threading.Thread(target=work, name='w1')
+    thread.start()
+    thread.join()
+    stop_async_logging()
+
+    [name] = [name for name in os.listdir(str(tmp_path)) if name.endswith('-w1.log')]
+    with open(os.path.join(str(tmp_path), name)) as f:
+        assert '[abc] from w1' in f.read()
+
+
+class _TrackedBody(LazyBody):
+    __slots__ = ()
+    rendered_on = []
+
+    def __str__(self):
+        self.rendered_on.append(threading.current_thread())
+        return super().__str__()
+
+
+def test_lazy_bodies_are_rendered_on_the_listener_thread(tmp_path):
+    listener = setup_async_logging(json_lines=True, log_dir=str(tmp_path))
+    writer = listener._thread
+    _TrackedBody.rendered_on.clear()
+
+    logger.info('Body: %s', _TrackedBody('{"a": 1}'))
+    stop_async_logging()
+
+    assert _TrackedBody.rendered_on == [writer]
+    messages = [r['message'] for r in _records(str(tmp_path)) if r['logger'] == __name__]
+    assert messages[0] == 'Body: {"a": 1}'
+
+
+def test_stop_restores_the_original_root_logger(tmp_path):
+    root = logging.getLogger()
+    formatter = logging.Formatter('original %(message)s')
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    root.addHandler(console)
+    try:
+        before, level = list(root.handlers), root.level
+
+        setup_async_logging(level=logging.DEBUG)  # reuses the console handlers
+        assert console.formatter is not formatter
+        assert isinstance(root.handlers[0], log_utils._AsyncQueueHandler) and len(root.handlers) == 1
+        stop_async_logging()
+
+        assert root.handlers == before and root.level == level
+        assert console.formatter is formatter
+
+        setup_async_logging(log_dir=str(tmp_path))  # replaces them with a file
+        file_handler = log_utils._listener.handlers[0]
+        stop_async_logging()
+
+        assert root.handlers == before and console.formatter is formatter
+        assert file_handler.stream is None  # closed
+    finally:
+        root.removeHandler(console)
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from taf.utils import api_utils, bounded_imap
+
+WORKERS = 4
+
+
+def _counting(n, pulled):
+    for i in range(n):
+        pulled.append(i)
+        yield i
+
+
+@pytest.fixture(params=['threads', 'gevent'])
+def backend(request, monkeypatch):
+    if request.param == 'gevent':
+        gevent = pytest.importorskip('gevent')
+        monkeypatch.setattr(api_utils, '_gevent_patched', lambda: True)
+        return gevent.sleep
+    monkeypatch.setattr(api_utils, '_gevent_patched', lambda: False)
+    return time.sleep
+
+
+def test_results_are_in_order(backend):
+    def func(i):
+        backend(0.01 * (i % 3))
+        return i * i
+
+    assert list(bounded_imap(func, range(50), WORKERS)) == [i * i for i in range(50)]
+
+
+def test_items_are_pulled_lazily_behind_a_slow_call(backend):
+    pulled = []
+
+    def func(i):
+        backend(0.2 if i == 0 else 0)
+        return i
+
+    results = bounded_imap(func, _counting(10000, pulled), WORKERS)
+    assert next(results) == 0
+
+    # the fast calls behind the slow one are not all buffered
+    assert len(pulled) <= WORKERS * 2 + WORKERS
+    results.close()
+
+
+def test_workers_must_be_positive():
+    with pytest.raises(ValueError):
+        list(bounded_imap(str, [1], 0))
@@ -0,0 +1,109 @@
+import gc
+import gzip
+import os
+import weakref
+
+import pytest
+
+from taf.clients.api import Cassette, Compression, RestBaseClient, SessionPool
+from taf.clients.api import cassette as cassette_module
+
+
+@pytest.fixture
+def pool():
+    pool = SessionPool()
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def counter(http_server):
+    """ /count answers with the number of requests received so far """
+
+    http_server.routes['/count'] = lambda headers, body: (
+        200, {'Content-Type': 'text/plain'}, str(len(http_server.requests)).encode())
+    return http_server.url + '/count'
+
+
+def test_record_then_replay_without_the_network(tmp_path, pool, http_server, counter):
+    recorder = Cassette(str(tmp_path), mode='record')
+    recorded = [recorder.request(pool.request, 'GET', counter + '?b=2&a=1').text for _ in range(2)]
+    recorder.close()
+
+    player = Cassette(str(tmp_path), mode='replay')
+    replayed = [player.request(pool.request, 'GET', counter + '?a=1&b=2').text for _ in range(3)]
+
+    assert recorded == ['1', '2']
+    assert replayed == ['1', '2', '2']  # in recording order, the last one repeats
+    assert len(http_server.requests) == 2
+    assert player.stats == {'hits': 3, 'misses': 0, 'recorded': 0, 'requests': 1}
+
+
+def test_auto_records_the_misses_only(tmp_path, pool, http_server, counter):
+    cassette = Cassette(str(tmp_path))
+
+    texts = [cassette.request(pool.request, method, counter, data=body).text
+             for method, body in (('POST', b'a'), ('POST', b'a'), ('POST', b'b'))]
+
+    assert texts == ['1', '1', '2']
+    assert cassette.stats == {'hits': 1, 'misses': 2, 'recorded': 2, 'requests': 2}
+
+
+def test_replay_raises_on_unrecorded_requests(tmp_path, pool, counter):
+    cassette = Cassette(str(tmp_path), mode='replay')
+
+    with pytest.raises(KeyError):
+        cassette.request(pool.request, 'GET', counter)
+
+
+def test_index_is_rebuilt_when_missing(tmp_path, pool, counter):
+    recorder = Cassette(str(tmp_path), mode='record')
+    recorder.request(pool.request, 'GET', counter)
+    assert not os.path.exists(os.path.join(str(tmp_path), 'index.json'))  # run killed before close
+
+    assert Cassette(str(tmp_path), mode='replay').request(pool.request, 'GET', counter).text == '1'
+
+
+def test_encoded_response_is_replayed_decoded(tmp_path, pool, http_server):
+    body = b'{"items": [1, 2, 3]}' * 100
+    http_server.routes['/items'] = lambda headers, _: (
+        200, {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}, gzip.compress(body))
+    url = http_server.url + '/items'
+
+    recorder = Cassette(str(tmp_path), mode='record')
+    RestBaseClient(pool=pool, cassette=recorder, compression=Compression()).send_req('GET', url, {}, params={'a': 1})
+    recorder.close()
+
+    player = Cassette(str(tmp_path), mode='replay')
+    replayed = player.request(pool.request, 'GET', url + '?a=1')
+    assert 'Content-Encoding' not in replayed.headers and 'Content-Length' not in replayed.headers
+
+    for compression in (None, Compression()):
+        client = RestBaseClient(pool=pool, cassette=player, compression=compression)
+        client.send_req('GET', url, {}, params={'a': 1})
+        assert client.rs_body == body.decode()
+
+
+def test_open_cassettes_are_not_kept_alive(tmp_path, pool, counter):
+    cassette = Cassette(str(tmp_path))
+    cassette.request(pool.request, 'GET', counter)
+
+    cassette_module._close_all()  # what runs at exit
+    assert os.path.exists(os.path.join(str(tmp_path), 'index.json'))
+
+    ref = weakref.ref(cassette)
+    del cassette
+    gc.collect()
+    assert ref() is None
+
+
+@pytest.mark.parametrize('content, headers', [(b'x' * 2048, {}), (iter([b'x' * 100]), {'Connection': 'close'})])
+def test_streamed_bodies_over_the_limit_are_not_recorded(tmp_path, pool, http_server, content, headers):
+    http_server.routes['/big'] = lambda _, body: (200, headers, content)
+    cassette = Cassette(str(tmp_path), max_body_size=1024)
+
+    response = cassette.request(pool.request, 'GET', http_server.url + '/big', stream=True)
+
+    assert not response._content_consumed
+    assert b''.join(response.iter_content(512)).startswith(b'x')
+    assert cassette.stats['recorded'] == 0
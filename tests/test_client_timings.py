@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from taf.clients.api import Compression, RestBaseClient, SessionPool
+from taf.utils import PhaseTimer
+
+DELAY = 0.2
+
+BODY = b'{"items": [1, 2, 3]}'
+
+
+@pytest.fixture
+def pool():
+    pool = SessionPool()
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def slow_body(http_server):
+    """ /slow sends its headers at once and its body DELAY seconds later """
+
+    def chunks():
+        time.sleep(DELAY)
+        yield BODY
+
+    http_server.routes['/slow'] = lambda headers, body: (
+        200, {'Content-Type': 'application/json', 'Content-Length': str(len(BODY))}, chunks())
+    return http_server.url + '/slow'
+
+
+@pytest.mark.parametrize('stream, compression', [(True, None), (False, Compression()), (True, Compression())])
+def test_streamed_body_read_is_network_time(pool, slow_body, stream, compression):
+    timer = PhaseTimer()
+    client = RestBaseClient(pool=pool, timer=timer, stream=stream, compression=compression)
+
+    client.send_req('GET', slow_body, {}, params={'a': 1})
+
+    timings = client.timings
+    assert timings['net_download'] >= DELAY
+    assert timings['send_req'] < DELAY  # only the headers are waited for
+    assert timings['output_response'] < DELAY
+    assert all(stat['count'] == 1 for stat in timer.summary().values())
+
+
+def test_buffered_body_read_is_network_time(pool, slow_body):
+    client = RestBaseClient(pool=pool, timer=PhaseTimer())
+
+    client.send_req('GET', slow_body, {}, params={'a': 1})
+
+    assert client.rs_body == BODY.decode()
+    assert client.timings['net_download'] >= DELAY
+    assert client.timings['send_req'] >= DELAY  # read in full by requests before returning
+    assert client.timings['output_response'] < DELAY
@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+import pytest
+
+from taf.utils import configure_codecs, json_dumps, json_loads, xml_loads
+from taf.utils.codec_utils import JSON_BACKENDS, codecs
+
+DOC = {'name': 'café', 'path': 'a/b', 'items': [1, {'id': 2}], 'empty': {}}
+
+BIG = {'id': 2 ** 70}  # beyond 64 bits, orjson falls back to the stdlib json
+
+
+@pytest.fixture(params=JSON_BACKENDS)
+def backend(request):
+    previous = codecs.json
+    configure_codecs(request.param)
+    if codecs.json.name != request.param:
+        codecs.json = previous
+        pytest.skip('json backend <%s> is not installed' % request.param)
+    yield request.param
+    codecs.json = previous
+
+
+def test_pretty_output_is_the_same_for_all_backends(backend):
+    pretty = json_dumps(DOC, pretty=True)
+
+    assert pretty.splitlines()[1] == '    "name": "café",'
+    configure_codecs('json')
+    assert json_dumps(DOC, pretty=True) == pretty
+
+
+def test_compact_round_trip(backend):
+    dumped = json_dumps(DOC)
+
+    assert '\n' not in dumped and 'café' in dumped
+    assert json_loads(dumped) == json_loads(dumped.encode('utf-8')) == DOC
+    assert json_loads(json_dumps(BIG)) == BIG
+
+
+def test_xml_loads_str_with_encoding_declaration():
+    root = xml_loads('<?xml version="1.0" encoding="UTF-8"?><r><v>café</v></r>')
+
+    assert root.findtext('v') == 'café'
+
+
+def test_codec_utils_imports_first_without_a_cycle():
+    code = 'from taf.utils.codec_utils import xml_loads; print(xml_loads("<r>x</r>").text)'
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+
+    assert out.strip() == 'x'
@@ -0,0 +1,109 @@
+import gzip
+import logging
+import zlib
+
+import pytest
+
+from taf.clients.api import Compression, HttpCache, RestBaseClient, SessionPool
+
+BODY = ('{"items": [%s]}' % ', '.join('{"id": %d, "name": "item %d"}' % (i, i) for i in range(200)))
+
+
+def _raw_deflate(data):
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)  # no zlib header, as some servers send 'deflate'
+    return compressor.compress(data) + compressor.flush()
+
+
+ENCODERS = {'gzip': gzip.compress, 'deflate': _raw_deflate, 'identity': lambda data: data}
+
+
+@pytest.fixture
+def pool():
+    pool = SessionPool()
+    yield pool
+    pool.close()
+
+
+def _serve(http_server, coding, body=BODY.encode(), **headers):
+    def route(request_headers, request_body):
+        return 200, dict({'Content-Type': 'application/json', 'Content-Encoding': coding}, **headers), \
+            ENCODERS.get(coding, lambda data: data)(body)
+    http_server.routes['/items'] = route
+
+
+@pytest.mark.parametrize('coding', ['gzip', 'deflate', 'identity'])
+@pytest.mark.parametrize('stream', [False, True])
+def test_response_round_trip(http_server, pool, coding, stream):
+    _serve(http_server, coding)
+    compression = Compression()
+    client = RestBaseClient(pool=pool, compression=compression, stream=stream)
+
+    client.send_req('GET', http_server.url + '/items', {}, params={'page': 1})
+
+    if stream:
+        with client.rs_stream.open() as f:
+            assert f.read() == BODY.encode()
+    else:
+        assert client.rs_body == BODY
+    wire = len(ENCODERS[coding](BODY.encode()))
+    assert client.transfer['response_raw'] == len(BODY) and client.transfer['response_wire'] == wire
+    assert client.transfer['compressed_responses'] == (coding != 'identity')
+    assert 'gzip' in http_server.requests[0][2]['Accept-Encoding']
+
+
+def test_fully_read_response_keeps_its_connection(http_server, pool):
+    _serve(http_server, 'gzip')
+    client = RestBaseClient(pool=pool, compression=Compression())
+
+    for _ in range(3):
+        client.send_req('GET', http_server.url + '/items', {}, params={'page': 1})
+
+    assert pool.stats['new_connections'] == 1
+
+
+def test_request_body_is_compressed(http_server, pool):
+    http_server.routes['/items'] = lambda headers, body: (201, {}, gzip.decompress(body))
+    compression = Compression('gzip', threshold=100)
+    client = RestBaseClient(pool=pool, compression=compression)
+
+    client.send_req('POST', http_server.url + '/items', {'accept-encoding': 'identity'}, rq_body=BODY)
+
+    _, _, headers, body = http_server.requests[0]
+    assert headers['Content-Encoding'] == 'gzip' and len(body) < len(BODY)
+    # not advertised again under another case
+    assert [value for name, value in headers.items() if name.lower() == 'accept-encoding'] == ['identity']
+    assert client.rs_body == BODY
+    assert compression.stats['request_raw'] == len(BODY) and compression.stats['request_wire'] == len(body)
+
+
+def test_unknown_coding_is_passed_through(http_server, pool, caplog):
+    _serve(http_server, 'x-custom', body=b'opaque')
+    client = RestBaseClient(pool=pool, compression=Compression())
+
+    with caplog.at_level(logging.WARNING):
+        client.send_req('GET', http_server.url + '/items', {}, params={'page': 1})
+
+    assert client.rs_body == 'opaque'
+    assert 'x-custom' in caplog.text
+
+
+def test_streamed_response_content_does_not_raise(pool, http_server):
+    _serve(http_server, 'gzip')
+    compression = Compression()
+    response = compression.request(pool.request, {}, 'GET', http_server.url + '/items')
+
+    assert b''.join(compression.iter_body(response, 1024, {})) == BODY.encode()
+    response.content  # noqa, read again after the body was streamed
+
+
+def test_request_bytes_are_not_counted_for_cache_hits(http_server, pool):
+    http_server.routes['/items'] = lambda headers, body: (200, {'Cache-Control': 'max-age=60'}, b'cached')
+    compression = Compression()
+    client = RestBaseClient(pool=pool, compression=compression, http_cache=HttpCache())
+
+    for _ in range(3):
+        client.send_req('GET', http_server.url + '/items', {}, params={'page': 1})
+
+    assert client.rs_body == 'cached' and len(http_server.requests) == 1
+    assert client.transfer == {'response_raw': 6, 'response_wire': 0, 'compressed_responses': 0}
+    assert compression.stats['response_raw'] == 18
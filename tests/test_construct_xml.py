@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from taf.objects.api import SoapBaseObject
+
+ORDER = {'Order.Id': '1', 'Order.Items[0].Sku': 'a', 'Order.Items[1].Sku': 'b', 'Order.Note(lang=en)': 'hi'}
+
+
+class Req(SoapBaseObject):
+    endpoint = 'soap'
+    xml_template_cache_size = 2
+
+    def process_response(self):
+        pass
+
+
+def _build(flat, compiled=True):
+    obj = Req(env='qa', rq_name='Req')
+    obj.compiled_xml = compiled
+    obj.unpack_json(j=dict(flat))
+    obj.construct_xml()
+    return obj.rq_body
+
+
+def test_compiled_skeleton_matches_the_uncompiled_build(proj):
+    assert _build(ORDER) == _build(ORDER, compiled=False)
+    assert _build(ORDER) == _build(ORDER)  # from the cache
+
+
+def test_skeleton_cache_evicts_the_least_recently_used(proj):
+    a, b, c = {'A': '1'}, {'B': '1'}, {'C': '1'}
+    for flat in (a, b, a, c):
+        _build(flat)
+
+    cached = [key[0] for key in Req.__dict__['_xml_templates']]
+    assert cached == [('A',), ('C',)]
+
+
+def test_concurrent_builds(proj):
+    expected = _build(ORDER, compiled=False)
+    bodies = [dict(ORDER, **{'Order.Id': str(i)}) for i in range(200)]
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(_build, bodies))
+    assert results == [expected.replace('<Id>1</Id>', '<Id>%d</Id>' % i) for i in range(200)]
@@ -0,0 +1,81 @@
+import pytest
+
+from taf.entrance import DataDrivenRunner
+from taf.utils import json_loads
+
+
+class Crash(BaseException):
+    """ Stands for the run being killed """
+
+
+class FakeObj:
+    def __init__(self):
+        self.variables = {}
+
+    @staticmethod
+    def load_json(json_mapping=None):
+        return dict(json_mapping or {})
+
+    def set_variables(self, **variables):
+        self.variables.update(variables)
+
+
+class FakeEntrance:
+    """ Records the dispatched rows instead of sending requests """
+
+    def __init__(self, sent, crash_at=None):
+        self.api_obj = FakeObj()
+        self.sent = sent
+        self.crash_at = crash_at
+
+    def spawn(self):
+        return FakeEntrance(self.sent, self.crash_at)
+
+    def dispatch_spec(self, spec, *, soap=False, **common):
+        row = int(self.api_obj.variables['id'])
+        if row == self.crash_at:
+            raise Crash()
+        self.sent.append((row, spec['j']))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / 'rows.csv'
+    path.write_text('id,name\n' + ''.join('%d,n%d\n' % (i, i) for i in range(1, 11)))
+    return str(path)
+
+
+def _rows(path):
+    with open(path) as f:
+        return [json_loads(line)['row'] for line in f]
+
+
+def test_resume_does_not_duplicate_results(tmp_path, dataset):
+    results, checkpoint = str(tmp_path / 'results.jsonl'), str(tmp_path / 'checkpoint.json')
+    columns = {'id': '{{id}}', 'name': 'Order.Name'}
+
+    sent = []
+    runner = DataDrivenRunner(FakeEntrance(sent, crash_at=8), dataset, columns=columns)
+    with pytest.raises(Crash):
+        runner.run(results, workers=1, checkpoint_path=checkpoint, checkpoint_every=3)
+    assert _rows(results) == [1, 2, 3, 4, 5, 6, 7]  # row 7 is after the last checkpoint
+
+    sent = []
+    runner = DataDrivenRunner(FakeEntrance(sent), dataset, columns=columns)
+    stats = runner.run(results, workers=1, checkpoint_path=checkpoint, checkpoint_every=3)
+
+    assert [row for row, _ in sent] == [7, 8, 9, 10]
+    assert sent[0][1] == {'Order.Name': 'n7'}
+    assert _rows(results) == list(range(1, 11))
+    assert stats['skipped'] == 6 and stats['passed'] == 4
+
+
+def test_common_kwargs_are_not_modified(dataset):
+    common = {'json_mapping': {'orders': 'create'}, 'with_body': True}
+    DataDrivenRunner(FakeEntrance([]), dataset, **common)
+    assert common == {'json_mapping': {'orders': 'create'}, 'with_body': True}
+
+
+def test_empty_body_is_rejected_up_front(dataset):
+    with pytest.raises(ValueError):
+        DataDrivenRunner(FakeEntrance([]), dataset, columns={'id': '{{id}}'})
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from taf.utils import FileCache, FixtureCache, SchemaRegistry
+
+pytest.importorskip('jsonschema')
+
+
+def _write(path, obj):
+    with open(path, 'w') as f:
+        json.dump(obj, f)
+    return str(path)
+
+
+class _SlowCache(FileCache):
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.builds = []
+
+    def _build(self, path):
+        self.builds.append(path)
+        time.sleep(0.05)
+        with open(path) as f:
+            return f.read()
+
+
+def test_fixture_cache_reloads_a_modified_file(tmp_path):
+    path = _write(tmp_path / 'env.json', {'a': 1})
+    cache = FixtureCache()
+
+    first = cache.load(path)
+    assert cache.load(path) is first
+    with pytest.raises(TypeError):
+        first['a'] = 2
+
+    _write(path, {'a': 2})
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert cache.load(path) == {'a': 2}
+    assert cache.stats == {'hits': 1, 'misses': 2, 'size': 1}
+
+
+def test_concurrent_misses_build_once(tmp_path):
+    path = _write(tmp_path / 'slow.json', {})
+    cache = _SlowCache(4)
+
+    threads = [threading.Thread(target=cache.get, args=(path,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.builds == [path]
+    assert cache.stats['hits'] == 7
+
+
+def test_eviction_drops_the_build_locks(tmp_path):
+    paths = [_write(tmp_path / ('%d.json' % i), {}) for i in range(5)]
+    cache = _SlowCache(2)
+
+    for path in paths:
+        cache.get(path)
+
+    assert list(cache._entries) == paths[-2:]
+    assert set(cache._build_locks) == set(paths[-2:])
+
+    cache.invalidate(paths[-1])
+    assert set(cache._build_locks) == {paths[-2]}
+
+
+def test_schema_registry_reports_invalid_schemas_at_compile_time(tmp_path, caplog):
+    valid = _write(tmp_path / 'valid.json', {'type': 'object'})
+    invalid = _write(tmp_path / 'invalid.json', {'type': 5})
+    registry = SchemaRegistry()
+
+    with caplog.at_level(logging.WARNING):
+        assert registry.preload(str(tmp_path)) == 1
+
+    assert invalid in caplog.text and valid not in caplog.text
+    assert registry.get(valid).validator.is_valid({})
+    assert invalid not in registry._build_locks
+
+
+def test_schema_registry_rejects_unknown_suffixes(tmp_path):
+    with pytest.raises(ValueError):
+        SchemaRegistry().get(str(tmp_path / 'schema.yaml'))
@@ -0,0 +1,165 @@
+import gzip
+
+import pytest
+
+from taf.clients.api import HttpCache, SessionPool
+
+
+@pytest.fixture
+def pool():
+    pool = SessionPool()
+    yield pool
+    pool.close()
+
+
+def _get(cache, pool, url, **headers):
+    return cache.request(pool.request, 'GET', url, headers=headers)
+
+
+def test_etag_revalidation_serves_the_stored_body(http_server, pool):
+    def catalog(headers, body):
+        if headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b''
+        return 200, {'ETag': '"v1"', 'Cache-Control': 'no-cache'}, b'{"catalog": [1, 2]}'
+    http_server.routes['/catalog'] = catalog
+    cache = HttpCache()
+
+    responses = [_get(cache, pool, http_server.url + '/catalog') for _ in range(3)]
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert all(r.content == b'{"catalog": [1, 2]}' for r in responses)
+    assert [h.get('If-None-Match') for _, _, h, _ in http_server.requests] == [None, '"v1"', '"v1"']
+    assert cache.stats['misses'] == 1 and cache.stats['revalidated'] == 2
+
+
+def test_last_modified_revalidation(http_server, pool):
+    modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+    def report(headers, body):
+        if headers.get('If-Modified-Since') == modified:
+            return 304, {'Cache-Control': 'max-age=60'}, b''
+        return 200, {'Last-Modified': modified}, b'report'
+    http_server.routes['/report'] = report
+    cache = HttpCache()
+
+    assert _get(cache, pool, http_server.url + '/report').content == b'report'
+    revalidated = _get(cache, pool, http_server.url + '/report')
+    assert revalidated.content == b'report' and revalidated.from_cache
+    assert revalidated.headers['Last-Modified'] == modified
+
+    # the 304 made it fresh for a minute, no more requests
+    assert _get(cache, pool, http_server.url + '/report').content == b'report'
+    assert len(http_server.requests) == 2
+    assert cache.stats['hits'] == 1
+
+
+def test_fresh_response_is_served_without_the_network(http_server, pool):
+    http_server.routes['/fresh'] = lambda headers, body: (200, {'Cache-Control': 'max-age=60'}, b'fresh')
+    cache = HttpCache()
+
+    _get(cache, pool, http_server.url + '/fresh?b=2&a=1')
+    hit = _get(cache, pool, http_server.url + '/fresh?a=1&b=2')  # same url once the query is sorted
+
+    assert hit.content == b'fresh' and hit.from_cache
+    assert len(http_server.requests) == 1
+
+
+def test_vary_keys_the_responses_on_the_request_headers(http_server, pool):
+    http_server.routes['/greeting'] = lambda headers, body: (
+        200, {'Cache-Control': 'max-age=60', 'Vary': 'Accept-Language'},
+        {'en': b'hello', 'fr': b'bonjour'}[headers['Accept-Language']])
+    cache = HttpCache()
+
+    bodies = [_get(cache, pool, http_server.url + '/greeting', **{'Accept-Language': lang}).content
+              for lang in ('en', 'en', 'fr', 'fr', 'en')]
+
+    assert bodies == [b'hello', b'hello', b'bonjour', b'bonjour', b'hello']
+    assert [h['Accept-Language'] for _, _, h, _ in http_server.requests] == ['en', 'fr']
+
+
+def test_no_store_is_not_cached(http_server, pool):
+    http_server.routes['/live'] = lambda headers, body: (200, {'Cache-Control': 'no-store'}, b'live')
+    cache = HttpCache()
+
+    for _ in range(2):
+        _get(cache, pool, http_server.url + '/live')
+
+    assert len(http_server.requests) == 2
+    assert cache.stats['stored'] == 0
+
+
+def test_disk_level_survives_a_new_cache(http_server, pool, tmp_path):
+    http_server.routes['/fresh'] = lambda headers, body: (200, {'Cache-Control': 'max-age=60'}, b'\xff\x00binary')
+
+    _get(HttpCache(path=str(tmp_path)), pool, http_server.url + '/fresh')
+    reloaded = _get(HttpCache(path=str(tmp_path)), pool, http_server.url + '/fresh')
+
+    assert reloaded.content == b'\xff\x00binary' and reloaded.from_cache
+    assert len(http_server.requests) == 1
+
+
+def test_unsafe_method_invalidates_the_url(http_server, pool, tmp_path):
+    http_server.routes['/item'] = lambda headers, body: (200, {'Cache-Control': 'max-age=60'}, b'item')
+    cache = HttpCache(path=str(tmp_path))
+
+    _get(cache, pool, http_server.url + '/item')
+    cache.request(pool.request, 'POST', http_server.url + '/item', data=b'{}')
+    _get(cache, pool, http_server.url + '/item')
+
+    assert [method for method, _, _, _ in http_server.requests] == ['GET', 'POST', 'GET']
+    assert cache.stats['misses'] == 2 and cache.stats['files'] == 1
+
+
+def test_memory_level_evicts_the_least_recently_used(http_server, pool):
+    http_server.routes['/a'] = http_server.routes['/b'] = http_server.routes['/c'] = \
+        lambda headers, body: (200, {'Cache-Control': 'max-age=60'}, b'x')
+    cache = HttpCache(maxsize=2)
+
+    for path in ('/a', '/b', '/a', '/c', '/a'):
+        _get(cache, pool, http_server.url + path)
+
+    assert [path for _, path, _, _ in http_server.requests] == ['/a', '/b', '/c']
+    assert cache.stats['evicted'] == 1 and cache.stats['entries'] == 2
+
+
+def _big(headers, body):
+    return 200, {'Cache-Control': 'max-age=60'}, b'x' * 2048
+
+
+def _unsized(headers, body):
+    return 200, {'Cache-Control': 'max-age=60', 'Connection': 'close'}, iter([b'x' * 100])
+
+
+@pytest.mark.parametrize('route', [_big, _unsized])
+def test_streamed_bodies_over_the_limit_are_left_unread(http_server, pool, route):
+    http_server.routes['/big'] = route
+    cache = HttpCache(max_body_size=1024)
+
+    response = cache.request(pool.request, 'GET', http_server.url + '/big', stream=True)
+
+    assert not response._content_consumed  # nothing buffered, the caller streams it
+    assert b''.join(response.iter_content(512)).startswith(b'x')
+    assert cache.stats['stored'] == 0
+
+
+def test_streamed_bodies_within_the_limit_are_stored(http_server, pool):
+    http_server.routes['/small'] = lambda headers, body: (200, {'Cache-Control': 'max-age=60'}, b'small')
+    cache = HttpCache(max_body_size=1024)
+
+    cache.request(pool.request, 'GET', http_server.url + '/small', stream=True)
+
+    assert cache.request(pool.request, 'GET', http_server.url + '/small', stream=True).content == b'small'
+    assert len(http_server.requests) == 1
+
+
+def test_encoded_response_is_stored_decoded(http_server, pool):
+    body = b'{"catalog": [1, 2, 3]}' * 50
+    http_server.routes['/gz'] = lambda headers, _: (
+        200, {'Cache-Control': 'max-age=60', 'Content-Encoding': 'gzip'}, gzip.compress(body))
+    cache = HttpCache()
+
+    _get(cache, pool, http_server.url + '/gz')
+    hit = _get(cache, pool, http_server.url + '/gz')
+
+    assert hit.from_cache and hit.content == body
+    assert 'Content-Encoding' not in hit.headers and 'Content-Length' not in hit.headers
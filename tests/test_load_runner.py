@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from taf.entrance import ApiEntrance, LoadRunner
+from taf.objects.api import RestBaseObject
+from taf.utils import LatencyHistogram
+
+from conftest import write_env
+
+SERVICE_TIME = 0.1
+SPEC = {'method': 'GET', 'j': {'q': 1}, 'with_query': True}
+
+
+def _ms_histogram(values):
+    histogram = LatencyHistogram()
+    for ms in values:
+        histogram.record(ms / 1e3)
+    return histogram
+
+
+def test_percentiles_of_a_known_distribution():
+    histogram = _ms_histogram(range(1, 1001))
+
+    assert histogram.count == 1000
+    for p, expected in ((50, 0.5), (90, 0.9), (99, 0.99), (99.9, 0.999)):
+        assert histogram.percentile(p) == pytest.approx(expected, rel=0.01)  # 2 significant digits
+    assert histogram.percentile(100) == 1.0
+    assert histogram.percentile(0) == pytest.approx(0.001, rel=0.01)
+    assert histogram.mean == pytest.approx(0.5005)
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for us in (1, 7, 100, 255):
+        histogram.record(us / 1e6)
+
+    assert [histogram.percentile(p) for p in (25, 50, 75, 100)] == [1e-6, 7e-6, 1e-4, 2.55e-4]
+
+
+def test_percentile_never_exceeds_the_max():
+    histogram = _ms_histogram([1234.567])
+
+    assert histogram.percentile(99) == histogram.percentile(100) == 1.234567
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+
+    assert histogram.percentile(99) == histogram.mean == 0.0
+    assert histogram.summary()['max'] == 0.0
+
+
+def test_merge_equals_recording_everything_in_one():
+    merged = _ms_histogram(range(1, 501)).merge(_ms_histogram(range(501, 1001)))
+    whole = _ms_histogram(range(1, 1001))
+
+    assert merged.summary() == whole.summary()
+    assert LatencyHistogram().merge(whole).summary() == whole.summary()
+
+
+def test_merge_rejects_other_precisions():
+    with pytest.raises(ValueError):
+        LatencyHistogram(2).merge(LatencyHistogram(3))
+
+
+class Slow(RestBaseObject):
+    endpoint = 'slow'
+
+    def process_response(self):
+        pass
+
+
+@pytest.fixture
+def slow_entrance(proj, http_server):
+    def slow(headers, body):
+        time.sleep(SERVICE_TIME)
+        return 200, {'Content-Type': 'application/json'}, b'{}'
+
+    http_server.routes['/api/slow'] = slow
+    write_env(proj, 'qa', {'BaseUrl': http_server.url})
+    return ApiEntrance(__name__, 'Slow', env='qa')
+
+
+def test_open_loop_latency_includes_queueing_delay(slow_entrance):
+    # 20 req/s against a single worker serving 10 req/s: each request waits longer than the previous one
+    report = LoadRunner(slow_entrance, [SPEC]).run(0.5, rate=20, concurrency=1)
+
+    assert report.mode == 'open-loop' and report.count == 10 and report.error_rate == 0
+    assert report.summary()['min'] < 2 * SERVICE_TIME
+    # the last one is scheduled at 0.45s and starts once the 9 before it are served (~0.9s)
+    assert report.histogram.percentile(100) >= 0.45 + SERVICE_TIME
+
+
+def test_closed_loop_latency_is_the_service_time(slow_entrance):
+    report = LoadRunner(slow_entrance, [SPEC]).run(0.5, concurrency=1)
+
+    assert report.mode == 'closed-loop' and report.count >= 3
+    assert report.histogram.percentile(100) < 2 * SERVICE_TIME
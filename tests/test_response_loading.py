@@ -0,0 +1,59 @@
+import json
+
+from taf.objects.api import RestBaseObject, SoapBaseObject
+from taf.utils import CustomDict, ResponseView
+
+BODY = json.dumps({'Body': {'Items': [{'id': 1}, {'id': 2}], 'Total': 2}})
+
+
+class Orders(RestBaseObject):
+    endpoint = 'orders'
+
+    def process_response(self):
+        # what subclasses written against CustomDict do with the parsed response
+        rs = self._rs_dict
+        assert isinstance(rs, dict)
+        assert rs['Missing'] is None
+        body = rs['Body']
+        assert isinstance(body, dict)
+        items = body['Items'] + [{'id': 3}]
+        body['Total'] = len(items)
+        return json.dumps(body)
+
+
+class ViewOrders(Orders):
+    use_response_view = True
+
+    def process_response(self):
+        return self._rs_dict.get('Body.Items[1].id')
+
+
+class Envelope(SoapBaseObject):
+    endpoint = 'soap'
+
+    def process_response(self):
+        return self._rs_dict['Envelope']['Body']['Res']['V']
+
+
+def test_unmodified_subclass_still_gets_a_custom_dict(proj):
+    obj = Orders(env='qa')
+    obj.load_client_response(BODY)
+
+    assert isinstance(obj._rs_dict, CustomDict)
+    assert json.loads(obj.process_response()) == {'Items': [{'id': 1}, {'id': 2}], 'Total': 3}
+
+
+def test_response_view_is_opt_in(proj):
+    obj = ViewOrders(env='qa')
+    obj.load_client_response(BODY)
+
+    assert isinstance(obj._rs_dict, ResponseView)
+    assert obj.process_response() == 2
+
+
+def test_soap_response_is_a_custom_dict(proj):
+    obj = Envelope(env='qa')
+    obj.load_client_response('<Envelope><Body><Res><V>x</V></Res></Body></Envelope>')
+
+    assert isinstance(obj._rs_dict, CustomDict)
+    assert obj.process_response() == 'x'
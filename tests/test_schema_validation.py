@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+from taf.entrance import ApiEntrance
+from taf.objects.api import RestBaseObject
+
+from conftest import write_env
+
+JSON_SCHEMA = {'type': 'object', 'required': ['id'], 'properties': {'id': {'type': 'integer'}}}
+XSD = '''<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:element name="Item"><xs:complexType><xs:sequence>
+    <xs:element name="Id" type="xs:integer"/>
+  </xs:sequence></xs:complexType></xs:element>
+</xs:schema>'''
+
+
+class Items(RestBaseObject):
+    endpoint = 'items'
+
+    def process_response(self):
+        pass
+
+
+@pytest.fixture
+def items(proj, http_server):
+    write_env(proj, 'qa', {'BaseUrl': http_server.url})
+    os.makedirs(os.path.join(proj, 'schema', 'items'))
+    with open(os.path.join(proj, 'schema', 'items', 'item.json'), 'w') as f:
+        json.dump(JSON_SCHEMA, f)
+    with open(os.path.join(proj, 'schema', 'items', 'item.xsd'), 'w') as f:
+        f.write(XSD)
+
+    def respond(content_type, body):
+        http_server.routes['/api/items'] = lambda headers, rq: (200, {'Content-Type': content_type}, body)
+
+    return respond
+
+
+def _log(proj, name):
+    path = os.path.join(proj, 'log', name)
+    if os.path.exists(path):
+        with open(path) as f:
+            return f.read()
+
+
+def _dispatch(schema_path, **kwargs):
+    entrance = ApiEntrance(__name__, 'Items', env='qa')
+    entrance.dispatch_rest_request('GET', j={'q': 1}, with_query=True, schema_path=schema_path, **kwargs)
+
+
+def test_valid_json_passes(proj, items):
+    items('application/json', b'{"id": 1}')
+    _dispatch('items/item.json')
+
+    assert os.listdir(os.path.join(proj, 'log')) == []
+
+
+def test_validator_is_picked_by_the_schema_not_the_content_type(proj, items):
+    # xml served as text/plain is sniffed as xml, the .xsd still decides
+    items('text/plain', b'<Item><Id>x</Id></Item>')
+    _dispatch('items/item.xsd')
+
+    assert 'Id' in _log(proj, 'error_xmlschema_item.log')
+
+
+def test_xml_body_against_json_schema_is_a_failure(proj, items):
+    items('application/xml', b'<Item><Id>1</Id></Item>')
+    _dispatch('items/item.json')
+
+    assert 'but the schema is json' in _log(proj, 'error_kind_item.log')
+
+
+def test_json_body_against_xsd_is_a_failure(proj, items):
+    items('application/json', b'{"id": 1}')
+    _dispatch('items/item.xsd')
+
+    assert 'but the schema is xml' in _log(proj, 'error_kind_item.log')
+
+
+def test_unparsable_json_is_logged_not_raised(proj, items):
+    items('application/json', b'{"id": ')
+    _dispatch('items/item.json')
+
+    assert _log(proj, 'error_syntax_item.log')
@@ -0,0 +1,135 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from taf.clients.api import SessionPool
+
+DELAY = 0.1
+
+
+def _ok(headers, body):
+    return 200, {'Content-Type': 'text/plain'}, b'ok'
+
+
+@pytest.fixture
+def ok_url(http_server):
+    http_server.routes['/ok'] = _ok
+    return http_server.url + '/ok'
+
+
+def test_sequential_requests_reuse_one_connection(ok_url):
+    pool = SessionPool()
+    try:
+        for _ in range(5):
+            assert pool.request('GET', ok_url).text == 'ok'
+
+        assert pool.stats == {'checkouts': 5, 'new_connections': 1, 'reused_connections': 4}
+    finally:
+        pool.close()
+
+
+def test_without_keep_alive_every_request_connects(ok_url):
+    pool = SessionPool(keep_alive=False)
+    try:
+        for _ in range(3):
+            pool.request('GET', ok_url)
+
+        assert pool.stats['new_connections'] == 3
+    finally:
+        pool.close()
+
+
+def test_reset_stats(ok_url):
+    pool = SessionPool()
+    try:
+        pool.request('GET', ok_url)
+        pool.reset_stats()
+        pool.request('GET', ok_url)
+
+        assert pool.stats == {'checkouts': 1, 'new_connections': 0, 'reused_connections': 1}
+    finally:
+        pool.close()
+
+
+def _concurrency(http_server, pool, requests=6):
+    """ Fire <requests> at once through the pool, return the max number the server handled concurrently """
+
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def slow(headers, body):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(DELAY)
+        with lock:
+            active[0] -= 1
+        return _ok(headers, body)
+
+    http_server.routes['/slow'] = slow
+    threads = [threading.Thread(target=pool.request, args=('GET', http_server.url + '/slow'))
+               for _ in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return peak[0]
+
+
+def test_host_limits_cap_concurrent_connections(http_server):
+    host = urlsplit(http_server.url).netloc
+    pool = SessionPool(pool_block=True, host_limits={host: 2})
+    try:
+        assert _concurrency(http_server, pool) == 2
+        assert pool.stats['new_connections'] == 2
+        assert pool.stats['checkouts'] == 6
+    finally:
+        pool.close()
+
+
+def test_other_hosts_keep_the_default_limit(http_server):
+    pool = SessionPool(pool_block=True, host_limits={'elsewhere.local': 1})
+    try:
+        assert _concurrency(http_server, pool) == 6
+    finally:
+        pool.close()
+
+
+def test_cookies_are_not_kept_between_requests(http_server):
+    http_server.routes['/login'] = lambda headers, body: (200, {'Set-Cookie': 'sid=1; Path=/'}, b'')
+    http_server.routes['/ok'] = _ok
+    pool = SessionPool()
+    try:
+        assert pool.request('GET', http_server.url + '/login').cookies.get('sid') == '1'
+        pool.request('GET', http_server.url + '/ok')
+
+        assert len(pool.session.cookies) == 0
+        assert 'Cookie' not in http_server.requests[-1][2]
+    finally:
+        pool.close()
+
+
+def test_timings_break_down_the_network_time(http_server):
+    def chunks():
+        time.sleep(DELAY)
+        yield b'ok'
+
+    def slow(headers, body):
+        time.sleep(DELAY)  # before the headers
+        return 200, {'Content-Length': '2'}, chunks()
+
+    http_server.routes['/slow'] = slow
+    pool = SessionPool()
+    try:
+        first = pool.request('GET', http_server.url + '/slow').timings
+        second = pool.request('GET', http_server.url + '/slow').timings
+
+        assert first['connect'] > 0
+        assert second['connect'] == 0  # reused
+        for timings in (first, second):
+            assert timings['ttfb'] >= DELAY
+            assert timings['download'] >= DELAY
+    finally:
+        pool.close()
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from taf.clients.api import RestBaseClient, SessionPool
+from taf.objects.api import RestBaseObject
+from taf.utils import stream_utils
+from taf.utils.stream_utils import StreamedBody
+
+ITEMS = {'Body': {'Items': [{'id': i} for i in range(5)]}}
+
+
+class Items(RestBaseObject):
+    endpoint = 'items'
+
+
+def _stream(doc=ITEMS, spool_size=16):
+    body = StreamedBody('application/json', spool_size=spool_size)  # spilled to a temp file
+    body.write(json.dumps(doc).encode())
+    return body
+
+
+@pytest.fixture
+def pool():
+    pool = SessionPool()
+    yield pool
+    pool.close()
+
+
+def test_context_manager_closes_the_spooled_file():
+    with _stream() as body:
+        assert body.to_dict() == ITEMS
+    assert body.closed
+
+
+def test_client_closes_the_replaced_stream(pool, http_server):
+    http_server.routes['/items'] = lambda headers, _: (200, {'Content-Type': 'application/json'},
+                                                       json.dumps(ITEMS).encode())
+    client = RestBaseClient(pool=pool, stream=True)
+
+    client.send_req('GET', http_server.url + '/items', {}, params={'a': 1})
+    first = client.rs_stream
+    client.send_req('GET', http_server.url + '/items', {}, params={'a': 2})
+
+    assert first.closed and not client.rs_stream.closed
+    assert client.rs_stream.to_dict() == ITEMS
+
+
+def test_obj_closes_the_stream_of_its_lazy_items(proj):
+    obj = Items(env='qa')
+    first, second = _stream(), _stream()
+
+    obj.load_client_stream(first, 'Body.Items')
+    assert next(obj._rs_items) == {'id': 0}
+
+    obj.load_client_stream(second, 'Body.Items')
+    assert first.closed and not second.closed
+    assert [item['id'] for item in obj._rs_items] == [0, 1, 2, 3, 4]
+
+    obj.reset()
+    assert second.closed
+
+
+def test_obj_does_not_hold_a_fully_parsed_stream(proj):
+    obj = Items(env='qa')
+    lazy, whole = _stream(), _stream()
+
+    obj.load_client_stream(lazy, 'Body.Items')
+    obj.load_client_stream(whole)
+
+    assert lazy.closed and not whole.closed  # the caller owns the one parsed in full
+    assert obj._rs_dict['Body']['Items'][4] == {'id': 4}
+
+
+def test_clone_does_not_share_the_stream(proj):
+    obj = Items(env='qa')
+    obj.load_client_stream(_stream(), 'Body.Items')
+
+    clone = obj.clone()
+
+    assert clone._rs_stream is None and list(clone._rs_items) == []
+
+
+@pytest.mark.parametrize('doc', [
+    {'Body': {'Items': [{'id': i, 'name': 'item %d' % i, 'price': i / 3, 'tags': [], 'meta': {}}
+                        for i in range(20000)], 'Total': 20000, 'Next': None, 'Ok': True}},
+    [1, -2.5e10, 'x' * 100, [[], {}], {'a': [False, None]}],
+    12345678901234567890,
+])
+def test_spilled_json_is_parsed_without_reading_it_whole(doc, monkeypatch):
+    fills = []
+    fill = stream_utils._JsonStreamReader._fill
+
+    def tracking_fill(reader):
+        filled = fill(reader)
+        fills.append(len(reader._buf))
+        return filled
+    monkeypatch.setattr(stream_utils._JsonStreamReader, '_fill', tracking_fill)
+    monkeypatch.setattr(stream_utils, 'CHUNK_SIZE', 4096)
+
+    body = _stream(doc)
+
+    assert body.to_dict() == doc
+    assert max(fills) <= 2 * 4096  # the buffer never holds the body
+    body.close()
@@ -0,0 +1,99 @@
+import json
+import socket
+
+import pytest
+import requests
+
+from taf.utils import var_overrides
+from taf.utils.stub_server import StubServer
+
+pytest.importorskip('gevent')
+
+
+@pytest.fixture
+def server():
+    with StubServer() as server:
+        yield server
+
+
+@pytest.mark.parametrize('schema, expected', [
+    ({'type': 'object', 'properties': {'id': {'type': 'integer'}}}, {'id': 0}),
+    ({'type': 'integer', 'minimum': 3}, 3),
+    ({'type': 'boolean'}, True),
+    ({'type': 'string'}, 'string'),
+])
+def test_route_serves_schema_samples(server, proj, schema, expected):
+    with open(proj + '/schema/sample.json', 'w') as f:
+        json.dump(schema, f)
+    server.route('sample', schema='sample.json')
+
+    response = requests.get(server.url + '/api/sample')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/json'
+    assert response.json() == expected
+
+
+def test_route_renders_placeholders(server):
+    server.route('echo', body='<Res><Id>{{id}}</Id></Res>')
+
+    response = requests.get(server.url + '/echo', params={'id': '7'})
+    assert response.text == '<Res><Id>7</Id></Res>'
+    assert response.headers['Content-Type'].startswith('text/xml')
+    assert requests.get(server.url + '/nothing').status_code == 404
+
+
+def test_pytest_fixture_starts_serves_and_stops(pytester):
+    pytester.makeconftest("pytest_plugins = ['taf.pytest_plugin']")
+    pytester.mkpydir('src')
+    pytester.mkpydir('src/objects')
+    pytester.mkpydir('src/objects/api')
+    pytester.path.joinpath('src/objects/api/stubbed.py').write_text(
+        'from taf.objects.api import RestBaseObject\n\n\n'
+        'class Stubbed(RestBaseObject):\n'
+        "    endpoint = 'stubbed'\n")
+    pytester.makepyfile(test_inner="""
+        import requests
+        from taf.utils import var_overrides
+
+        def test_served(stub_server):
+            with open('url.txt', 'w') as f:
+                f.write(stub_server.url)
+            assert var_overrides['BaseUrl'] == stub_server.url
+            response = requests.get(stub_server.url + '/api/stubbed')
+            assert response.status_code == 200 and response.json() == {}
+    """)
+    pytester.syspathinsert()
+
+    pytester.inline_run().assertoutcome(passed=1)
+
+    assert 'BaseUrl' not in var_overrides
+    host, port = pytester.path.joinpath('url.txt').read_text().split('//')[1].split(':')
+    with pytest.raises(OSError):
+        socket.create_connection((host, int(port)), timeout=1).close()
+
+
+def test_start_raises_when_the_port_is_taken():
+    with StubServer() as first:
+        with pytest.raises(OSError):
+            StubServer(port=first.port).start()
+
+
+def test_start_raises_when_the_server_never_listens(monkeypatch):
+    monkeypatch.setattr(StubServer, '_serve', lambda self: None)  # thread ends without signalling
+    server = StubServer()
+    monkeypatch.setattr(server._started, 'wait', lambda timeout: False)
+
+    with pytest.raises(TimeoutError):
+        server.start()
+
+
+def test_restart_listens_again():
+    server = StubServer().start()
+    server.route('x', body={'n': 1})
+    server.stop()
+
+    server.start()
+    try:
+        assert requests.get(server.url + '/x').json() == {'n': 1}
+    finally:
+        server.stop()
@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+from inspect import signature
+
+import pytest
+
+from taf.utils import api_utils, typeassert, set_typecheck
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@typeassert(int, str, flag=bool)
+def func(num, name='x', *, flag=False, extra=None):
+    return num, name, flag, extra
+
+
+class Obj:
+    @typeassert(int, name=str)
+    def __init__(self, num, name='x'):
+        self.num, self.name = num, name
+
+    @classmethod
+    @typeassert(int)
+    def build(cls, num):
+        return cls(num)
+
+
+def test_positional_and_keyword_arguments_are_checked():
+    assert func(1, 'a', flag=True) == (1, 'a', True, None)
+    assert func(num=1, name='a') == (1, 'a', False, None)
+
+    for args, kwargs, name in (((1.0,), {}, 'num'), ((), {'num': '1'}, 'num'), ((1, 2), {}, 'name'),
+                               ((1,), {'name': b'a'}, 'name'), ((1,), {'flag': 1}, 'flag')):
+        with pytest.raises(TypeError, match='<%s>' % name):
+            func(*args, **kwargs)
+
+
+def test_defaults_and_unchecked_arguments_are_not_checked():
+    @typeassert(str)
+    def default_none(name=None):
+        return name
+
+    assert default_none() is None
+    assert func(1, extra=object())[0] == 1
+
+
+def test_self_and_cls_are_skipped():
+    assert Obj(1, name='a').name == 'a'
+    assert Obj.build(2).num == 2
+
+    with pytest.raises(TypeError, match='<num>'):
+        Obj('1')
+    with pytest.raises(TypeError, match='<name>'):
+        Obj(1, 2)
+    with pytest.raises(TypeError, match='<num>'):
+        Obj.build('2')
+
+
+def test_variable_length_parameters_are_rejected():
+    with pytest.raises(TypeError, match='variable length'):
+        typeassert(int)(lambda *args: args)
+
+
+def test_checks_are_resolved_by_position():
+    sig = signature(func)
+    checks = api_utils._compile_checks(sig, {'name': str, 'flag': bool})
+
+    assert checks == ((1, 'name', str), (None, 'flag', bool))
+
+
+def test_set_typecheck_switches_decorated_functions(monkeypatch):
+    monkeypatch.setattr(api_utils, '_typecheck', True)
+
+    set_typecheck(False)
+    assert func('not an int') == ('not an int', 'x', False, None)
+
+    set_typecheck(True)
+    with pytest.raises(TypeError):
+        func('not an int')
+
+
+@pytest.mark.parametrize('value, wrapped', [('0', False), ('off', False), ('1', True), ('', True)])
+def test_env_switch(value, wrapped):
+    code = ('from taf.utils import typeassert\n'
+            'def f(num): return num\n'
+            'g = typeassert(int)(f)\n'
+            'print(g is not f)\n'
+            'g("1")')
+    env = dict(os.environ, TAF_TYPECHECK=value)
+    out = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, cwd=ROOT)
+
+    assert out.stdout.split() == [str(wrapped)]
+    assert ('TypeError' in out.stderr) is wrapped
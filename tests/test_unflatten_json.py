@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from taf.objects.api import RestBaseObject
+
+
+class Orders(RestBaseObject):
+    endpoint = 'orders'
+
+
+def _unflatten(flat):
+    obj = Orders(env='qa')
+    obj.unpack_json(j=dict(flat))
+    obj.unflatten_json()
+    return obj.rq_dict
+
+
+def test_same_index_fills_the_same_object(proj):
+    flat = {'Order.Items[1].Sku': 'b', 'Order.Items[0].Sku': 'a', 'Order.Items[1].Qty': '2', 'Order.Id': '1'}
+    assert _unflatten(flat) == {'Order': {'Items': [{'Sku': 'a'}, {'Sku': 'b', 'Qty': '2'}], 'Id': '1'}}
+
+
+def test_missing_elements_are_null(proj):
+    assert _unflatten({'Items[2].Sku': 'c'}) == {'Items': [None, None, {'Sku': 'c'}]}
+
+
+@pytest.mark.parametrize('flat', [{'a': '1', 'a.b': '2'}, {'a.b': '1', 'a[0].c': '2'}, {'a[0]': '1'}])
+def test_conflicting_keys_are_rejected(proj, flat):
+    with pytest.raises(ValueError):
+        _unflatten(flat)
+
+
+def test_concurrent_unflatten(proj):
+    flat = dict(('Items[%d].Sku' % i, str(i)) for i in range(100))
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(_unflatten, [flat] * 50))
+    assert all(rq == {'Items': [{'Sku': str(i)} for i in range(100)]} for rq in results)
@@ -0,0 +1,64 @@
+import os
+from io import BytesIO
+
+import lxml.etree as et
+import pytest
+
+from taf.utils import xml2dict, xmlfile2dict, element2dict
+
+xmltodict = pytest.importorskip('xmltodict')  # reference implementation, see the 'test' extra
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'xml')
+
+XML_FILES = sorted(name for name in os.listdir(FIXTURES) if name.endswith('.xml'))
+
+
+def legacy_xml2dict(xml, strip_ns=False):
+    """ xml2dict before the single-pass rewrite: strip the prefixed tags, re-serialize, xmltodict.parse """
+
+    if strip_ns:
+        root = et.fromstring(xml)
+        for ele in root.xpath('descendant-or-self::*'):
+            if ele.prefix:
+                ele.tag = et.QName(ele).localname
+        xml = et.tostring(root)
+    return xmltodict.parse(xml)
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('strip_ns', [False, True])
+@pytest.mark.parametrize('name', XML_FILES)
+def test_xml2dict_matches_xmltodict(name, strip_ns):
+    xml = _read(name)
+    expected = legacy_xml2dict(xml, strip_ns)
+
+    assert xml2dict(xml, strip_ns=strip_ns) == expected
+    assert xml2dict(xml.decode('utf-8'), strip_ns=strip_ns) == expected
+    assert xmlfile2dict(BytesIO(xml), strip_ns=strip_ns) == expected
+    assert element2dict(et.fromstring(xml), strip_ns=strip_ns) == expected
+
+
+@pytest.mark.parametrize('xml', [
+    '<r><i>1</i><i>2</i><i>3</i></r>',  # repeated siblings
+    '<r><i>1</i><j/><i>2</i></r>',  # repeated siblings split by another tag
+    '<r><e/><f></f><g a="1"/></r>',  # empty elements
+    '<r>head <b>x</b> middle <b>y</b> tail</r>',  # mixed text
+    '<r a="1" b="2"><c d="3">t</c></r>',  # attributes
+    '<r xmlns="urn:d"><c>t</c></r>',  # default namespace
+    '<p:r xmlns:p="urn:p"><p:c p:a="1">t</p:c></p:r>',  # prefixed namespace
+])
+@pytest.mark.parametrize('strip_ns', [False, True])
+def test_xml2dict_cases(xml, strip_ns):
+    assert xml2dict(xml, strip_ns=strip_ns) == legacy_xml2dict(xml, strip_ns)
+
+
+def test_attribute_keeps_its_own_prefix_when_prefixes_share_a_uri():
+    xml = '<r xmlns:a="urn:u" xmlns:b="urn:u"><x b:first="1" a:second="2"/></r>'
+
+    x = xml2dict(xml)['r']['x']
+    assert x == {'@b:first': '1', '@a:second': '2'}
+    assert element2dict(et.fromstring(xml))['r']['x'] == x